@@ -1,7 +1,8 @@
 import os
 import sys
-import pandas as pd
-from typing import Any, List
+from typing import TYPE_CHECKING, Any, List
+from agno.agent import Agent
+from agno.models.openai import OpenAIChat
 from agno.tools import Toolkit
 from dotenv import load_dotenv
 
@@ -10,6 +11,9 @@ from tools.python_tool import PythonTools
 
 load_dotenv()
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class AltairVegaTools(Toolkit):
     """AltairVegaTools that will be able to run Altair and Vega python code to generate the chart html."""
@@ -18,7 +22,7 @@ class AltairVegaTools(Toolkit):
         tools: List[Any] = [self.run_python_code]
         super().__init__(name="Altair_Vega_Tool", tools=tools, **kwargs)
 
-    def run_python_code(code: str, data: pd.DataFrame) -> str:
+    def run_python_code(code: str, data: "pd.DataFrame") -> str:
         """
         Executes the provided Python code in a restricted environment.
 
@@ -128,87 +132,96 @@ and assign the variable 'result'.
 Action: I will now send the visualization python code to the Altair tool to generate the chart html.
 ```
 """
-# agent = Agent(
-#     model=OpenAIChat(id="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY")),
-#     system_message=systemPrompt,
-#     tool_call_limit=1,
-#     reasoning=True)
 
-# agent.print_response("""Visualize the following dataframe, df = {"year": [2000, 2001, 2002, 2003], "close": [1223, 1243, 1000. 2432]}""", stream=True, show_full_reasoning=True)
 
-fifa_data = pd.DataFrame(
-    {
-        "Attribute": [
-            "Overall Rating",
-            "Pace",
-            "Shooting",
-            "Passing",
-            "Dribbling",
-            "Defending",
-            "Physicality",
-            "Acceleration",
-            "Sprint Speed",
-            "Agility",
-            "Balance",
-            "Reactions",
-            "Ball Control",
-            "Dribbling",
-            "Composure",
-            "Positioning",
-            "Finishing",
-            "Shot Power",
-            "Long Shots",
-            "Volleys",
-            "Penalties",
-            "Vision",
-            "Crossing",
-            "Free Kick Accuracy",
-            "Long Passing",
-            "Curve",
-            "Jumping",
-            "Stamina",
-            "Strength",
-            "Aggression",
-        ],
-        "Category": ["General"] * 7
-        + ["Movement"] * 5
-        + ["Dribbling"] * 3
-        + ["Attacking"] * 6
-        + ["Passing"] * 5
-        + ["Physicality"] * 4,
-        "Rating": [
-            88,
-            78,
-            "N/A",
-            "N/A",
-            90,
-            33,
-            64,
-            84,
-            73,
-            84,
-            89,
-            80,
-            94,
-            89,
-            92,
-            86,
-            84,
-            84,
-            87,
-            89,
-            75,
-            87,
-            80,
-            93,
-            84,
-            90,
-            70,
-            70,
-            68,
-            44,
-        ],
-    }
-)
+def create_agent() -> Agent:
+    """Build the data analytics agent. Deferred until needed so importing this module stays cheap."""
+    return Agent(
+        model=OpenAIChat(id="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY")),
+        system_message=systemPrompt,
+        tool_call_limit=1,
+        reasoning=True,
+    )
+
+
+# agent.print_response("""Visualize the following dataframe, df = {"year": [2000, 2001, 2002, 2003], "close": [1223, 1243, 1000. 2432]}""", stream=True, show_full_reasoning=True)
 
-print(fifa_data)
+if __name__ == "__main__":
+    import pandas as pd
+
+    fifa_data = pd.DataFrame(
+        {
+            "Attribute": [
+                "Overall Rating",
+                "Pace",
+                "Shooting",
+                "Passing",
+                "Dribbling",
+                "Defending",
+                "Physicality",
+                "Acceleration",
+                "Sprint Speed",
+                "Agility",
+                "Balance",
+                "Reactions",
+                "Ball Control",
+                "Dribbling",
+                "Composure",
+                "Positioning",
+                "Finishing",
+                "Shot Power",
+                "Long Shots",
+                "Volleys",
+                "Penalties",
+                "Vision",
+                "Crossing",
+                "Free Kick Accuracy",
+                "Long Passing",
+                "Curve",
+                "Jumping",
+                "Stamina",
+                "Strength",
+                "Aggression",
+            ],
+            "Category": ["General"] * 7
+            + ["Movement"] * 5
+            + ["Dribbling"] * 3
+            + ["Attacking"] * 6
+            + ["Passing"] * 5
+            + ["Physicality"] * 4,
+            "Rating": [
+                88,
+                78,
+                "N/A",
+                "N/A",
+                90,
+                33,
+                64,
+                84,
+                73,
+                84,
+                89,
+                80,
+                94,
+                89,
+                92,
+                86,
+                84,
+                84,
+                87,
+                89,
+                75,
+                87,
+                80,
+                93,
+                84,
+                90,
+                70,
+                70,
+                68,
+                44,
+            ],
+        }
+    )
+
+    print(fifa_data)
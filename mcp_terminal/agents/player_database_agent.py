@@ -16,12 +16,19 @@ systemPrompt = """
 
    Your final output will always just be a JSON array of player attributes.
 """
-agent = Agent(
-    model=OpenAIChat(id="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY")),
-    tools=[PlayerDatabaseTool()],
-    system_message=systemPrompt,
-    reasoning=True,
-    tool_call_limit=5,
-)
-
-agent.print_response("Get info for Haaland", stream=True)
+
+
+def create_agent() -> Agent:
+    """Build the player database agent. Deferred until needed so importing this module stays cheap."""
+    return Agent(
+        model=OpenAIChat(id="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY")),
+        tools=[PlayerDatabaseTool()],
+        system_message=systemPrompt,
+        reasoning=True,
+        tool_call_limit=5,
+    )
+
+
+if __name__ == "__main__":
+    agent = create_agent()
+    agent.print_response("Get info for Haaland", stream=True)
@@ -64,13 +64,21 @@ systemPrompt = """
 
 # agent.print_response("Tell me a joke about a sunny day.", stream=True)
 
-agent = Agent(
-    model=OpenAIChat(id="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY")), system_message=systemPrompt, reasoning=True
-)
 
-agent.print_response(
-    f"""Visualize the 2 players on a single horizontal groups bar chart.       
+def create_agent() -> Agent:
+    """Build the Vega-Altair coding agent. Deferred until needed so importing this module stays cheap."""
+    return Agent(
+        model=OpenAIChat(id="gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY")),
+        system_message=systemPrompt,
+        reasoning=True,
+    )
+
+
+if __name__ == "__main__":
+    agent = create_agent()
+    agent.print_response(
+        f"""Visualize the 2 players on a single horizontal groups bar chart.       
    [{"Name: Alexander Isak, OVR: 85, PAC: 85, SHO: 84, PAS: 73, DRI: 86, DEF: 39, PHY: 74"}, {"Name: Erling Haaland, OVR: 91, PAC: 88, SHO: 92, PAS: 70, DRI: 81, DEF: 45, PHY: 88"}]
 """,
-    stream=True,
-)
+        stream=True,
+    )
@@ -0,0 +1,121 @@
+"""
+Import-time profiler for the MCP server and agent entry points.
+
+Imports each entry point in a fresh interpreter (so nothing is cached) and reports the wall time
+of the import plus the heaviest modules according to `python -X importtime`.
+
+Usage:
+    python mcp_terminal/benchmarks/import_profile.py
+    python mcp_terminal/benchmarks/import_profile.py server python_server --repeat 5 --top 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# name -> (directory the script is normally run from, module to import)
+ENTRY_POINTS: Dict[str, Tuple[str, str]] = {
+    "server": ("mcp_terminal", "server"),
+    "python_server": ("mcp_terminal", "python_server"),
+    "dms_server": ("mcp_themis", "dms_server"),
+    "player_database_agent": (os.path.join("mcp_terminal", "agents"), "player_database_agent"),
+    "vega_python_agent": (os.path.join("mcp_terminal", "agents"), "vega_python_agent"),
+    "data_analytics_agent": (os.path.join("mcp_terminal", "agents"), "data_analytics_agent"),
+}
+
+TIMER = "import time as _t; _s = _t.perf_counter(); import {module}; print('IMPORT_SECONDS', _t.perf_counter() - _s)"
+
+
+def profile_entry_point(directory: str, module: str) -> Tuple[Optional[float], List[Tuple[int, int, str]], str]:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Returns:
+        (wall seconds or None on failure, [(self_us, cumulative_us, module)], error text)
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", TIMER.format(module=module)],
+        cwd=os.path.join(REPO_ROOT, directory),
+        capture_output=True,
+        text=True,
+    )
+    seconds = None
+    for line in process.stdout.splitlines():
+        if line.startswith("IMPORT_SECONDS"):
+            seconds = float(line.split()[1])
+
+    modules = []
+    for line in process.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        modules.append((int(self_us), int(cumulative_us), name.rstrip()))
+
+    error = ""
+    if process.returncode != 0:
+        error_lines = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        error = error_lines[-1] if error_lines else f"exit code {process.returncode}"
+    return seconds, modules, error
+
+
+def top_level_packages(modules: List[Tuple[int, int, str]], top: int) -> List[Tuple[str, float]]:
+    """Heaviest top-level packages by cumulative import time (ms), as imported directly by the entry point."""
+    packages: Dict[str, float] = {}
+    for _, cumulative_us, name in modules:
+        # One space, then two more per nesting level; level 1 are imports made by the entry point itself
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 1:
+            package = name.strip().split(".")[0]
+            packages[package] = packages.get(package, 0.0) + cumulative_us / 1000
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Report the import-time startup cost of each entry point.")
+    parser.add_argument(
+        "entry_points", nargs="*", help=f"Entry points to profile (default: all of {list(ENTRY_POINTS)})"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per entry point; the fastest is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest packages to list")
+    parser.add_argument("--json", dest="json_path", help="Also save the report as JSON")
+    args = parser.parse_args()
+    unknown = [name for name in args.entry_points if name not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry points: {unknown}")
+
+    report = {}
+    for name in args.entry_points or list(ENTRY_POINTS):
+        directory, module = ENTRY_POINTS[name]
+        runs = [profile_entry_point(directory, module) for _ in range(max(1, args.repeat))]
+        successful = [run for run in runs if run[0] is not None]
+        if not successful:
+            print(f"{name:<24} FAILED: {runs[-1][2]}")
+            report[name] = {"error": runs[-1][2]}
+            continue
+
+        seconds, modules, _ = min(successful, key=lambda run: run[0])
+        heaviest = top_level_packages(modules, args.top)
+        print(f"{name:<24} {seconds * 1000:9.1f} ms  ({len(modules)} modules)")
+        for package, ms in heaviest:
+            print(f"    {package:<28} {ms:9.1f} ms")
+        report[name] = {
+            "import_ms": round(seconds * 1000, 1),
+            "modules": len(modules),
+            "heaviest": {package: round(ms, 1) for package, ms in heaviest},
+        }
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+        print(f"Saved report to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""
+Load-test and benchmark harness for the MCP database server (server.py).
+
+Seeds a local SQLite stand-in with synthetic models/datasets/tasks/results, starts server.py
+against it on the SSE transport, drives concurrent MCP clients through a weighted tool mix and
+reports throughput, latency percentiles and memory. Results are written as JSON and compared
+against a stored baseline.
+
+Usage:
+    python mcp_terminal/benchmarks/server_benchmark.py --results 100000 --clients 16
+    python mcp_terminal/benchmarks/server_benchmark.py --results 10000000 --reuse-db --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from database.models import Base, Dataset, Model, Result, Task, TaskStatus, task_dataset_association
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from sqlalchemy import create_engine, func, insert, select
+
+SERVER_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "server.py"))
+SERVER_URL = "http://localhost:{port}/sse"
+DEFAULT_PORT = 8050
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Relative weights of each tool call; arguments are picked from the seeded id ranges by build_arguments().
+TOOL_MIXES: Dict[str, Dict[str, int]] = {
+    "read": {
+        "get_db_schema": 5,
+        "get_model": 25,
+        "get_task": 35,
+        "get_result": 35,
+    },
+    "mixed": {
+        "get_db_schema": 5,
+        "get_model": 15,
+        "get_task": 25,
+        "get_result": 25,
+        "create_result": 10,
+        "update_task_status": 10,
+        "update_result_value": 10,
+    },
+}
+
+SEED_BATCH_SIZE = 50_000
+
+
+def seed_database(database_url: str, num_results: int, rng: random.Random) -> Dict[str, int]:
+    """
+    Create the schema and bulk-insert synthetic rows. Row counts scale with the number of results:
+    one task per 10 results, one model per 10k results and one dataset per 5k results.
+
+    Returns:
+        The number of rows per table, used to pick valid ids for tool arguments.
+    """
+    counts = {
+        "model": max(1, num_results // 10_000),
+        "dataset": max(4, num_results // 5_000),
+        "task": max(1, num_results // 10),
+        "result": num_results,
+    }
+    engine = create_engine(database_url, future=True)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    statuses = list(TaskStatus)
+    categories = ["dog", "cat", "bird", "fish", "horse"]
+    with engine.begin() as conn:
+        conn.execute(insert(Model), [{"model_name": f"model_{i}"} for i in range(counts["model"])])
+        conn.execute(insert(Dataset), [{"dataset_name": f"dataset_{i}"} for i in range(counts["dataset"])])
+
+    def insert_batched(table, total: int, make_row) -> None:
+        for start in range(0, total, SEED_BATCH_SIZE):
+            rows = [make_row(i) for i in range(start, min(start + SEED_BATCH_SIZE, total))]
+            with engine.begin() as conn:
+                conn.execute(insert(table), rows)
+
+    insert_batched(
+        Task,
+        counts["task"],
+        lambda i: {"model_id": rng.randint(1, counts["model"]), "status": rng.choice(statuses)},
+    )
+    insert_batched(
+        task_dataset_association,
+        counts["task"],
+        lambda i: {"task_id": i + 1, "dataset_id": rng.randint(1, counts["dataset"])},
+    )
+    insert_batched(
+        Result,
+        counts["result"],
+        lambda i: {
+            "task_id": i // 10 + 1,
+            "category": rng.choice(categories),
+            "value": round(rng.uniform(0, 100), 2),
+        },
+    )
+    engine.dispose()
+    return counts
+
+
+def count_rows(database_url: str) -> Dict[str, int]:
+    """Count rows of an already seeded database (used with --reuse-db)."""
+    engine = create_engine(database_url, future=True)
+    with engine.connect() as conn:
+        counts = {
+            table: conn.execute(select(func.count()).select_from(orm)).scalar_one()
+            for table, orm in (("model", Model), ("dataset", Dataset), ("task", Task), ("result", Result))
+        }
+    engine.dispose()
+    return counts
+
+
+def build_arguments(tool: str, counts: Dict[str, int], rng: random.Random) -> Dict[str, Any]:
+    """Pick realistic arguments for a tool call from the seeded id ranges."""
+    if tool == "get_model":
+        return {}
+    if tool == "get_task":
+        return {"task_id": str(rng.randint(1, counts["task"]))}
+    if tool == "get_result":
+        return {"result_id": str(rng.randint(1, counts["result"]))}
+    if tool == "create_result":
+        return {"task_id": rng.randint(1, counts["task"]), "category": "bench", "value": rng.uniform(0, 100)}
+    if tool == "update_task_status":
+        return {"task_id": rng.randint(1, counts["task"]), "new_status": rng.choice(list(TaskStatus)).value}
+    if tool == "update_result_value":
+        return {"result_id": rng.randint(1, counts["result"]), "new_value": rng.uniform(0, 100)}
+    return {}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p90_ms": round(percentile(values, 90) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+
+def read_peak_rss_kb(pid: int) -> Optional[int]:
+    """Peak resident set size (VmHWM) of a process in KB. Only available on Linux."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def start_server(database_url: str, port: int) -> subprocess.Popen:
+    """Start server.py against the stand-in database and wait until its SSE port accepts connections."""
+    env = dict(os.environ, DATABASE_URL=database_url, MCP_PORT=str(port))
+    process = subprocess.Popen(
+        [sys.executable, SERVER_SCRIPT],
+        cwd=os.path.dirname(SERVER_SCRIPT),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+        try:
+            with socket.create_connection(("localhost", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"Server did not start listening on port {port} within 30 seconds")
+
+
+async def run_client(
+    port: int,
+    client_id: int,
+    num_requests: int,
+    mix: Dict[str, int],
+    counts: Dict[str, int],
+    seed: int,
+    samples: Dict[str, List[float]],
+    errors: Dict[str, int],
+) -> None:
+    """One MCP client issuing num_requests sequential tool calls drawn from the mix."""
+    rng = random.Random(seed + client_id)
+    tools = list(mix)
+    weights = list(mix.values())
+    async with sse_client(SERVER_URL.format(port=port)) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            for _ in range(num_requests):
+                tool = rng.choices(tools, weights)[0]
+                arguments = build_arguments(tool, counts, rng)
+                start = time.perf_counter()
+                try:
+                    result = await session.call_tool(tool, arguments=arguments)
+                    failed = result.isError or (
+                        bool(result.content) and getattr(result.content[0], "text", "").startswith("Error")
+                    )
+                except Exception as e:
+                    print(f"Client {client_id}: {tool} raised {e}")
+                    failed = True
+                samples.setdefault(tool, []).append(time.perf_counter() - start)
+                if failed:
+                    errors[tool] = errors.get(tool, 0) + 1
+
+
+async def run_load(
+    port: int, num_clients: int, num_requests: int, mix: Dict[str, int], counts: Dict[str, int], seed: int
+) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(run_client(port, i, num_requests, mix, counts, seed, samples, errors) for i in range(num_clients))
+    )
+    elapsed = time.perf_counter() - start
+    all_latencies = [value for values in samples.values() for value in values]
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(all_latencies),
+        "throughput_rps": round(len(all_latencies) / elapsed, 2) if elapsed else 0.0,
+        "errors": sum(errors.values()),
+        "latency": summarize_latencies(all_latencies),
+        "tools": {
+            tool: {**summarize_latencies(values), "errors": errors.get(tool, 0)} for tool, values in samples.items()
+        },
+    }
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Print the change of the headline metrics against the baseline.
+
+    Returns:
+        A list of regressions (throughput lower, or p50/p99 latency higher, by more than the tolerance).
+    """
+    regressions = []
+    metrics = [
+        ("throughput_rps", report["throughput_rps"], baseline["throughput_rps"], True),
+        ("p50_ms", report["latency"]["p50_ms"], baseline["latency"]["p50_ms"], False),
+        ("p99_ms", report["latency"]["p99_ms"], baseline["latency"]["p99_ms"], False),
+    ]
+    print("\nComparison against baseline:")
+    for name, current, previous, higher_is_better in metrics:
+        change = (current - previous) / previous if previous else 0.0
+        print(f"  {name}: {previous} -> {current} ({change:+.1%})")
+        worse = -change if higher_is_better else change
+        if worse > tolerance:
+            regressions.append(f"{name} regressed by {worse:.1%}")
+    if report["config"] != baseline.get("config"):
+        print("  Note: the baseline was recorded with a different configuration.")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency"]
+    print(f"\nRequests: {report['requests']} in {report['elapsed_s']}s ({report['throughput_rps']} req/s)")
+    print(f"Errors: {report['errors']}")
+    print(
+        f"Latency ms: p50={latency['p50_ms']} p90={latency['p90_ms']} p99={latency['p99_ms']} max={latency['max_ms']}"
+    )
+    print(f"Server peak RSS: {report['memory']['server_peak_rss_kb']} KB")
+    print(f"Client peak RSS: {report['memory']['client_peak_rss_kb']} KB\n")
+    for tool, stats in sorted(report["tools"].items()):
+        print(
+            f"  {tool:<22} n={stats['count']:<6} p50={stats['p50_ms']:<9} p99={stats['p99_ms']:<9} "
+            f"err={stats['errors']}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the MCP database server.")
+    parser.add_argument("--results", type=int, default=1000, help="Number of synthetic results to seed (1k to 10M)")
+    parser.add_argument("--clients", type=int, default=8, help="Number of concurrent MCP clients")
+    parser.add_argument("--requests", type=int, default=200, help="Tool calls issued by each client")
+    parser.add_argument("--mix", choices=sorted(TOOL_MIXES), default="read", help="Tool mix to drive")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port the benchmarked server listens on")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and request generation")
+    parser.add_argument("--db-path", help="SQLite file for the stand-in database (default: a temp file)")
+    parser.add_argument("--reuse-db", action="store_true", help="Skip seeding and reuse an existing --db-path")
+    parser.add_argument("--output", help="Where to save the JSON report (default: bench_<timestamp>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression before failing (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    if args.reuse_db and not args.db_path:
+        parser.error("--reuse-db requires --db-path")
+
+    db_path = args.db_path or os.path.join(tempfile.mkdtemp(prefix="mcp-bench-"), "bench.db")
+    database_url = f"sqlite:///{os.path.abspath(db_path)}"
+
+    if args.reuse_db:
+        counts = count_rows(database_url)
+        seed_seconds = 0.0
+    else:
+        print(f"Seeding {args.results} results into {db_path}...")
+        seed_start = time.perf_counter()
+        counts = seed_database(database_url, args.results, random.Random(args.seed))
+        seed_seconds = time.perf_counter() - seed_start
+        print(f"Seeded {counts} in {seed_seconds:.1f}s")
+
+    server = start_server(database_url, args.port)
+    try:
+        print(f"Driving {args.clients} clients x {args.requests} requests ({args.mix} mix)...")
+        report = asyncio.run(run_load(args.port, args.clients, args.requests, TOOL_MIXES[args.mix], counts, args.seed))
+        server_peak_rss = read_peak_rss_kb(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    # ru_maxrss is KB on Linux and bytes on macOS
+    client_peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if platform.system() == "Darwin":
+        client_peak_rss //= 1024
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "config": {
+            "results": counts["result"],
+            "clients": args.clients,
+            "requests_per_client": args.requests,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "rows": counts,
+        "seed_s": round(seed_seconds, 3),
+        **report,
+        "memory": {"server_peak_rss_kb": server_peak_rss, "client_peak_rss_kb": client_peak_rss},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+    }
+    print_report(report)
+
+    output = args.output or f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=4)
+    print(f"Saved report to {output}")
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare_to_baseline(report, json.load(file), args.tolerance)
+    elif not args.save_baseline:
+        print(f"No baseline found at {args.baseline}; run with --save-baseline to record one.")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+        print(f"Saved baseline to {args.baseline}")
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
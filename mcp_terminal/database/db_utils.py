@@ -1,7 +1,9 @@
 from collections.abc import Sequence
 from contextlib import contextmanager
 import json
-from typing import Any, Optional
+import threading
+import time
+from typing import Any, Callable, Optional
 from sqlalchemy import MetaData, Row, create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import joinedload
@@ -31,8 +33,12 @@ class DBUtils:
         self.DB_HOST = os.getenv("DB_HOST", "localhost")
         self.DB_PORT = os.getenv("DB_PORT", "5432")
         self.DB_NAME = os.getenv("DB_NAME")
+        # Connection pool shared by every session, including concurrent batch_call workers
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 
-        self.DATABASE_URL = (
+        # DATABASE_URL overrides the Postgres settings, e.g. sqlite:///bench.db for a local stand-in
+        self.DATABASE_URL = os.getenv("DATABASE_URL") or (
             f"postgresql+psycopg2://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
         )
 
@@ -41,11 +47,20 @@ class DBUtils:
             self.DATABASE_URL,
             echo=False,  # set True to log SQL
             future=True,
+            pool_size=self.DB_POOL_SIZE,
+            max_overflow=self.DB_MAX_OVERFLOW,
         )
 
         # Session factory (creates new sessions when needed)
         self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False, expire_on_commit=False)
 
+        # Per-table data versions, bumped on every write made through this class.
+        # Seeded from the wall clock so versions keep increasing across server restarts.
+        seed = int(time.time() * 1000)
+        self.table_versions: dict[str, int] = {table: seed for table in Base.metadata.tables}
+        self._change_listeners: list[Callable[[str, int], None]] = []
+        self._versions_lock = threading.Lock()
+
         if reset_db:
             # Drop all tables if reset_db is True
             Base.metadata.drop_all(self.engine)
@@ -53,6 +68,34 @@ class DBUtils:
             Base.metadata.create_all(self.engine)
             print("Database reset: All tables dropped and recreated.")
 
+    def add_change_listener(self, listener: Callable[[str, int], None]) -> None:
+        """
+        Register a callback invoked as listener(table_name, new_version) after a write commits.
+        """
+        self._change_listeners.append(listener)
+
+    def get_table_version(self, *tables: str) -> int:
+        """
+        Return the current data version covering the given tables.
+        The sum of the per-table versions, so it increases whenever any of the tables changes.
+        Only writes made through this class are tracked.
+        """
+        return sum(self.table_versions[table] for table in tables)
+
+    def _mark_changed(self, *tables: str) -> None:
+        """
+        Bump the data version of the given tables and notify change listeners.
+        """
+        for table in tables:
+            with self._versions_lock:
+                self.table_versions[table] += 1
+                version = self.table_versions[table]
+            for listener in self._change_listeners:
+                try:
+                    listener(table, version)
+                except Exception as e:
+                    print(f"Error notifying change listener: {e}")
+
     # Dependency / context manager
     @contextmanager
     def get_db(self):
@@ -108,6 +151,8 @@ class DBUtils:
             try:
                 db.execute(text(sql_statement))
                 db.commit()  # Commit the transaction if it's an INSERT or UPDATE
+                # Raw SQL may touch any table
+                self._mark_changed(*self.table_versions)
                 return "SQL statement executed successfully."
             except Exception as e:
                 # e.g. for DDL statements (CREATE, DROP) fetchall() will fail
@@ -135,6 +180,7 @@ class DBUtils:
                 db.add(model)
                 db.commit()
                 db.refresh(model)
+                self._mark_changed("model")
                 return model
         except Exception as e:
             print(f"Error creating model: {str(e)}")
@@ -185,6 +231,7 @@ class DBUtils:
                     db_model.model_name = new_name
                     db.commit()
                     db.refresh(db_model)
+                    self._mark_changed("model")
                     return db_model
                 else:
                     raise ValueError(f"Model with ID {model_id} not found")
@@ -218,6 +265,7 @@ class DBUtils:
                 if db_model:
                     db.delete(db_model)
                     db.commit()
+                    self._mark_changed("model", "task", "task_dataset", "result")
                     return "Model has been deleted"
         except Exception as e:
             return f"Error deleting model: {str(e)}"
@@ -243,6 +291,7 @@ class DBUtils:
                 db.add(dataset)
                 db.commit()
                 db.refresh(dataset)
+                self._mark_changed("dataset")
                 return dataset
         except Exception as e:
             raise (f"Error creating dataset: {str(e)}")
@@ -292,6 +341,7 @@ class DBUtils:
                     dataset.dataset_name = new_name
                     db.commit()
                     db.refresh(dataset)
+                    self._mark_changed("dataset")
                     return dataset
                 else:
                     raise ValueError(f"Dataset with ID {dataset_id} not found")
@@ -321,6 +371,7 @@ class DBUtils:
                 if dataset:
                     db.delete(dataset)
                     db.commit()
+                    self._mark_changed("dataset", "task_dataset")
                     return True
                 return False
         except Exception as e:
@@ -349,6 +400,7 @@ class DBUtils:
                 db.add(task)
                 db.commit()
                 db.refresh(task)
+                self._mark_changed("task", "task_dataset")
                 return task
         except Exception as e:
             raise (f"Error creating task: {str(e)}")
@@ -402,6 +454,7 @@ class DBUtils:
                     db_task.status = new_status
                     db.commit()
                     db.refresh(db_task)
+                    self._mark_changed("task")
                     return db_task
                 else:
                     raise ValueError(f"Task with ID {task_id} not found")
@@ -431,6 +484,7 @@ class DBUtils:
                 if task:
                     db.delete(task)
                     db.commit()
+                    self._mark_changed("task", "task_dataset", "result")
                     return "Task deleted successfully"
                 else:
                     raise ValueError(f"Task with ID {task_id} not found")
@@ -460,6 +514,7 @@ class DBUtils:
                 db.add(result)
                 db.commit()
                 db.refresh(result)
+                self._mark_changed("result")
                 return result
         except Exception as e:
             raise (f"Error creating result: {str(e)}")
@@ -510,6 +565,7 @@ class DBUtils:
                     db_result.value = new_value
                     db.commit()
                     db.refresh(db_result)
+                    self._mark_changed("result")
                     return db_result
                 else:
                     raise ValueError(f"Result with ID {result_id} not found")
@@ -536,6 +592,7 @@ class DBUtils:
                 if result:
                     db.delete(result)
                     db.commit()
+                    self._mark_changed("result")
                     return "Result deleted successfully"
                 else:
                     raise ValueError(f"Result with ID {result_id} not found")
@@ -0,0 +1,10 @@
+import enum
+
+
+# Enum for task status
+# Kept free of SQLAlchemy so tool signatures can use it without loading the ORM.
+class TaskStatus(enum.Enum):
+    QUEUED = "QUEUED"
+    RUNNING = "RUNNING"
+    SUCCESS = "SUCCESS"
+    FAILED = "FAILED"
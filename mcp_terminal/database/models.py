@@ -1,16 +1,9 @@
 from sqlalchemy import Integer, Column, String, Float, Enum, ForeignKey, Table
 from sqlalchemy.orm import declarative_base, relationship
-import enum
-
-Base = declarative_base()
 
+from database.enums import TaskStatus
 
-# Enum for task status
-class TaskStatus(enum.Enum):
-    QUEUED = "QUEUED"
-    RUNNING = "RUNNING"
-    SUCCESS = "SUCCESS"
-    FAILED = "FAILED"
+Base = declarative_base()
 
 
 # Association table for many-to-many between Task and Dataset
@@ -1,5 +1,9 @@
+from typing import Any, Generic, Literal, Optional, TypeVar
+
 from pydantic import BaseModel, Field
 
+T = TypeVar("T")
+
 
 class PyModel(BaseModel):
     """A Pydantic model representing a machine learning model in the database.
@@ -59,3 +63,141 @@ class PyResult(BaseModel):
     value: float = Field(..., description="The value of the result.")
 
     model_config = {"from_attributes": True}
+
+
+class PyVersioned(BaseModel, Generic[T]):
+    """A versioned read response returned when a read tool is called with `if_version`.
+    Attributes:
+        version (int): The data version the response reflects. Pass it back as `if_version` next time.
+        not_modified (bool): True when `if_version` is still current; `items` is then omitted.
+        items (Optional[list[T]]): The requested rows, or None when not modified.
+    """
+
+    version: int = Field(..., description="The data version the response reflects.")
+    not_modified: bool = Field(False, description="True when the caller's if_version is still current.")
+    items: Optional[list[T]] = Field(None, description="The requested rows, omitted when not modified.")
+
+
+class PyToolCall(BaseModel):
+    """A single tool invocation inside a batch_call request.
+    Attributes:
+        tool (str): The name of the tool to call.
+        arguments (dict[str, Any]): The arguments to pass to the tool.
+    """
+
+    tool: str = Field(..., description="The name of the tool to call.")
+    arguments: dict[str, Any] = Field(default_factory=dict, description="The arguments to pass to the tool.")
+
+
+class PyToolCallResult(BaseModel):
+    """The outcome of one tool invocation inside a batch_call response.
+    Attributes:
+        tool (str): The name of the tool that was called.
+        success (bool): False if the tool raised or could not be found.
+        content (Optional[str]): The text the tool returned, as a direct call would return it.
+        error (Optional[str]): The error message when success is False.
+        duration_ms (float): How long the call took inside the server.
+    """
+
+    tool: str = Field(..., description="The name of the tool that was called.")
+    success: bool = Field(..., description="False if the tool raised or could not be found.")
+    content: Optional[str] = Field(None, description="The text the tool returned.")
+    error: Optional[str] = Field(None, description="The error message when success is False.")
+    duration_ms: float = Field(..., description="How long the call took inside the server.")
+
+
+class PyFileEdit(BaseModel):
+    """A single edit inside an apply_file_edits request.
+    Attributes:
+        action (str): 'insert', 'delete' or 'update'.
+        row (Optional[int]): The 0-based row in the original file; for substring edits, None means every row.
+        content (str): The text to insert, the new row content, or the replacement for substring.
+        substring (Optional[str]): For delete/update, only remove or replace this text within the row.
+    """
+
+    action: Literal["insert", "delete", "update"] = Field(..., description="'insert', 'delete' or 'update'.")
+    row: Optional[int] = Field(
+        None, ge=0, description="The 0-based row in the original file; for substring edits, None means every row."
+    )
+    content: str = Field("", description="The text to insert, the new row content, or the replacement for substring.")
+    substring: Optional[str] = Field(
+        None, description="For delete/update, only remove or replace this text within the row."
+    )
+
+
+class PySearchMatch(BaseModel):
+    """A line matching a search_files pattern.
+    Attributes:
+        path (str): The file path relative to the searched directory.
+        line (int): The 0-based line number of the match.
+        text (str): The matching line.
+        before (list[str]): Context lines before the match.
+        after (list[str]): Context lines after the match.
+    """
+
+    path: str = Field(..., description="The file path relative to the searched directory.")
+    line: int = Field(..., description="The 0-based line number of the match.")
+    text: str = Field(..., description="The matching line.")
+    before: list[str] = Field(default_factory=list, description="Context lines before the match.")
+    after: list[str] = Field(default_factory=list, description="Context lines after the match.")
+
+
+class PySearchResult(BaseModel):
+    """The outcome of a search_files call.
+    Attributes:
+        matches (list[PySearchMatch]): Matches in path and line order.
+        files_searched (int): Number of files whose content was searched.
+        files_skipped (int): Number of binary, unreadable or oversized files that were skipped.
+        truncated (bool): True if the search stopped at max_results before searching every file.
+    """
+
+    matches: list[PySearchMatch] = Field(default_factory=list, description="Matches in path and line order.")
+    files_searched: int = Field(0, description="Number of files whose content was searched.")
+    files_skipped: int = Field(0, description="Number of binary, unreadable or oversized files that were skipped.")
+    truncated: bool = Field(False, description="True if the search stopped at max_results.")
+
+
+class PyCommandResult(BaseModel):
+    """The outcome of one command of an execute_commands call.
+    Attributes:
+        command (str): The command line.
+        status (str): 'succeeded', 'failed', 'timed_out', 'cancelled' (by fail_fast) or 'skipped' (never started).
+        return_code (Optional[int]): The exit code, if the command ran to completion.
+        stdout (str): Captured standard output.
+        stderr (str): Captured standard error.
+        duration_seconds (Optional[float]): Wall-clock run time.
+        cpu_user_seconds (Optional[float]): User CPU time of the command and its children.
+        cpu_system_seconds (Optional[float]): System CPU time of the command and its children.
+        max_rss_kb (Optional[int]): Peak resident memory in kilobytes.
+        exit_signal (Optional[str]): The signal that ended the command, if any.
+    """
+
+    command: str = Field(..., description="The command line.")
+    status: Literal["succeeded", "failed", "timed_out", "cancelled", "skipped"] = Field(
+        ..., description="'succeeded', 'failed', 'timed_out', 'cancelled' (stopped by fail_fast) or 'skipped'."
+    )
+    return_code: Optional[int] = Field(None, description="The exit code, if the command ran to completion.")
+    stdout: str = Field("", description="Captured standard output.")
+    stderr: str = Field("", description="Captured standard error.")
+    duration_seconds: Optional[float] = Field(None, description="Wall-clock run time.")
+    cpu_user_seconds: Optional[float] = Field(None, description="User CPU time of the command and its children.")
+    cpu_system_seconds: Optional[float] = Field(None, description="System CPU time of the command and its children.")
+    max_rss_kb: Optional[int] = Field(None, description="Peak resident memory in kilobytes.")
+    exit_signal: Optional[str] = Field(None, description="The signal that ended the command, if any.")
+
+
+class PyCommandBatchResult(BaseModel):
+    """The outcome of an execute_commands call.
+    Attributes:
+        results (list[PyCommandResult]): One result per command, in the order given.
+        succeeded (int): Number of commands that exited with code 0.
+        failed (int): Number of commands that failed, timed out or were cancelled.
+        skipped (int): Number of commands never started because of fail_fast.
+        wall_seconds (float): Wall-clock time of the whole batch.
+    """
+
+    results: list[PyCommandResult] = Field(default_factory=list, description="One result per command, in order.")
+    succeeded: int = Field(0, description="Number of commands that exited with code 0.")
+    failed: int = Field(0, description="Number of commands that failed, timed out or were cancelled.")
+    skipped: int = Field(0, description="Number of commands never started because of fail_fast.")
+    wall_seconds: float = Field(0.0, description="Wall-clock time of the whole batch.")
@@ -2,10 +2,11 @@ from contextlib import AsyncExitStack
 import os
 import json
 from typing import Any, Dict, List, Optional
-from mcp import ClientSession
+from mcp import ClientSession, types
 from mcp.client.sse import sse_client
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from pydantic import AnyUrl
 
 load_dotenv()
 
@@ -26,16 +27,28 @@ class MCPClient:
 
         self.system_prompt: str = ""
 
+        # Resource contents keyed by URI, invalidated by resources/updated notifications
+        self.resource_cache: Dict[str, str] = {}
+        self.subscribed_uris: set[str] = set()
+        # Count of resources/updated notifications per URI, to notice one arriving during a read
+        self.resource_updates: Dict[str, int] = {}
+        # Set from the server's capabilities; without subscriptions resources are never cached
+        self.can_subscribe = False
+
     async def connect(self):
         """Connect to the MCP server and list available tools."""
 
         # Connect to the server
         stdio_transport = await self.exit_stack.enter_async_context(sse_client("http://localhost:8050/sse"))
         self.stdio, self.write = stdio_transport
-        self.session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
+        self.session = await self.exit_stack.enter_async_context(
+            ClientSession(self.stdio, self.write, message_handler=self.handle_message)
+        )
 
         # Initialize the connection
-        await self.session.initialize()
+        initialize_result = await self.session.initialize()
+        resources = initialize_result.capabilities.resources
+        self.can_subscribe = bool(resources and resources.subscribe)
         print("Connected to MCP server.")
 
         # show available tools
@@ -44,65 +57,47 @@ class MCPClient:
         for tool in available_tools:
             print(tool["function"]["name"])
 
-        # Get database schema for system prompt
-        await self.session.call_tool("introspect_db", {})
-        self.system_prompt = """You are a helpful assistant that can interact with a database using the following schema definition
-        # Enum for task status
-        class TaskStatus(enum.Enum):
-            QUEUED = "QUEUED"
-            RUNNING = "RUNNING"
-            SUCCESS = "SUCCESS"
-            FAILED = "FAILED"
-
-        # Association table for many-to-many between Task and Dataset
-        task_dataset_association = Table(
-            "task_dataset",
-            Base.metadata,
-            Column("task_id", Integer, ForeignKey("task.task_id", ondelete="CASCADE"), primary_key=True),
-            Column("dataset_id", Integer, ForeignKey("dataset.dataset_id", ondelete="CASCADE"), primary_key=True)
+        # Get database schema for system prompt (cached until the server reports a change)
+        schema = json.loads(await self.read_resource("db://schema"))["schema"]
+        self.system_prompt = (
+            "You are a helpful assistant that can interact with a database using the following schema definition\n"
+            + schema
         )
 
-        class Model(Base):
-            __tablename__ = "model"
-            model_id = Column(Integer, primary_key=True, autoincrement=True)
-            model_name = Column(String, nullable=False)
-
-            tasks = relationship("Task", back_populates="model", cascade="all, delete")
+    async def handle_message(self, message: Any) -> None:
+        """Drop cached resources when the server sends a resources/updated notification."""
+        if isinstance(message, types.ServerNotification) and isinstance(
+            message.root, types.ResourceUpdatedNotification
+        ):
+            uri = str(message.root.params.uri)
+            self.resource_cache.pop(uri, None)
+            self.resource_updates[uri] = self.resource_updates.get(uri, 0) + 1
 
-        class Dataset(Base):
-            __tablename__ = "dataset"
-            dataset_id = Column(Integer, primary_key=True, autoincrement=True)
-            dataset_name = Column(String, nullable=False)
-
-            tasks = relationship(
-                "Task",
-                secondary=task_dataset_association,
-                back_populates="datasets"
-            )
+    async def read_resource(self, uri: str) -> str:
+        """Read an MCP resource, serving it from the local cache until the server reports a change.
 
-        class Task(Base):
-            __tablename__ = "task"
-            task_id = Column(Integer, primary_key=True, autoincrement=True)
-            model_id = Column(Integer, ForeignKey("model.model_id", ondelete="CASCADE"), nullable=False)
-            status = Column(Enum(TaskStatus), nullable=False)
-
-            model = relationship("Model", back_populates="tasks")
-            datasets = relationship(
-                "Dataset",
-                secondary=task_dataset_association,
-                back_populates="tasks"
-            )
-            result = relationship("Result", back_populates="task", uselist=False, cascade="all, delete")
+        Resources are only cached if the server supports subscriptions. The subscription is made before the
+        first read, so a change right after the read still invalidates the cached copy.
 
-        class Result(Base):
-            __tablename__ = "result"
-            result_id = Column(Integer, primary_key=True, autoincrement=True)
-            task_id = Column(Integer, ForeignKey("task.task_id", ondelete="CASCADE"), nullable=False)
-            value = Column(Float, nullable=False)
-            category = Column(String, nullable=True)
+        Args:
+            uri: The resource URI, e.g. db://models.
 
-            task = relationship("Task", back_populates="result")
+        Returns:
+            The text content of the resource.
         """
+        if uri in self.resource_cache:
+            return self.resource_cache[uri]
+        if self.can_subscribe and uri not in self.subscribed_uris:
+            await self.session.subscribe_resource(AnyUrl(uri))
+            self.subscribed_uris.add(uri)
+
+        updates = self.resource_updates.get(uri, 0)
+        result = await self.session.read_resource(AnyUrl(uri))
+        text = result.contents[0].text
+        # A notification that arrived while reading may be about a change the read did not see
+        if uri in self.subscribed_uris and self.resource_updates.get(uri, 0) == updates:
+            self.resource_cache[uri] = text
+        return text
 
     async def get_mcp_tools(self) -> List[Dict[str, Any]]:
         """Get available tools from the MCP server in OpenAI format.
@@ -154,21 +149,16 @@ class MCPClient:
 
         # Handle tool calls if present
         if assistant_message.tool_calls:
-            # Process each tool call
-            for tool_call in assistant_message.tool_calls:
-                # Execute tool call
-                print(f"Calling tool: {tool_call.function.name} with arguments: {tool_call.function.arguments}")
-                result = await self.session.call_tool(
-                    tool_call.function.name,
-                    arguments=json.loads(tool_call.function.arguments),
-                )
+            # Execute the tool calls; several independent calls go to the server as one batch_call
+            contents = await self.call_tools(assistant_message.tool_calls)
 
-                # Add tool response to conversation
+            # Add tool responses to conversation
+            for tool_call, content in zip(assistant_message.tool_calls, contents):
                 messages.append(
                     {
                         "role": "tool",
                         "tool_call_id": tool_call.id,
-                        "content": result.content[0].text,
+                        "content": content,
                     }
                 )
 
@@ -185,6 +175,40 @@ class MCPClient:
         # No tool calls, just return the direct response
         return assistant_message.content
 
+    async def call_tools(self, tool_calls: List[Any]) -> List[str]:
+        """Execute OpenAI tool calls against the MCP server.
+
+        A single call is sent directly. Multiple calls are sent as one batch_call request, which the
+        server runs concurrently, so the turn waits for the slowest call rather than for all of them in turn.
+
+        Args:
+            tool_calls: The tool calls from the assistant message.
+
+        Returns:
+            The text result of each call, in order.
+        """
+        for tool_call in tool_calls:
+            print(f"Calling tool: {tool_call.function.name} with arguments: {tool_call.function.arguments}")
+
+        if len(tool_calls) == 1:
+            result = await self.session.call_tool(
+                tool_calls[0].function.name,
+                arguments=json.loads(tool_calls[0].function.arguments),
+            )
+            return [result.content[0].text]
+
+        calls = [
+            {"tool": tool_call.function.name, "arguments": json.loads(tool_call.function.arguments)}
+            for tool_call in tool_calls
+        ]
+        result = await self.session.call_tool("batch_call", arguments={"calls": calls})
+        text = result.content[0].text
+        if result.isError or not text.startswith("["):
+            # The batch itself was rejected; report the same error for every call
+            return [text] * len(tool_calls)
+        batch_results = json.loads(text)
+        return [item["content"] if item["success"] else f"Error: {item['error']}" for item in batch_results]
+
     async def cleanup(self):
         """Clean up resources."""
         await self.exit_stack.aclose()
@@ -1,6 +1,6 @@
+import asyncio
 import os
 import sys
-import pandas as pd
 from mcp.server.fastmcp import FastMCP
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -21,23 +21,25 @@ def add_count():
     return tool.add_counter()
 
 
-@mcp.tool
-def python_tool(code: str, data: pd.Dataframe) -> str:
+@mcp.tool()
+async def python_tool(code: str, data: str) -> str:
     """
-    Executes the provided Python code in a restricted environment.
+    Executes the provided Python code in a sandbox worker process.
 
     If successful, returns the output of the code.
     If failed, returns an error message which will include ERROR: at the start.
 
     :param code: The code to run.
-    :param data: The pandas DataFrame to be used in the code to run.
+    :param data: JSON records loaded into the pandas DataFrame `df` used in the code to run.
     :return: the result from the python code if successful, otherwise returns an error message.
     """
-    result = tool.run_python_code(code, data)
+    # Waits for a worker in a thread, so other clients are served meanwhile
+    result = await asyncio.to_thread(tool.run_python_code, code, data)
     return result
 
 
 if __name__ == "__main__":
     transport = "sse"  #  stdio, sse
+    tool.start_workers()
     print(f"Python MCP server is running on {transport} transport...")
     mcp.run(transport=transport)
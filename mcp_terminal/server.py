@@ -1,71 +1,53 @@
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+import asyncio
+import hashlib
+import inspect
+import json
 import sys
 import os
-from typing import Optional
-
-from database.models import TaskStatus
-
+import time
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from fastmcp import Context, FastMCP
-from database.db_utils import DBUtils
-from database.pydantic_models import PyModel, PyResult, PyTask
-
-
-# Define a type-safe context class
-@dataclass
-class AppContext:
-    db: DBUtils  # Replace with your actual resource type
-
-
-# Create the lifespan context manager
-@asynccontextmanager
-async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
-    # Initialize resources on startup
-    db_utils = DBUtils(reset_db=False)  # Set reset_db=True to drop and recreate tables
-    try:
-        # Make resources available during operation
-        yield AppContext(db=db_utils)
-    finally:
-        # Clean up resources on shutdown
-        # await db_utils.disconnect()
-        print("Cleaning up resources...")
-
-
-# Create the MCP server instance
-mcp = FastMCP("mcp-demo", host="0.0.0.0", port=8050, lifespan=app_lifespan)
-# mcp.add_tool(execute_command)
-# mcp.add_tool(get_command_history)
-# mcp.add_tool(get_current_directory)
-# mcp.add_tool(delete_file_content)
-# mcp.add_tool(change_directory)
-# mcp.add_tool(list_directory)
-# mcp.add_tool(write_file)
-# mcp.add_tool(read_file)
-# mcp.add_tool(insert_file_content)
-# mcp.add_tool(update_file_content)
-
-# @mcp.tool()
-# def introspect_db(ctx: Context):
-#     """
-#     Retrieve the database schema and useful information about the database.
-#     """
-#     db = ctx.request_context.lifespan_context.db
-#     return db.introspect_schema()
-
-
-@mcp.tool("get_db_schema")
-def get_db_schema(ctx: Context) -> str:
-    """
-    Retrieve the database schema and useful information about the database.
-    This will return the CREATE TABLE scripts and associated relationships.
-    """
-    _ = ctx  # Reference ctx to avoid "not accessed" error
-    return """
+from database.enums import TaskStatus
+from database.pydantic_models import (
+    PyDataset,
+    PyModel,
+    PyResult,
+    PyTask,
+    PyToolCall,
+    PyToolCallResult,
+    PyVersioned,
+)
+from mcp.types import TextContent
+from pydantic import AnyUrl
+from services.resource_subscriptions import ResourceSubscriptions
+from services.response_cache import ResponseCache
+
+if TYPE_CHECKING:
+    # SQLAlchemy and dotenv are only imported when the first tool touches the database
+    from database.db_utils import DBUtils
+
+# Reference data published as subscribable MCP resources.
+SCHEMA_URI = "db://schema"
+MODELS_URI = "db://models"
+DATASETS_URI = "db://datasets"
+
+# Which resources go stale when a table changes
+TABLE_RESOURCES = {
+    "model": [MODELS_URI],
+    "dataset": [DATASETS_URI],
+}
+
+# Upper bound on the number of calls accepted by a single batch_call
+MAX_BATCH_CALLS = 50
+
+DB_SCHEMA = """
     # Enum for task status
         class TaskStatus(enum.Enum):
             QUEUED = "QUEUED"
@@ -123,25 +105,223 @@ def get_db_schema(ctx: Context) -> str:
             task = relationship("Task", back_populates="result")
         """
 
+# The schema only changes with the code, so a content hash is a stable version stamp.
+SCHEMA_VERSION = hashlib.sha256(DB_SCHEMA.encode("utf-8")).hexdigest()[:12]
+
+subscriptions = ResourceSubscriptions()
+
+
+# Push resources/updated to subscribed clients whenever reference rows change
+def on_table_changed(table: str, _version: int) -> None:
+    for uri in TABLE_RESOURCES.get(table, []):
+        subscriptions.notify(uri)
+
+
+# Define a type-safe context class
+@dataclass
+class AppContext:
+    _db: Optional["DBUtils"] = None
+    # Recent read-tool responses keyed by (tool, arguments, data version)
+    cache: ResponseCache = field(default_factory=ResponseCache)
+
+    @property
+    def db(self) -> "DBUtils":
+        """
+        The database utilities, created on first use so server startup does not pay for
+        importing SQLAlchemy and connecting to the database.
+        """
+        if self._db is None:
+            from database.db_utils import DBUtils
+
+            self._db = DBUtils(reset_db=False)  # Set reset_db=True to drop and recreate tables
+            self._db.add_change_listener(on_table_changed)
+        return self._db
+
+
+def read_with_cache(
+    ctx: Context,
+    tool: str,
+    arguments: dict[str, Any],
+    tables: tuple[str, ...],
+    if_version: Optional[int],
+    fetch: Callable[["DBUtils"], list],
+) -> list | PyVersioned:
+    """
+    Serve a read tool from the response cache, falling back to fetch(db) on a miss.
+
+    Returns the plain list when if_version is None. Otherwise returns a PyVersioned envelope,
+    which only carries the version when if_version is still current.
+    """
+    app: AppContext = ctx.request_context.lifespan_context
+    version = app.db.get_table_version(*tables)
+    if if_version is not None and if_version == version:
+        return PyVersioned(version=version, not_modified=True)
+
+    key = (tool, json.dumps(arguments, sort_keys=True, default=str), version)
+    items = app.cache.get(key)
+    if items is None:
+        items = fetch(app.db)
+        app.cache.put(key, items)
+
+    if if_version is None:
+        return items
+    return PyVersioned(version=version, items=items)
+
+
+# Create the lifespan context manager
+@asynccontextmanager
+async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
+    # Initialize resources on startup; the database itself is opened lazily by AppContext
+    subscriptions.bind_loop(asyncio.get_running_loop())
+    try:
+        # Make resources available during operation
+        yield AppContext()
+    finally:
+        # Clean up resources on shutdown
+        # await db_utils.disconnect()
+        print("Cleaning up resources...")
+
+
+# Create the MCP server instance
+mcp = FastMCP("mcp-demo", host="0.0.0.0", port=int(os.getenv("MCP_PORT", "8050")), lifespan=app_lifespan)
+# mcp.add_tool(execute_command)
+# mcp.add_tool(execute_commands)
+# mcp.add_tool(read_command_output)
+# mcp.add_tool(start_job)
+# mcp.add_tool(poll_job)
+# mcp.add_tool(get_job_output)
+# mcp.add_tool(cancel_job)
+# mcp.add_tool(list_jobs)
+# mcp.add_tool(get_command_history)
+# mcp.add_tool(search_command_history)
+# mcp.add_tool(get_current_directory)
+# mcp.add_tool(delete_file_content)
+# mcp.add_tool(change_directory)
+# mcp.add_tool(list_directory)
+# mcp.add_tool(list_files)
+# mcp.add_tool(search_files)
+# mcp.add_tool(summarize_tree)
+# mcp.add_tool(write_file)
+# mcp.add_tool(begin_write)
+# mcp.add_tool(write_chunk)
+# mcp.add_tool(commit_write)
+# mcp.add_tool(abort_write)
+# mcp.add_tool(read_file)
+# mcp.add_tool(tail_file)
+# mcp.add_tool(follow_file)
+# mcp.add_tool(insert_file_content)
+# mcp.add_tool(update_file_content)
+# mcp.add_tool(apply_file_edits)
+# mcp.add_tool(apply_patch)
+
+
+_get_capabilities = mcp._mcp_server.get_capabilities
+
+
+def _get_capabilities_with_subscribe(notification_options, experimental_capabilities):
+    """The lowlevel server always advertises resources.subscribe=False, even with the handlers below."""
+    capabilities = _get_capabilities(notification_options, experimental_capabilities)
+    if capabilities.resources is not None:
+        capabilities.resources.subscribe = True
+    return capabilities
+
+
+mcp._mcp_server.get_capabilities = _get_capabilities_with_subscribe
+
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_resource(uri: AnyUrl) -> None:
+    subscriptions.subscribe(str(uri), mcp._mcp_server.request_context.session)
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_resource(uri: AnyUrl) -> None:
+    subscriptions.unsubscribe(str(uri), mcp._mcp_server.request_context.session)
+
+
+@mcp.resource(SCHEMA_URI, mime_type="application/json")
+def schema_resource() -> str:
+    """
+    The database schema (CREATE TABLE definitions and relationships) with its version stamp.
+    """
+    return json.dumps({"version": SCHEMA_VERSION, "schema": DB_SCHEMA})
+
+
+@mcp.resource(MODELS_URI, mime_type="application/json")
+def models_resource(ctx: Context) -> str:
+    """
+    All models in the database with the version stamp of the model table.
+    Subscribe to receive resources/updated notifications when models change.
+    """
+    db: DBUtils = ctx.request_context.lifespan_context.db
+    version = db.get_table_version("model")
+    models = [PyModel.model_validate(model).model_dump() for model in db.get_model()]
+    return json.dumps({"version": version, "models": models})
+
+
+@mcp.resource(DATASETS_URI, mime_type="application/json")
+def datasets_resource(ctx: Context) -> str:
+    """
+    All datasets in the database with the version stamp of the dataset table.
+    Subscribe to receive resources/updated notifications when datasets change.
+    """
+    db: DBUtils = ctx.request_context.lifespan_context.db
+    version = db.get_table_version("dataset")
+    datasets = [PyDataset.model_validate(dataset).model_dump() for dataset in db.get_dataset()]
+    return json.dumps({"version": version, "datasets": datasets})
+
+
+# @mcp.tool()
+# def introspect_db(ctx: Context):
+#     """
+#     Retrieve the database schema and useful information about the database.
+#     """
+#     db = ctx.request_context.lifespan_context.db
+#     return db.introspect_schema()
+
+
+@mcp.tool("get_db_schema")
+def get_db_schema(ctx: Context) -> str:
+    """
+    Retrieve the database schema and useful information about the database.
+    This will return the CREATE TABLE scripts and associated relationships.
+    The same content is published as the cacheable `db://schema` resource.
+    """
+    _ = ctx  # Reference ctx to avoid "not accessed" error
+    return DB_SCHEMA
+
 
 @mcp.tool()
-def get_model(ctx: Context, model_id: Optional[str] = None) -> list[PyModel]:
+def get_model(
+    ctx: Context, model_id: Optional[str] = None, if_version: Optional[int] = None
+) -> list[PyModel] | PyVersioned[PyModel]:
     """
     Retrieve model(s) from the database.
 
     Args:
         model_id (Optional[str]): The specific model ID to retrieve. If None, returns all models.
+        if_version (Optional[int]): The version from a previous versioned response. If provided, the result is
+            wrapped in a PyVersioned envelope that omits the items when nothing changed since that version.
+            Pass -1 to get the current version on the first call.
 
     Returns:
         list[PyModel]: List of Pydantic Model objects. If model_id is provided, returns a list with one model.
+        PyVersioned[PyModel]: The versioned envelope when if_version is provided.
 
     Example:
         >>> all_models = get_model()  # Get all models
         >>> specific_model = get_model("123e4567-e89b-12d3-a456-426614174000")  # Get specific model
+        >>> response = get_model(if_version=-1)
+        >>> response = get_model(if_version=response.version)  # response.not_modified is True if unchanged
     """
-    db: DBUtils = ctx.request_context.lifespan_context.db
-    sqlalchemy_models = db.get_model(int(model_id) if model_id else None)
-    return [PyModel.model_validate(model) for model in sqlalchemy_models]
+    return read_with_cache(
+        ctx,
+        "get_model",
+        {"model_id": model_id},
+        ("model",),
+        if_version,
+        lambda db: [PyModel.model_validate(model) for model in db.get_model(int(model_id) if model_id else None)],
+    )
 
 
 @mcp.tool()
@@ -206,15 +386,21 @@ def update_model(ctx: Context, model_id: int, model_name: str) -> PyModel:
 
 
 @mcp.tool()
-def get_task(ctx: Context, task_id: Optional[str] = None) -> list[PyTask] | str:
+def get_task(
+    ctx: Context, task_id: Optional[str] = None, if_version: Optional[int] = None
+) -> list[PyTask] | PyVersioned[PyTask] | str:
     """
     Retrieve one or more tasks from the database.
 
     Args:
         task_id (Optional[str]): The specific task ID to retrieve. If None, returns all tasks.
+        if_version (Optional[int]): The version from a previous versioned response. If provided, the result is
+            wrapped in a PyVersioned envelope that omits the items when nothing changed since that version.
+            Pass -1 to get the current version on the first call.
 
     Returns:
         list[PyTask]: List of Pydantic Task objects if successful.
+        PyVersioned[PyTask]: The versioned envelope when if_version is provided.
         str: Error message if an error or exception occurs (e.g., not found, database error).
 
     Notes:
@@ -229,9 +415,14 @@ def get_task(ctx: Context, task_id: Optional[str] = None) -> list[PyTask] | str:
         ...     print(specific_task)
     """
     try:
-        db: DBUtils = ctx.request_context.lifespan_context.db
-        sqlalchemy_tasks = db.get_task(task_id)
-        return [PyTask.model_validate(task) for task in sqlalchemy_tasks]
+        return read_with_cache(
+            ctx,
+            "get_task",
+            {"task_id": task_id},
+            ("task", "task_dataset", "dataset"),
+            if_version,
+            lambda db: [PyTask.model_validate(task) for task in db.get_task(task_id)],
+        )
     except Exception as e:
         return f"Error retrieving tasks: {e}"
 
@@ -320,15 +511,21 @@ def update_task_status(ctx: Context, task_id: int, new_status: TaskStatus) -> Py
 
 
 @mcp.tool()
-def get_result(ctx: Context, result_id: Optional[str] = None) -> list[PyResult] | str:
+def get_result(
+    ctx: Context, result_id: Optional[str] = None, if_version: Optional[int] = None
+) -> list[PyResult] | PyVersioned[PyResult] | str:
     """
     Retrieve one or more results from the database.
 
     Args:
         result_id (Optional[str]): The specific result ID to retrieve. If None, returns all results.
+        if_version (Optional[int]): The version from a previous versioned response. If provided, the result is
+            wrapped in a PyVersioned envelope that omits the items when nothing changed since that version.
+            Pass -1 to get the current version on the first call.
 
     Returns:
         list[PyResult]: List of Pydantic Result objects if successful.
+        PyVersioned[PyResult]: The versioned envelope when if_version is provided.
         str: Error message if an error or exception occurs (e.g., not found, database error).
 
     Notes:
@@ -343,9 +540,16 @@ def get_result(ctx: Context, result_id: Optional[str] = None) -> list[PyResult]
         ...     print(specific_result)
     """
     try:
-        db: DBUtils = ctx.request_context.lifespan_context.db
-        sqlalchemy_results = db.get_result(int(result_id) if result_id else None)
-        return [PyResult.model_validate(result) for result in sqlalchemy_results]
+        return read_with_cache(
+            ctx,
+            "get_result",
+            {"result_id": result_id},
+            ("result",),
+            if_version,
+            lambda db: [
+                PyResult.model_validate(result) for result in db.get_result(int(result_id) if result_id else None)
+            ],
+        )
     except Exception as e:
         return f"Error retrieving results: {e}"
 
@@ -426,6 +630,61 @@ def delete_result(ctx: Context, result_id: int) -> str:
     return db.delete_result(result_id)
 
 
+@mcp.tool()
+async def batch_call(ctx: Context, calls: list[PyToolCall]) -> list[PyToolCallResult] | str:
+    """
+    Run several independent tool calls concurrently and return all of their results in one response.
+    Use this instead of separate tool calls when the calls do not depend on each other.
+
+    Args:
+        calls (list[PyToolCall]): The calls to make, each as {"tool": <tool name>, "arguments": {...}}.
+
+    Returns:
+        list[PyToolCallResult]: One result per call, in the same order as the calls.
+        str: Error message if the batch itself is invalid (e.g., too many calls).
+
+    Notes:
+        Calls run concurrently on worker threads that share the database connection pool, so the batch
+        takes about as long as its slowest call. Writes in the same batch have no guaranteed order.
+
+    Example:
+        >>> results = batch_call(ctx, [{"tool": "get_model", "arguments": {}},
+        ...                            {"tool": "get_task", "arguments": {"task_id": "3"}}])
+        >>> for result in results:
+        ...     print(result.tool, result.success, result.content)
+    """
+    if len(calls) > MAX_BATCH_CALLS:
+        return f"Error: batch_call accepts at most {MAX_BATCH_CALLS} calls, got {len(calls)}"
+
+    # Open the database (and its pool) once up front instead of racing to create it from worker threads
+    db: DBUtils = ctx.request_context.lifespan_context.db
+    semaphore = asyncio.Semaphore(db.DB_POOL_SIZE + db.DB_MAX_OVERFLOW)
+
+    async def run_call(call: PyToolCall) -> PyToolCallResult:
+        start = time.perf_counter()
+        try:
+            if call.tool == "batch_call":
+                raise ValueError("batch_call cannot be nested")
+            tool = await mcp.get_tool(call.tool)
+            async with semaphore:
+                if inspect.iscoroutinefunction(getattr(tool, "fn", None)):
+                    result = await tool.run(call.arguments)
+                else:
+                    # Sync tools would block the event loop; run each on its own worker thread.
+                    # to_thread copies the context, so the tool still sees the current request's Context.
+                    result = await asyncio.to_thread(asyncio.run, tool.run(call.arguments))
+            content = "\n".join(block.text for block in result.content if isinstance(block, TextContent))
+            return PyToolCallResult(
+                tool=call.tool, success=True, content=content, duration_ms=(time.perf_counter() - start) * 1000
+            )
+        except Exception as e:
+            return PyToolCallResult(
+                tool=call.tool, success=False, error=str(e), duration_ms=(time.perf_counter() - start) * 1000
+            )
+
+    return list(await asyncio.gather(*(run_call(call) for call in calls)))
+
+
 # @mcp.tool()
 # def execute_fetch_sql_tool(ctx: Context, command: str, timeout: int = 30) -> str:
 #     """
@@ -0,0 +1,51 @@
+import asyncio
+import weakref
+from typing import Optional
+
+from mcp.server.session import ServerSession
+from pydantic import AnyUrl
+
+
+class ResourceSubscriptions:
+    """
+    Tracks which MCP sessions subscribed to which resource URIs and pushes
+    `notifications/resources/updated` to them when the underlying data changes.
+
+    Sessions are held weakly so a disconnected client drops out on its own.
+    """
+
+    def __init__(self):
+        self.subscribers: dict[str, weakref.WeakSet[ServerSession]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Remember the server event loop so notify() can be called from synchronous code.
+        """
+        self.loop = loop
+
+    def subscribe(self, uri: str, session: ServerSession) -> None:
+        self.subscribers.setdefault(uri, weakref.WeakSet()).add(session)
+
+    def unsubscribe(self, uri: str, session: ServerSession) -> None:
+        sessions = self.subscribers.get(uri)
+        if sessions is not None:
+            sessions.discard(session)
+
+    def notify(self, uri: str) -> None:
+        """
+        Schedule an update notification for every session subscribed to the URI.
+        Safe to call from synchronous tool code or from another thread.
+        """
+        if self.loop is None or self.loop.is_closed() or not self.subscribers.get(uri):
+            return
+        self.loop.call_soon_threadsafe(lambda: self.loop.create_task(self._send_updated(uri)))
+
+    async def _send_updated(self, uri: str) -> None:
+        for session in list(self.subscribers.get(uri, ())):
+            try:
+                await session.send_resource_updated(AnyUrl(uri))
+            except Exception as e:
+                # The client went away; forget it.
+                print(f"Error sending resource update for {uri}: {e}")
+                self.unsubscribe(uri, session)
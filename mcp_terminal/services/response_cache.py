@@ -0,0 +1,48 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class ResponseCache:
+    """
+    A small LRU cache of recent read-tool responses.
+
+    Keys are expected to include the data version the response was built from, so entries never
+    need explicit invalidation: after a write the version changes and stale entries simply age out.
+    """
+
+    def __init__(self, maxsize: int = 128, max_items: int = 10_000):
+        """
+        Args:
+            maxsize: Maximum number of responses kept.
+            max_items: Responses with more rows than this are not cached, to bound memory.
+        """
+        self.maxsize = maxsize
+        self.max_items = max_items
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Read tools may run on worker threads (see batch_call)
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if isinstance(value, list) and len(value) > self.max_items:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from tools.file_access import read_lines
+from tools.file_search import compile_pattern, search_tree
+
+
+def _lines(root, pattern, regex=True):
+    result = search_tree(str(root), compile_pattern(pattern, regex, True), respect_gitignore=False)
+    return [(match.path, match.line, match.text) for match in result.matches]
+
+
+def test_anchored_patterns_match_inside_files(tmp_path):
+    (tmp_path / "a.py").write_text("import os\n\ndef foo():\n    return 1  \n")
+
+    assert _lines(tmp_path, r"^def ") == [("a.py", 2, "def foo():")]
+    assert _lines(tmp_path, r"^\s+return") == [("a.py", 3, "    return 1  ")]
+    assert _lines(tmp_path, r"1\s*$") == [("a.py", 3, "    return 1  ")]
+    assert _lines(tmp_path, r"\Aimport") == [("a.py", 0, "import os")]
+
+
+def test_line_numbers_are_rows_split_on_newline_only(tmp_path):
+    path = tmp_path / "f.txt"
+    path.write_bytes(b"x = 1\x0cy = 2\nprogress 50%\rprogress 100%\nz = 3 target\r\n")
+
+    [(_, line, text)] = _lines(tmp_path, "target", regex=False)
+    assert line == 2
+    assert text == "z = 3 target"
+    assert read_lines(str(path), line, line)[0] == ["z = 3 target\r\n"]
+    assert _lines(tmp_path, "target$") == [("f.txt", 2, "z = 3 target")]
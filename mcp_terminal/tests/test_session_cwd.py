@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from tools import terminal_tool
+from tools.output_capture import BoundedOutput
+from tools.shell_sessions import ShellSessionPool
+
+
+def test_cwd_survives_idle_eviction(tmp_path, monkeypatch):
+    pool = ShellSessionPool(idle_timeout=0)
+    monkeypatch.setattr(terminal_tool, "shell_sessions", pool)
+
+    async def scenario():
+        session = await pool.get(terminal_tool.DEFAULT_SESSION_KEY)
+        session.cwd = str(tmp_path)
+
+        # Getting another session evicts the first, which has been idle longer than the timeout
+        await pool.get("other")
+        assert terminal_tool.DEFAULT_SESSION_KEY not in pool.sessions
+
+        assert await terminal_tool.get_session_cwd() == str(tmp_path)
+        assert await terminal_tool.resolve_path("file.txt") == str(tmp_path / "file.txt")
+        await pool.close_all()
+
+    asyncio.run(scenario())
+
+
+def test_replacement_shell_starts_in_evicted_cwd(tmp_path):
+    pool = ShellSessionPool(max_sessions=1)
+
+    async def scenario():
+        try:
+            session = await pool.get("a")
+            assert await session.run(f"cd {tmp_path}", BoundedOutput(4096, 0), BoundedOutput(4096, 0)) == 0
+            assert session.cwd == str(tmp_path)
+
+            await pool.get("b")
+            assert "a" not in pool.sessions
+            assert not session.alive
+
+            replacement = await pool.get("a")
+            stdout = BoundedOutput(4096, 0)
+            assert await replacement.run("pwd", stdout, BoundedOutput(4096, 0)) == 0
+            assert stdout.text().strip() == str(tmp_path)
+        finally:
+            await pool.close_all()
+
+    asyncio.run(scenario())
+
+
+def test_remembered_cwds_are_bounded(tmp_path):
+    pool = ShellSessionPool(max_sessions=1, max_cwds=2)
+
+    async def scenario():
+        for key in ("a", "b", "c", "d"):
+            (await pool.get(key)).cwd = str(tmp_path / key)
+        assert list(pool.cwds) == ["b", "c"]
+        await pool.close_all()
+
+    asyncio.run(scenario())
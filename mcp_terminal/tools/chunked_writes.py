@@ -0,0 +1,159 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Uploads without a chunk for this many seconds are discarded along with their partial file
+UPLOAD_IDLE_TIMEOUT = 24 * 60 * 60
+
+# Largest chunk accepted at once, after decoding
+MAX_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Bytes read at a time when hashing a finished upload
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class ChunkedWrite:
+    """
+    A file written in chunks into a partial file next to its destination.
+
+    The destination is only replaced on commit, atomically, so readers never see a partly uploaded file
+    and a failed upload leaves the original untouched.
+    """
+
+    def __init__(self, path: str, total_size: Optional[int], sha256: Optional[str]):
+        self.id = uuid.uuid4().hex[:12]
+        # A symlink stays in place; the file it points to is what gets replaced
+        self.path = os.path.realpath(path)
+        self.total_size = total_size
+        self.sha256 = sha256.lower() if sha256 else None
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, self.temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(self.path)}.", suffix=".part"
+        )
+        os.close(descriptor)
+        self.received = 0
+        # Hash of bytes 0..received while chunks arrive in order; None once a chunk is resent
+        self.hash = hashlib.sha256()
+        self.last_activity = time.monotonic()
+        # Chunks are written from worker threads
+        self.lock = threading.Lock()
+
+    def write(self, offset: int, data: bytes) -> None:
+        """
+        Write a chunk. Offsets before the received size are allowed, so a chunk can be resent after a
+        dropped connection; offsets past it would leave a gap.
+
+        Raises:
+            ValueError: If the chunk leaves a gap or goes past the declared total size.
+        """
+        with self.lock:
+            if offset > self.received:
+                raise ValueError(f"Chunk at offset {offset} would leave a gap; {self.received} bytes received so far")
+            if self.total_size is not None and offset + len(data) > self.total_size:
+                raise ValueError(f"Chunk ends at {offset + len(data)}, past the declared size of {self.total_size}")
+            with open(self.temp_path, "r+b") as file:
+                file.seek(offset)
+                file.write(data)
+            if offset == self.received and self.hash is not None:
+                self.hash.update(data)
+            else:
+                self.hash = None
+            self.received = max(self.received, offset + len(data))
+            self.last_activity = time.monotonic()
+
+    def _digest(self) -> str:
+        if self.hash is not None:
+            return self.hash.hexdigest()
+        digest = hashlib.sha256()
+        with open(self.temp_path, "rb") as file:
+            while block := file.read(HASH_BLOCK_SIZE):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def commit(self, sha256: Optional[str] = None) -> str:
+        """
+        Verify the upload and atomically move it into place.
+
+        Returns:
+            The SHA-256 of the written file
+
+        Raises:
+            ValueError: If bytes are missing or the checksum does not match; the upload stays open so
+                chunks can be resent.
+        """
+        with self.lock:
+            if self.total_size is not None and self.received != self.total_size:
+                raise ValueError(f"Only {self.received} of {self.total_size} bytes have been received")
+            digest = self._digest()
+            expected = (sha256 or self.sha256 or "").lower()
+            if expected and digest != expected:
+                raise ValueError(f"Checksum mismatch: expected sha256 {expected}, got {digest}")
+
+            with open(self.temp_path, "r+b") as file:
+                os.fsync(file.fileno())
+            if os.path.exists(self.path):
+                shutil.copymode(self.path, self.temp_path)
+            os.replace(self.temp_path, self.path)
+            return digest
+
+    def abort(self) -> None:
+        try:
+            os.unlink(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+
+class ChunkedWriteManager:
+    """Open chunked writes, at most one per destination path; idle ones expire."""
+
+    def __init__(self, idle_timeout: float = UPLOAD_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.uploads: OrderedDict[str, ChunkedWrite] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def begin(
+        self, path: str, total_size: Optional[int] = None, sha256: Optional[str] = None
+    ) -> Tuple[ChunkedWrite, bool]:
+        """
+        Start a chunked write, or resume the open one for the same path.
+
+        Returns:
+            (upload, whether an existing upload was resumed)
+        """
+        self._expire()
+        path = os.path.realpath(path)
+        with self.lock:
+            for upload in self.uploads.values():
+                if upload.path == path:
+                    upload.last_activity = time.monotonic()
+                    return upload, True
+            upload = ChunkedWrite(path, total_size, sha256)
+            self.uploads[upload.id] = upload
+            return upload, False
+
+    def get(self, upload_id: str) -> Optional[ChunkedWrite]:
+        self._expire()
+        return self.uploads.get(upload_id)
+
+    def finish(self, upload_id: str) -> None:
+        """Forget an upload after it was committed or aborted, removing any partial file."""
+        with self.lock:
+            upload = self.uploads.pop(upload_id, None)
+        if upload is not None:
+            upload.abort()
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self.lock:
+            expired = [upload for upload in self.uploads.values() if now - upload.last_activity > self.idle_timeout]
+            for upload in expired:
+                del self.uploads[upload.id]
+        for upload in expired:
+            upload.abort()
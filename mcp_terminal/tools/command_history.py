@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# SQLite file the history is appended to; survives server restarts
+HISTORY_DB_PATH = os.getenv(
+    "COMMAND_HISTORY_DB", os.path.join(os.path.expanduser("~"), ".mcp_terminal", "command_history.db")
+)
+
+# Oldest entries are deleted once the history grows beyond this many commands
+MAX_HISTORY_ROWS = 100_000
+
+# Characters of the end of stdout/stderr stored with each command, so past results can be reused
+OUTPUT_TAIL_CHARS = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS command_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    command TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    return_code INTEGER,
+    duration_ms REAL,
+    cwd TEXT,
+    stdout_bytes INTEGER,
+    stderr_bytes INTEGER,
+    stdout_tail TEXT,
+    stderr_tail TEXT,
+    cpu_user_seconds REAL,
+    cpu_system_seconds REAL,
+    max_rss_kb INTEGER,
+    exit_signal TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_command_history_timestamp ON command_history (timestamp);
+CREATE INDEX IF NOT EXISTS ix_command_history_success ON command_history (success, timestamp);
+"""
+
+# Columns added after the first release, added to existing history files when they are opened
+ADDED_COLUMNS = {
+    "cpu_user_seconds": "REAL",
+    "cpu_system_seconds": "REAL",
+    "max_rss_kb": "INTEGER",
+    "exit_signal": "TEXT",
+}
+
+# Orderings available to search, most expensive or most recent first
+SORT_ORDERS = {
+    "time": "id DESC",
+    "duration": "duration_ms DESC",
+    "cpu": "(COALESCE(cpu_user_seconds, 0) + COALESCE(cpu_system_seconds, 0)) DESC",
+    "memory": "max_rss_kb DESC",
+}
+
+
+class CommandHistory:
+    """
+    Append-only command history stored in SQLite.
+
+    Falls back to an in-memory database if the history file cannot be opened, so a read-only home
+    directory only costs persistence.
+    """
+
+    def __init__(self, path: str = HISTORY_DB_PATH, max_rows: int = MAX_HISTORY_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        # Recording happens on the event loop and searches may come from worker threads
+        self.lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._inserts = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._connection = self._connect(self.path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error opening command history at {self.path}, keeping it in memory: {e}")
+                self._connection = self._connect(":memory:")
+        return self._connection
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        if path != ":memory:":
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        existing = {row["name"] for row in connection.execute("PRAGMA table_info(command_history)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in existing:
+                connection.execute(f"ALTER TABLE command_history ADD COLUMN {column} {column_type}")
+        return connection
+
+    def record(self, result: Dict, cwd: Optional[str], duration_ms: float) -> None:
+        """Append a run_command result."""
+        row = (
+            datetime.now().isoformat(),
+            result["command"],
+            int(result["success"]),
+            result["return_code"],
+            round(duration_ms, 1),
+            cwd,
+            result.get("stdout_bytes"),
+            result.get("stderr_bytes"),
+            result["stdout"][-OUTPUT_TAIL_CHARS:],
+            result["stderr"][-OUTPUT_TAIL_CHARS:],
+            result.get("cpu_user_seconds"),
+            result.get("cpu_system_seconds"),
+            result.get("max_rss_kb"),
+            result.get("exit_signal"),
+        )
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(
+                    "INSERT INTO command_history (timestamp, command, success, return_code, duration_ms, cwd, "
+                    "stdout_bytes, stderr_bytes, stdout_tail, stderr_tail, cpu_user_seconds, cpu_system_seconds, "
+                    "max_rss_kb, exit_signal) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                self._inserts += 1
+                # Trimming is amortised over many inserts instead of running on every command
+                if self._inserts % 1000 == 0:
+                    self.connection.execute(
+                        "DELETE FROM command_history WHERE id <= (SELECT MAX(id) FROM command_history) - ?",
+                        (self.max_rows,),
+                    )
+        except sqlite3.Error as e:
+            print(f"Error recording command history: {e}")
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        success: Optional[bool] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cwd: Optional[str] = None,
+        limit: int = 20,
+        sort_by: str = "time",
+    ) -> List[sqlite3.Row]:
+        """
+        Most recent entries first, or the most expensive with sort_by 'duration', 'cpu' or 'memory'.
+        All filters are optional and combined with AND.
+
+        Raises:
+            ValueError: If sort_by is unknown.
+        """
+        if sort_by not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort_by '{sort_by}'; use one of: {', '.join(SORT_ORDERS)}")
+        conditions = []
+        params: list = []
+        if query:
+            conditions.append("instr(command, ?) > 0")
+            params.append(query)
+        if success is not None:
+            conditions.append("success = ?")
+            params.append(int(success))
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            conditions.append("timestamp <= ?")
+            params.append(until.isoformat())
+        if cwd:
+            conditions.append("cwd = ?")
+            params.append(cwd)
+
+        sql = "SELECT * FROM command_history"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {SORT_ORDERS[sort_by]}, id DESC LIMIT ?"
+        params.append(limit)
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def recent(self, count: int) -> List[sqlite3.Row]:
+        """The last `count` entries, oldest first."""
+        return list(reversed(self.search(limit=count)))
@@ -0,0 +1,118 @@
+import bz2
+import gzip
+import io
+import lzma
+from typing import BinaryIO, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Leading bytes identifying each supported compression format
+MAGIC_NUMBERS = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+# Format picked by write_file when asked to compress based on the file name
+EXTENSIONS = {".gz": "gzip", ".gzip": "gzip", ".bz2": "bz2", ".xz": "xz", ".zst": "zstd", ".zstd": "zstd"}
+
+# Buffer size of decompressed streams
+READ_BUFFER_SIZE = 1024 * 1024
+
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """Compression format of data starting with `header`, or None if it is not compressed."""
+    for name, magic in MAGIC_NUMBERS.items():
+        if header.startswith(magic):
+            return name
+    return None
+
+
+def detect_file_compression(path: str) -> Optional[str]:
+    with open(path, "rb") as file:
+        return detect_compression(file.read(6))
+
+
+def compression_for_path(path: str) -> Optional[str]:
+    """Compression format implied by a file's extension."""
+    for extension, name in EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return name
+    return None
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ValueError("zstd support requires the 'zstandard' package")
+
+
+def decompressing_reader(file: BinaryIO, compression: str) -> BinaryIO:
+    """
+    Wrap a binary file in a reader that decompresses it as it is read.
+
+    Only as much of the file is decompressed as is read; forward seeks decompress and discard.
+    Concatenated streams (e.g. appended gzip members) are read as one.
+
+    Raises:
+        ValueError: If the format is unknown or its library is not installed.
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=file, mode="rb")
+    if compression == "bz2":
+        return bz2.BZ2File(file, mode="rb")
+    if compression == "xz":
+        return lzma.LZMAFile(file, mode="rb")
+    if compression == "zstd":
+        _require_zstandard()
+        reader = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True)
+        # The raw stream reader has no readline; buffering adds it
+        return io.BufferedReader(reader, buffer_size=READ_BUFFER_SIZE)
+    raise ValueError(f"Unsupported compression '{compression}'")
+
+
+def open_decompressed(path: str, compression: str) -> BinaryIO:
+    """
+    Open a compressed file for streaming reads of its decompressed content. Closing the reader also
+    closes the file.
+
+    Raises:
+        ValueError: If the format is unknown or its library is not installed.
+    """
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    if compression == "zstd":
+        _require_zstandard()
+        # zstandard.open cannot read across frames; closefd hands the file to the reader
+        file = open(path, "rb")  # noqa: SIM115
+        reader = zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader, buffer_size=READ_BUFFER_SIZE)
+    raise ValueError(f"Unsupported compression '{compression}'")
+
+
+def open_compressed_for_write(path: str, compression: str, append: bool = False) -> BinaryIO:
+    """
+    Open a file for writing compressed data. Appending adds a new compressed stream, which every
+    supported format reads back as a continuation of the earlier content.
+
+    Raises:
+        ValueError: If the format is unknown or its library is not installed.
+    """
+    mode = "ab" if append else "wb"
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "bz2":
+        return bz2.open(path, mode)
+    if compression == "xz":
+        return lzma.open(path, mode)
+    if compression == "zstd":
+        _require_zstandard()
+        return zstandard.ZstdCompressor().stream_writer(open(path, mode), closefd=True)
+    raise ValueError(f"Unsupported compression '{compression}'")
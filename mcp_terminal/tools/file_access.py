@@ -0,0 +1,369 @@
+import os
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from itertools import islice
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from tools.compression import detect_file_compression, open_decompressed
+
+# Bytes scanned at a time when counting newlines to find where a line starts
+SCAN_BLOCK_SIZE = 1024 * 1024
+
+# A line index checkpoint (line number and the offset it starts at) is kept about every this many bytes
+INDEX_CHECKPOINT_BYTES = 64 * 1024
+
+# Number of files whose line index is cached
+MAX_INDEXED_FILES = 64
+
+# Follow positions kept across sessions; the least recently used are forgotten beyond this
+MAX_FOLLOWED_FILES = 256
+
+
+class LineIndex:
+    """
+    Sparse line-number to byte-offset index of one version of a file.
+
+    Checkpoints are added as the file is scanned, so finding a line only scans from the nearest
+    checkpoint before it, and lines past the furthest checkpoint extend the index.
+    """
+
+    def __init__(self, version: Tuple[int, int, int]):
+        self.version = version
+        self.rows = [0]
+        self.offsets = [0]
+        # Known once the file has been scanned to the end
+        self.total_lines: Optional[int] = None
+        # Reads of the same file may run in several worker threads
+        self.lock = threading.Lock()
+
+    def locate(self, file: BinaryIO, row: int) -> Tuple[int, int]:
+        """Same as find_line_offset, using and extending the index."""
+        with self.lock:
+            if self.total_lines is not None and row >= self.total_lines:
+                return os.fstat(file.fileno()).st_size, self.total_lines
+            checkpoint = bisect_right(self.rows, row) - 1
+            return find_line_offset(file, row, self.offsets[checkpoint], self.rows[checkpoint], index=self)
+
+
+class LineIndexCache:
+    """Line indexes of recently read files, dropped when a file's mtime, size or inode changes."""
+
+    def __init__(self, max_files: int = MAX_INDEXED_FILES):
+        self.max_files = max_files
+        self.indexes: OrderedDict[str, LineIndex] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, stat: os.stat_result) -> LineIndex:
+        key = os.path.realpath(path)
+        version = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with self.lock:
+            index = self.indexes.get(key)
+            if index is None or index.version != version:
+                index = LineIndex(version)
+                self.indexes[key] = index
+            self.indexes.move_to_end(key)
+            while len(self.indexes) > self.max_files:
+                self.indexes.popitem(last=False)
+            return index
+
+    def invalidate(self, path: str) -> None:
+        """Forget a file's index; call after modifying it, as mtime granularity can hide quick rewrites."""
+        with self.lock:
+            self.indexes.pop(os.path.realpath(path), None)
+
+
+line_indexes = LineIndexCache()
+
+
+def find_line_offset(
+    file: BinaryIO, row: int, start: int = 0, start_row: int = 0, index: Optional[LineIndex] = None
+) -> Tuple[int, int]:
+    """
+    Find the byte offset where a 0-based line starts.
+
+    Newlines are counted a block at a time into one reused buffer, so only the part of the file before
+    the line is scanned and memory use stays constant.
+
+    Args:
+        file: File opened in binary mode
+        row: Line to find
+        start: Offset of a known line start to scan from
+        start_row: The line that starts at `start`
+        index: Line index to add checkpoints to while scanning past its last one
+
+    Returns:
+        (offset, row) if the line exists, otherwise (file size, number of lines in the file)
+    """
+    size = os.fstat(file.fileno()).st_size
+    record = index is not None and start_row == index.rows[-1]
+    buffer = bytearray(SCAN_BLOCK_SIZE)
+    block_start, line = start, start_row
+    offset = start if row <= start_row else None
+    file.seek(start)
+    while offset is None:
+        read = file.readinto(buffer)
+        if not read:
+            break
+        segment = 0
+        while segment < read:
+            end = read
+            if record:
+                # Segments end just after a newline, so each segment end is a line start to checkpoint
+                newline = buffer.find(b"\n", segment + INDEX_CHECKPOINT_BYTES, read)
+                if newline >= 0:
+                    end = newline + 1
+            newlines = buffer.count(b"\n", segment, end)
+            if line + newlines >= row:
+                position = segment - 1
+                for _ in range(row - line):
+                    position = buffer.index(b"\n", position + 1, end)
+                offset, line = block_start + position + 1, row
+                break
+            line += newlines
+            if record and end < read:
+                index.rows.append(line)
+                index.offsets.append(block_start + end)
+            segment = end
+        block_start += read
+
+    if offset is not None and offset < size:
+        return offset, line
+
+    # Reached the end of the file; a last line without a trailing newline still counts as a line
+    if offset is None and size:
+        file.seek(size - 1)
+        if file.read(1) != b"\n":
+            line += 1
+    if record:
+        index.total_lines = line
+    return size, line
+
+
+def split_lines(data: bytes) -> List[bytes]:
+    """
+    Lines of data, each keeping its b"\n". Unlike bytes.splitlines, a lone b"\r" (e.g. of a progress
+    bar) does not end a line, matching how find_line_offset counts lines.
+    """
+    lines = [line + b"\n" for line in data.split(b"\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+@contextmanager
+def _open_indexed(path: str) -> Iterator[Tuple[BinaryIO, LineIndex]]:
+    with open(path, "rb") as file:
+        yield file, line_indexes.get(path, os.fstat(file.fileno()))
+
+
+def count_lines(path: str) -> int:
+    """Number of lines in a file; cached until the file changes."""
+    with _open_indexed(path) as (file, index):
+        return index.locate(file, 2**63)[1]
+
+
+def read_lines(path: str, start_row: int, end_row: int) -> Tuple[List[str], Optional[int]]:
+    """
+    Read lines start_row..end_row (0-based, inclusive) without loading the rest of the file.
+
+    Compressed files are decompressed from the start only up to end_row.
+
+    Returns:
+        (lines, total) where total is the file's line count if the end of the file was reached, else None
+    """
+    compression = detect_file_compression(path)
+    if compression is not None:
+        return _read_compressed_lines(path, compression, start_row, end_row)
+
+    with _open_indexed(path) as (file, index):
+        offset, line = index.locate(file, start_row)
+        size = os.fstat(file.fileno()).st_size
+        if offset >= size:
+            return [], line
+
+        file.seek(offset)
+        lines = []
+        while line <= end_row:
+            data = file.readline()
+            if not data:
+                break
+            lines.append(data.decode("utf-8", errors="replace"))
+            line += 1
+        return lines, (line if file.tell() >= size else None)
+
+
+def _skip_lines(file: BinaryIO, count: int) -> Tuple[int, bytes]:
+    """
+    Skip `count` lines of a stream, counting newlines a block at a time.
+
+    Returns:
+        (lines skipped, data already read past them)
+    """
+    skipped, last = 0, b""
+    while skipped < count:
+        block = file.read(SCAN_BLOCK_SIZE)
+        if not block:
+            # A last line without a trailing newline still counts as a line
+            return skipped + (1 if last and not last.endswith(b"\n") else 0), b""
+        newlines = block.count(b"\n")
+        if skipped + newlines >= count:
+            position = -1
+            for _ in range(count - skipped):
+                position = block.index(b"\n", position + 1)
+            return count, block[position + 1 :]
+        skipped += newlines
+        last = block
+    return skipped, b""
+
+
+def _read_compressed_lines(
+    path: str, compression: str, start_row: int, end_row: int
+) -> Tuple[List[str], Optional[int]]:
+    with open_decompressed(path, compression) as file:
+        skipped, rest = _skip_lines(file, start_row)
+        if skipped < start_row:
+            return [], skipped
+        wanted = end_row - start_row + 1
+        lines = split_lines(rest)
+        if lines and not lines[-1].endswith(b"\n"):
+            lines[-1] += file.readline()
+        lines = lines[:wanted]
+        lines.extend(islice(file, wanted - len(lines)))
+        total = None if len(lines) == wanted else start_row + len(lines)
+        return [line.decode("utf-8", errors="replace") for line in lines], total
+
+
+def read_bytes(path: str, offset: int, length: int) -> bytes:
+    """Read `length` bytes of a file from `offset`; for compressed files, offsets are into the decompressed data."""
+    compression = detect_file_compression(path)
+    with open(path, "rb") if compression is None else open_decompressed(path, compression) as file:
+        file.seek(offset)
+        return file.read(length)
+
+
+def tail_lines(path: str, count: int) -> Tuple[List[str], int]:
+    """
+    Read the last `count` lines by reading blocks backwards from the end of the file.
+
+    Compressed files cannot be read backwards, so they are decompressed in one streaming pass.
+
+    Returns:
+        (lines, offset of the first returned line, into the decompressed data for compressed files)
+    """
+    compression = detect_file_compression(path)
+    if compression is not None:
+        return _tail_compressed_lines(path, compression, count)
+
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        position = size
+        data = b""
+        # A trailing newline ends the last line rather than starting an empty one
+        wanted = count + 1 if size else count
+        while position > 0 and data.count(b"\n") < wanted:
+            read = min(SCAN_BLOCK_SIZE, position)
+            position -= read
+            file.seek(position)
+            data = file.read(read) + data
+
+        lines = split_lines(data)
+        if position > 0 or len(lines) > count:
+            # The first line is partial or not wanted
+            lines = lines[-count:] if count else []
+        offset = size - sum(len(line) for line in lines)
+        return [line.decode("utf-8", errors="replace") for line in lines], offset
+
+
+def _tail_compressed_lines(path: str, compression: str, count: int) -> Tuple[List[str], int]:
+    # Only the trailing blocks holding the last count + 1 newlines are kept while decompressing
+    blocks: deque = deque()
+    newlines, size, dropped = 0, 0, False
+    with open_decompressed(path, compression) as file:
+        while True:
+            block = file.read(SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            blocks.append((block, block.count(b"\n")))
+            newlines += blocks[-1][1]
+            while newlines - blocks[0][1] > count:
+                newlines -= blocks.popleft()[1]
+                dropped = True
+
+    lines = split_lines(b"".join(block for block, _ in blocks))
+    if dropped or len(lines) > count:
+        lines = lines[-count:] if count else []
+    offset = size - sum(len(line) for line in lines)
+    return [line.decode("utf-8", errors="replace") for line in lines], offset
+
+
+def _complete_utf8(data: bytes) -> bytes:
+    """data without a UTF-8 sequence cut off at its end, so the next read can start with the whole character."""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        # Continuation bytes are 10xxxxxx; look back to the byte that starts the last sequence
+        if byte & 0xC0 == 0x80:
+            continue
+        length = 4 if byte >= 0xF0 else 3 if byte >= 0xE0 else 2 if byte >= 0xC0 else 1
+        return data[:-back] if length > back else data
+    return data
+
+
+class FollowPositions:
+    """Per-session read positions of followed files, so each call returns only newly appended bytes."""
+
+    def __init__(self, max_entries: int = MAX_FOLLOWED_FILES):
+        self.max_entries = max_entries
+        # (session, real path) -> (offset, inode)
+        self.positions: OrderedDict[Tuple[str, str], Tuple[int, int]] = OrderedDict()
+
+    def follow(self, session: str, path: str, max_bytes: int, initial_lines: int) -> Dict:
+        """
+        Read what was appended since this session's last call, or the last lines on the first call.
+
+        If the file shrank or was replaced (e.g. log rotation), reading restarts from its beginning.
+
+        Returns:
+            Dictionary with text, status ('started', 'appended' or 'reset'), start and end offsets, file
+            size and whether more new data remains
+        """
+        key = (session, os.path.realpath(path))
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            state = self.positions.get(key)
+            if state is None:
+                lines, start = tail_lines(path, initial_lines)
+                text, status, end = "".join(lines), "started", stat.st_size
+                more = False
+            else:
+                start, inode = state
+                status = "appended"
+                if inode != stat.st_ino or stat.st_size < start:
+                    start, status = 0, "reset"
+                file.seek(start)
+                data = file.read(max_bytes)
+                more = start + len(data) < stat.st_size
+                # A character cut at the end of the read is returned whole by the next call, unless max_bytes
+                # is too small to ever hold it
+                complete = _complete_utf8(data)
+                if complete or max_bytes >= 4:
+                    data = complete
+                end = start + len(data)
+                text = data.decode("utf-8", errors="replace")
+
+        self.positions[key] = (end, stat.st_ino)
+        self.positions.move_to_end(key)
+        while len(self.positions) > self.max_entries:
+            self.positions.popitem(last=False)
+        return {
+            "text": text,
+            "status": status,
+            "start": start,
+            "end": end,
+            "size": stat.st_size,
+            # A character still being written at the end of the file does not count as more
+            "more": more,
+        }
@@ -0,0 +1,192 @@
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from database.pydantic_models import PyFileEdit
+from tools.file_access import count_lines, line_indexes
+
+# Bytes copied at a time between edited rows
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+class _RowEdits:
+    """Everything that happens to one row of the original file."""
+
+    def __init__(self):
+        self.inserts: List[bytes] = []
+        self.delete = False
+        self.update: Optional[bytes] = None
+        self.substitutions: List[Tuple[bytes, bytes]] = []
+
+
+class _Output:
+    """Destination file that remembers whether it currently ends with a newline."""
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.empty = True
+        self.ends_with_newline = False
+
+    def write(self, data: bytes) -> None:
+        if data:
+            self.file.write(data)
+            self.empty = False
+            self.ends_with_newline = data.endswith(b"\n")
+
+
+def _as_lines(content: str) -> bytes:
+    data = content.encode("utf-8")
+    if data and not data.endswith(b"\n"):
+        data += b"\n"
+    return data
+
+
+def _substitute(line: bytes, substitutions: List[Tuple[bytes, bytes]]) -> bytes:
+    updated = line
+    for old, new in substitutions:
+        updated = updated.replace(old, new)
+    # Keep the row's line ending even if the replacement removed it
+    if line.endswith(b"\n") and not updated.endswith(b"\n"):
+        updated += b"\n"
+    return updated
+
+
+def _plan(edits: List[PyFileEdit], total_lines: int) -> Tuple[Dict[int, _RowEdits], List[Tuple[bytes, bytes]]]:
+    """Group edits by original row, validating them. Returns (edits per row, substitutions for every row)."""
+    rows: Dict[int, _RowEdits] = {}
+    every_row: List[Tuple[bytes, bytes]] = []
+    for number, edit in enumerate(edits):
+        if edit.action == "insert":
+            # Without a row, insert appends to the end of the file
+            row = total_lines if edit.row is None else edit.row
+            rows.setdefault(row, _RowEdits()).inserts.append(_as_lines(edit.content))
+            continue
+
+        if edit.substring is not None:
+            if not edit.substring:
+                raise ValueError(f"Edit {number}: substring must not be empty")
+            substitution = (
+                edit.substring.encode("utf-8"),
+                b"" if edit.action == "delete" else edit.content.encode("utf-8"),
+            )
+            if edit.row is None:
+                every_row.append(substitution)
+                continue
+        elif edit.row is None:
+            raise ValueError(f"Edit {number}: row is required to {edit.action} a whole row")
+
+        if edit.row >= total_lines:
+            raise ValueError(f"Edit {number}: row {edit.row} is out of range (file has {total_lines} lines)")
+        row_edits = rows.setdefault(edit.row, _RowEdits())
+        if edit.substring is not None:
+            row_edits.substitutions.append(substitution)
+        elif edit.action == "delete":
+            row_edits.delete = True
+        else:
+            if row_edits.update is not None:
+                raise ValueError(f"Edit {number}: row {edit.row} is updated more than once")
+            row_edits.update = _as_lines(edit.content) or b"\n"
+
+        if (row_edits.delete or row_edits.update is not None) and row_edits.substitutions:
+            raise ValueError(f"Edit {number}: row {edit.row} is replaced or deleted and also has substring edits")
+        if row_edits.delete and row_edits.update is not None:
+            raise ValueError(f"Edit {number}: row {edit.row} is both deleted and updated")
+    return rows, every_row
+
+
+def _edit_row(line: bytes, row_edits: Optional[_RowEdits], every_row: List[Tuple[bytes, bytes]], counts: Dict) -> bytes:
+    """The output for one original row: inserted content, then the row as edited."""
+    if row_edits is None:
+        if not every_row:
+            return line
+        updated = _substitute(line, every_row)
+        counts["substituted"] += updated != line
+        return updated
+
+    counts["inserted"] += sum(content.count(b"\n") for content in row_edits.inserts)
+    output = b"".join(row_edits.inserts)
+    if row_edits.delete:
+        counts["deleted"] += 1
+        return output
+    if row_edits.update is not None:
+        counts["updated"] += 1
+        return output + row_edits.update
+    updated = _substitute(line, row_edits.substitutions + every_row)
+    counts["substituted"] += updated != line
+    return output + updated
+
+
+def _copy_range(source: BinaryIO, output: _Output, start: int, end: int) -> None:
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        data = source.read(min(COPY_BLOCK_SIZE, remaining))
+        if not data:
+            return
+        output.write(data)
+        remaining -= len(data)
+
+
+def apply_edits(path: str, edits: List[PyFileEdit]) -> Dict[str, int]:
+    """
+    Apply a batch of row and substring edits to a file in one pass and atomically replace it.
+
+    Rows in all edits refer to the original file, so edits do not shift each other's rows. The file is
+    streamed once into a temp file next to it, which then replaces the original with os.replace, so
+    readers never see a partly written file. Only the edited rows are parsed unless there are substring
+    edits for every row; unchanged spans are copied in blocks.
+
+    Returns:
+        Counts of inserted, deleted, updated and substituted lines
+
+    Raises:
+        ValueError: If an edit is invalid or conflicts with another edit.
+    """
+    # Edit the file a symlink points to; replacing the link itself would turn it into a regular file
+    path = os.path.realpath(path)
+    total_lines = count_lines(path)
+    rows, every_row = _plan(edits, total_lines)
+    counts = {"inserted": 0, "deleted": 0, "updated": 0, "substituted": 0}
+
+    directory = os.path.dirname(path)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with open(path, "rb") as source, os.fdopen(descriptor, "wb") as destination:
+            output = _Output(destination)
+            if every_row:
+                for row, line in enumerate(source):
+                    output.write(_edit_row(line, rows.get(row), every_row, counts))
+            else:
+                index = line_indexes.get(path, os.fstat(source.fileno()))
+                position = 0
+                for row in sorted(row for row in rows if row < total_lines):
+                    offset, _ = index.locate(source, row)
+                    _copy_range(source, output, position, offset)
+                    source.seek(offset)
+                    line = source.readline()
+                    output.write(_edit_row(line, rows[row], every_row, counts))
+                    position = offset + len(line)
+                size = os.fstat(source.fileno()).st_size
+                _copy_range(source, output, position, size)
+
+            # Inserts at or beyond the end of the original file, each padded with empty lines to start at its
+            # row of the output; current counts the lines written past the original file's end
+            current = total_lines
+            for row in sorted(row for row in rows if row >= total_lines):
+                if not output.empty and not output.ends_with_newline:
+                    output.write(b"\n")
+                padding = max(0, row - current)
+                inserted = _edit_row(b"", rows[row], [], counts)
+                output.write(b"\n" * padding)
+                output.write(inserted)
+                current += padding + inserted.count(b"\n")
+
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    finally:
+        line_indexes.invalidate(path)
+    return counts
@@ -0,0 +1,168 @@
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Pattern
+
+from database.pydantic_models import PySearchMatch, PySearchResult
+from tools.compression import decompressing_reader, detect_compression
+from tools.tree_walk import TreeEntry, glob_matches, walk_tree
+
+# Worker threads reading and searching files
+SEARCH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+
+# Files larger than this (after decompression for compressed files) are skipped
+MAX_SEARCH_FILE_SIZE = 10 * 1024 * 1024
+
+# Bytes checked for a NUL byte to detect binary files
+BINARY_CHECK_BYTES = 8192
+
+# Files handed to a worker at a time; batching keeps per-task overhead low for trees of small files
+FILES_PER_TASK = 64
+
+# Matching lines longer than this are shortened in results
+MAX_LINE_CHARS = 500
+
+
+def compile_pattern(pattern: str, regex: bool, case_sensitive: bool) -> Pattern:
+    """
+    Raises:
+        ValueError: If the regex is invalid.
+    """
+    try:
+        return re.compile(pattern if regex else re.escape(pattern), 0 if case_sensitive else re.IGNORECASE)
+    except re.error as e:
+        raise ValueError(f"Invalid regex: {e}") from e
+
+
+def _is_literal(pattern: str) -> bool:
+    """Whether a pattern only matches its own text, as it does for a search with regex=False."""
+    return re.escape(re.sub(r"\\(.)", r"\1", pattern, flags=re.DOTALL)) == pattern
+
+
+def _shorten(line: str) -> str:
+    line = line.rstrip("\r\n")
+    return line if len(line) <= MAX_LINE_CHARS else line[:MAX_LINE_CHARS] + "..."
+
+
+def search_file(
+    path: str, relative_path: str, compiled: Pattern, context_lines: int, limit: int, stop: threading.Event
+) -> Optional[List[PySearchMatch]]:
+    """
+    Matches in one file (at most `limit`), or None if it was skipped as binary, unreadable or too large.
+
+    Compressed files are searched in their decompressed form.
+    """
+    if stop.is_set():
+        return []
+    try:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size > MAX_SEARCH_FILE_SIZE:
+                return None
+            data = file.read()
+    except OSError:
+        return None
+    compression = detect_compression(data[:6])
+    if compression is not None:
+        try:
+            with decompressing_reader(io.BytesIO(data), compression) as reader:
+                data = reader.read(MAX_SEARCH_FILE_SIZE + 1)
+        except Exception:
+            # Corrupt data or a format whose library is not installed
+            return None
+        if len(data) > MAX_SEARCH_FILE_SIZE:
+            return None
+    if b"\0" in data[:BINARY_CHECK_BYTES]:
+        return None
+
+    text = data.decode("utf-8", errors="replace")
+    # Most files do not match at all; one search over the whole text rules them out quickly. Only safe
+    # for literal text: anchors, lookarounds and classes like \s can match differently across lines
+    if _is_literal(compiled.pattern) and compiled.search(text) is None:
+        return []
+
+    # Lines end at "\n" only, like the rows of read_file and the edit tools; "\r" of CRLF is not matched
+    lines = text.split("\n")
+    if not lines[-1]:
+        lines.pop()
+    if "\r" in text:
+        lines = [line[:-1] if line.endswith("\r") else line for line in lines]
+    matches = []
+    for number, line in enumerate(lines):
+        if compiled.search(line) is None:
+            continue
+        matches.append(
+            PySearchMatch(
+                path=relative_path,
+                line=number,
+                text=_shorten(line),
+                before=[_shorten(previous) for previous in lines[max(0, number - context_lines) : number]],
+                after=[_shorten(following) for following in lines[number + 1 : number + 1 + context_lines]],
+            )
+        )
+        if len(matches) >= limit or stop.is_set():
+            break
+    return matches
+
+
+def _search_files(
+    entries: List[TreeEntry], compiled: Pattern, context_lines: int, limit: int, stop: threading.Event
+) -> List[Optional[List[PySearchMatch]]]:
+    return [search_file(entry.path, entry.relative_path, compiled, context_lines, limit, stop) for entry in entries]
+
+
+def search_tree(
+    root: str,
+    compiled: Pattern,
+    glob: Optional[str] = None,
+    exclude: Optional[List[str]] = None,
+    respect_gitignore: bool = True,
+    include_hidden: bool = False,
+    context_lines: int = 0,
+    max_results: int = 200,
+    on_matches: Optional[Callable[[List[PySearchMatch]], None]] = None,
+) -> PySearchResult:
+    """
+    Search every text file under root on a thread pool.
+
+    Results are collected in walk order, so they are deterministic. Once max_results is reached the
+    remaining files are cancelled and running searches stop at their next line.
+
+    Args:
+        on_matches: Called from the calling thread with each file's matches, in order, as they arrive
+    """
+    files = [
+        entry
+        for entry in walk_tree(root, None, respect_gitignore, include_hidden, exclude, with_stat=False)
+        if not entry.is_dir and (not glob or glob_matches(glob, entry.relative_path))
+    ]
+
+    result = PySearchResult()
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        futures = [
+            executor.submit(
+                _search_files, files[start : start + FILES_PER_TASK], compiled, context_lines, max_results, stop
+            )
+            for start in range(0, len(files), FILES_PER_TASK)
+        ]
+        for future in futures:
+            if stop.is_set():
+                future.cancel()
+                continue
+            for matches in future.result():
+                if stop.is_set():
+                    break
+                if matches is None:
+                    result.files_skipped += 1
+                    continue
+                result.files_searched += 1
+                matches = matches[: max_results - len(result.matches)]
+                result.matches.extend(matches)
+                if matches and on_matches is not None:
+                    on_matches(matches)
+                if len(result.matches) >= max_results:
+                    result.truncated = True
+                    stop.set()
+    return result
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import platform
+import signal
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+
+from tools.output_capture import BoundedOutput
+from tools.shell_sessions import STREAM_CHUNK_SIZE
+
+# Maximum number of jobs running at the same time
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "4"))
+
+# Finished jobs kept for polling; the oldest are forgotten beyond this
+MAX_FINISHED_JOBS = 50
+
+# Bytes of each job's stdout/stderr kept in memory; the complete output is always spooled to disk
+JOB_HEAD_BYTES = 16 * 1024
+JOB_TAIL_BYTES = 16 * 1024
+
+# Seconds a cancelled job gets to exit after SIGTERM before it is killed
+CANCEL_GRACE_PERIOD = 5
+
+# Seconds the output pipes get to reach EOF after a job's shell exits, before whatever it left running in
+# the background (and still holding the pipes) is killed
+PIPE_DRAIN_TIMEOUT = 2
+
+# Seconds between checks whether a job's shell has exited
+EXIT_POLL_INTERVAL = 0.1
+
+
+def kill_process_group(process: asyncio.subprocess.Process, sig: Optional[int] = None) -> None:
+    """Signal (SIGKILL by default) a process started with start_new_session=True and everything it spawned."""
+    try:
+        if platform.system() == "Windows":
+            process.kill()
+        else:
+            os.killpg(process.pid, signal.SIGKILL if sig is None else sig)
+    except ProcessLookupError:
+        pass
+
+
+async def wait_for_leader(process: asyncio.subprocess.Process) -> int:
+    """
+    Return code of a job's shell once it exits.
+
+    process.wait() also waits until the stdout/stderr pipes close, which a background grandchild such
+    as `(sleep 300 &)` can hold open long after the shell exited. waitid with WNOWAIT sees the exit
+    without reaping the process, which stays asyncio's job.
+    """
+    if platform.system() == "Windows" or not hasattr(os, "waitid"):
+        return await process.wait()
+    while process.returncode is None:
+        try:
+            result = os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT)
+        except ChildProcessError:
+            # Already reaped by asyncio's child watcher, which sets returncode
+            result = None
+        if result is not None:
+            if result.si_code in (os.CLD_KILLED, os.CLD_DUMPED):
+                return -result.si_status
+            return result.si_status
+        await asyncio.sleep(EXIT_POLL_INTERVAL)
+    return process.returncode
+
+
+class Job:
+    """A command running in the background in its own process group."""
+
+    def __init__(self, command: str, cwd: str):
+        self.id = uuid.uuid4().hex[:8]
+        self.command = command
+        self.cwd = cwd
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.return_code: Optional[int] = None
+        self.cancelled = False
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.stdout = BoundedOutput(JOB_HEAD_BYTES, JOB_TAIL_BYTES, spool=True, name="stdout")
+        self.stderr = BoundedOutput(JOB_HEAD_BYTES, JOB_TAIL_BYTES, spool=True, name="stderr")
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is None:
+            return "running"
+        if self.cancelled:
+            return "cancelled"
+        return "completed" if self.return_code == 0 else "failed"
+
+    @property
+    def duration(self) -> str:
+        return str((self.finished_at or datetime.now()) - self.started_at)
+
+    async def start(self) -> None:
+        self.process = await asyncio.create_subprocess_shell(
+            self.command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=self.cwd,
+            executable=None if platform.system() == "Windows" else "/bin/bash",
+            # Own process group, so cancelling kills grandchildren too
+            start_new_session=True,
+        )
+        self.task = asyncio.create_task(self._wait())
+
+    async def _wait(self) -> None:
+        readers = asyncio.gather(
+            _copy_stream(self.process.stdout, self.stdout), _copy_stream(self.process.stderr, self.stderr)
+        )
+        try:
+            self.return_code = await wait_for_leader(self.process)
+            try:
+                await asyncio.wait_for(asyncio.shield(readers), PIPE_DRAIN_TIMEOUT)
+            except asyncio.TimeoutError:
+                # The job is over when its shell is; processes it left behind would hold its slot
+                kill_process_group(self.process)
+                try:
+                    await asyncio.wait_for(readers, PIPE_DRAIN_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # Held by a process outside the job's process group
+                    pass
+        finally:
+            if self.return_code is None:
+                kill_process_group(self.process)
+                self.return_code = await wait_for_leader(self.process)
+            readers.cancel()
+            self.finished_at = datetime.now()
+            self.stdout.close()
+            self.stderr.close()
+
+    async def cancel(self, grace_period: float = CANCEL_GRACE_PERIOD) -> None:
+        """Send SIGTERM to the job's process group, then SIGKILL if it has not exited after grace_period."""
+        if self.finished_at is not None:
+            return
+        self.cancelled = True
+        kill_process_group(self.process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(asyncio.shield(self.task), grace_period)
+        except asyncio.TimeoutError:
+            kill_process_group(self.process)
+            await self.task
+
+
+async def _copy_stream(stream: asyncio.StreamReader, capture: BoundedOutput) -> None:
+    while True:
+        data = await stream.read(STREAM_CHUNK_SIZE)
+        if not data:
+            return
+        capture.write(data)
+
+
+class JobManager:
+    """Starts background jobs, caps how many run at once and keeps recent finished ones for polling."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_JOBS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_concurrent = max_concurrent
+        self.max_finished = max_finished
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+
+    def running(self) -> List[Job]:
+        return [job for job in self.jobs.values() if job.finished_at is None]
+
+    async def start(self, command: str, cwd: str) -> Job:
+        """
+        Raises:
+            RuntimeError: If max_concurrent jobs are already running.
+        """
+        if len(self.running()) >= self.max_concurrent:
+            raise RuntimeError(
+                f"{self.max_concurrent} jobs are already running; wait for one to finish or cancel one first"
+            )
+        job = Job(command, cwd)
+        try:
+            await job.start()
+        except Exception:
+            job.stdout.close()
+            job.stderr.close()
+            raise
+        self.jobs[job.id] = job
+        self._forget_old_jobs()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    async def cancel_all(self) -> None:
+        await asyncio.gather(*(job.cancel() for job in self.running()))
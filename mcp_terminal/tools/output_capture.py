@@ -0,0 +1,108 @@
+import os
+import tempfile
+from typing import Optional, Set
+
+# Directory where full command output is spooled when requested
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), "mcp_terminal_output")
+
+# Oldest spool files are removed once there are more than this many
+MAX_SPOOL_FILES = 100
+
+# Spool files of commands and jobs still writing to them, which pruning must leave alone
+_open_spool_paths: Set[str] = set()
+
+
+class BoundedOutput:
+    """
+    Bounded capture of one output stream of a command.
+
+    Keeps the first `head_bytes` and the last `tail_bytes` of the stream in memory and counts
+    everything in between as dropped. Optionally spools the complete stream to a temp file that
+    can be read back later by byte range (see read_spooled_output).
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int, spool: bool = False, name: str = "output"):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        # Deleting from the front of a bytearray is cheap, so this acts as a ring buffer for the tail
+        self.tail = bytearray()
+        self.total_bytes = 0
+        self.spool_path: Optional[str] = None
+        # Raw descriptor: unbuffered, so the spool can be read back while the command is still running
+        self._spool_fd: Optional[int] = None
+        if spool:
+            os.makedirs(SPOOL_DIR, exist_ok=True)
+            _prune_spool_dir()
+            self._spool_fd, self.spool_path = tempfile.mkstemp(dir=SPOOL_DIR, prefix="cmd-", suffix=f".{name}")
+            _open_spool_paths.add(self.spool_path)
+
+    def write(self, data: bytes) -> None:
+        self.total_bytes += len(data)
+        if self._spool_fd is not None:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self._spool_fd, view) :]
+
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+
+        if data and self.tail_bytes > 0:
+            self.tail += data
+            overflow = len(self.tail) - self.tail_bytes
+            if overflow > 0:
+                del self.tail[:overflow]
+
+    def close(self) -> None:
+        if self._spool_fd is not None:
+            os.close(self._spool_fd)
+            self._spool_fd = None
+            _open_spool_paths.discard(self.spool_path)
+
+    @property
+    def dropped_bytes(self) -> int:
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    def text(self) -> str:
+        """The retained output, with a marker where bytes were dropped."""
+        head = self.head.decode("utf-8", errors="replace")
+        if not self.dropped_bytes:
+            return head + self.tail.decode("utf-8", errors="replace")
+
+        marker = f"\n... [{self.dropped_bytes} bytes omitted"
+        if self.spool_path:
+            marker += f"; full output in {self.spool_path}"
+        marker += "] ...\n"
+        return head + marker + self.tail.decode("utf-8", errors="replace")
+
+
+def _prune_spool_dir() -> None:
+    """Remove the oldest spool files beyond MAX_SPOOL_FILES, except those still being written."""
+    try:
+        paths = [os.path.join(SPOOL_DIR, name) for name in os.listdir(SPOOL_DIR)]
+        paths.sort(key=os.path.getmtime)
+        for path in paths[: max(0, len(paths) - MAX_SPOOL_FILES + 1)]:
+            if path not in _open_spool_paths:
+                os.remove(path)
+    except OSError as e:
+        print(f"Error pruning spooled output: {e}")
+
+
+def read_spooled_output(path: str, offset: int = 0, length: int = 65536) -> bytes:
+    """
+    Read a byte range of a spooled output file.
+
+    Raises:
+        ValueError: If the path is not a spooled output file or the range is invalid.
+    """
+    real_path = os.path.realpath(path)
+    if os.path.dirname(real_path) != os.path.realpath(SPOOL_DIR):
+        raise ValueError(f"'{path}' is not a spooled command output file")
+    if offset < 0 or length < 0:
+        raise ValueError("offset and length must be non-negative")
+
+    with open(real_path, "rb") as file:
+        file.seek(offset)
+        return file.read(length)
@@ -0,0 +1,171 @@
+import asyncio
+import os
+import shlex
+import signal
+from itertools import chain, repeat
+from typing import Dict, Optional, Tuple
+
+# Clock ticks per second, the unit of CPU times in /proc/<pid>/stat
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# Seconds between samples of a command's peak RSS; short at first so quick commands are still seen,
+# then the last interval repeats
+RSS_SAMPLE_INTERVALS = (0.01, 0.02, 0.05, 0.1, 0.25)
+
+# Peak RSS is read from /proc, which e.g. macOS does not have
+PROC_AVAILABLE = os.path.isdir("/proc")
+
+
+def empty_usage() -> Dict:
+    """Resource usage fields of a run_command result when they could not be measured."""
+    return {"cpu_user_seconds": None, "cpu_system_seconds": None, "max_rss_kb": None, "exit_signal": None}
+
+
+def signal_name(number: int) -> Optional[str]:
+    try:
+        return signal.Signals(number).name
+    except ValueError:
+        return None
+
+
+def exit_signal(return_code: Optional[int]) -> Optional[str]:
+    """
+    Signal that ended a command, from its return code: negative for a process killed directly, 128 + n
+    for a command killed under bash.
+    """
+    if return_code is None:
+        return None
+    if return_code < 0:
+        return signal_name(-return_code)
+    if 128 < return_code < 128 + 65:
+        return signal_name(return_code - 128)
+    return None
+
+
+async def wait_with_usage(pid: int) -> Tuple[int, Dict]:
+    """
+    Reap a child process with wait4, returning its return code (negative signal number if it was
+    killed) and its CPU times, which include every descendant it waited for.
+
+    Waits on a pidfd where available, otherwise blocks a worker thread in wait4.
+
+    Peak RSS is left to track_peak_rss: the child's ru_maxrss starts from the server's memory
+    high-water mark, inherited at fork, so it says little about the command.
+    """
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        _, status, usage = await asyncio.to_thread(os.wait4, pid, 0)
+        return _usage_fields(status, usage)
+
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+    # The child has exited, so this returns at once; in a thread all the same, as wait4 can block
+    _, status, usage = await asyncio.to_thread(os.wait4, pid, 0)
+    return _usage_fields(status, usage)
+
+
+def _usage_fields(status: int, usage) -> Tuple[int, Dict]:
+    return_code = os.waitstatus_to_exitcode(status)
+    return return_code, {
+        "cpu_user_seconds": round(usage.ru_utime, 3),
+        "cpu_system_seconds": round(usage.ru_stime, 3),
+        "exit_signal": exit_signal(return_code),
+    }
+
+
+def session_peak_rss_kb(session_id: int, exclude: Optional[int] = None) -> Optional[int]:
+    """
+    Largest peak RSS (VmHWM) of the processes in a session, from /proc.
+
+    VmHWM belongs to the memory a process got at exec, so unlike ru_maxrss it does not include the
+    server's memory inherited at fork.
+
+    Args:
+        session_id: Session of the command, the pid of its leader when started with start_new_session=True
+        exclude: A process to leave out, e.g. a persistent shell whose peak is from earlier commands
+
+    Returns:
+        Peak in kilobytes, None if no process of the session was found or /proc is not available
+    """
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return None
+    peak = None
+    for pid in pids:
+        if pid == exclude:
+            continue
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as file:
+                stat = file.read()
+            # Fields after the parenthesized command name: state, ppid, pgrp, session
+            if int(stat[stat.rindex(b")") + 2 :].split()[3]) != session_id:
+                continue
+            with open(f"/proc/{pid}/status", "rb") as file:
+                for line in file:
+                    if line.startswith(b"VmHWM:"):
+                        peak = max(peak or 0, int(line.split()[1]))
+                        break
+        except (OSError, ValueError, IndexError):
+            # Exited while being read
+            continue
+    return peak
+
+
+async def track_peak_rss(session_id: int, usage: Dict, exclude: Optional[int] = None) -> None:
+    """
+    Keep usage["max_rss_kb"] at the largest peak RSS seen in a command's session until cancelled.
+
+    Sampled, so a process that exits before the next sample (at most RSS_SAMPLE_INTERVALS[-1] later)
+    can be missed; the result is a lower bound. Returns at once where /proc is not available.
+    """
+    if not PROC_AVAILABLE:
+        return
+    for interval in chain(RSS_SAMPLE_INTERVALS, repeat(RSS_SAMPLE_INTERVALS[-1])):
+        peak = await asyncio.to_thread(session_peak_rss_kb, session_id, exclude)
+        if peak is not None and peak > (usage["max_rss_kb"] or 0):
+            usage["max_rss_kb"] = peak
+        await asyncio.sleep(interval)
+
+
+def process_cpu_times(pid: int) -> Optional[Tuple[float, float]]:
+    """
+    CPU (user, system) seconds of a process plus the children it has waited for, from /proc.
+
+    Used for commands run inside a persistent shell, which cannot be reaped individually. Returns None
+    where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as file:
+            stat = file.read()
+    except OSError:
+        return None
+    # The command name in parentheses may contain spaces; fields after it are space separated
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    utime, stime, cutime, cstime = (int(value) for value in fields[11:15])
+    return (utime + cutime) / CLOCK_TICKS, (stime + cstime) / CLOCK_TICKS
+
+
+def with_limits(cmd: str, cpu_seconds: Optional[int], memory_mb: Optional[int]) -> str:
+    """
+    Wrap a shell command so it runs under setrlimit limits, applied with bash's ulimit builtin.
+
+    ulimit runs in the command's own shell after fork, which avoids preexec_fn and its risk of
+    deadlocking the child of a multi-threaded server.
+    """
+    limits = []
+    if cpu_seconds is not None:
+        limits.append(f"ulimit -t {int(cpu_seconds)}")
+    if memory_mb is not None:
+        # Address space, in kilobytes
+        limits.append(f"ulimit -v {int(memory_mb) * 1024}")
+    if not limits:
+        return cmd
+    return " && ".join(limits) + f" && eval {shlex.quote(cmd)}"
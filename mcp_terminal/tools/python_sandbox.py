@@ -0,0 +1,292 @@
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+# Worker processes kept running, each executing one call at a time; further calls wait for a free worker
+SANDBOX_WORKERS = int(os.getenv("PYTHON_SANDBOX_WORKERS", "2"))
+
+# Seconds a call may run before its worker is killed and replaced
+SANDBOX_TIMEOUT = float(os.getenv("PYTHON_SANDBOX_TIMEOUT", "30"))
+
+# Resident memory a worker may use, in megabytes, before it is killed and replaced
+SANDBOX_MEMORY_LIMIT_MB = int(os.getenv("PYTHON_SANDBOX_MEMORY_MB", "1024"))
+
+# Seconds between checks of a running worker's memory
+MEMORY_CHECK_INTERVAL = 0.05
+
+# Imported by every worker once at startup, so calls only pay for the user's code
+PRELOADED_MODULES = ("altair", "pandas")
+
+# Seconds a new worker may take to import PRELOADED_MODULES before it is given up on
+WORKER_STARTUP_TIMEOUT = 120
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+@dataclass
+class SandboxResult:
+    # 'ok', 'error' (the code raised), 'timeout', 'memory' (over the RSS limit) or 'crashed'
+    status: str
+    output: Any
+    wall_seconds: float
+    cpu_user_seconds: Optional[float] = None
+    cpu_system_seconds: Optional[float] = None
+    # Highest resident memory seen while the code ran; sampled, so short spikes can be missed
+    max_rss_kb: Optional[int] = None
+
+
+def execute_code(code: str, json_data: str) -> Any:
+    """
+    Run chart code with `df` built from json_data, returning the value it assigns to `result`.
+
+    Runs inside a worker process.
+    """
+    # Already loaded by _preload when the worker started
+    import altair as alt
+    import pandas as pd
+
+    result = {}
+    df = pd.DataFrame(json.loads(json_data))
+    safe_globals = {"alt": alt, "pd": pd, "math": math, "json": json}
+    safe_locals = {"df": df, "result": result}
+    exec(code, safe_globals, safe_locals)
+
+    output = safe_locals.get("result", None)
+    return output or "No result"
+
+
+def _preload() -> None:
+    for module in PRELOADED_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            # Reported by the calls that need it
+            pass
+
+
+def _worker_main(connection) -> None:
+    """
+    Import PRELOADED_MODULES and report ready, then execute jobs sent over the pipe until it is closed,
+    replying (status, output, user cpu, system cpu).
+    """
+    # Ctrl-C in the server's terminal reaches the whole process group; the server shuts workers down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _preload()
+    connection.send("ready")
+    while True:
+        try:
+            code, json_data = connection.recv()
+        except EOFError:
+            return
+        before = os.times()
+        try:
+            status, output = "ok", execute_code(code, json_data)
+        except Exception as e:
+            status, output = "error", f"ERROR: {str(e)}"
+        after = os.times()
+        reply = (status, output, after.user - before.user, after.system - before.system)
+        try:
+            connection.send(reply)
+        except Exception:
+            # A result that cannot be pickled, e.g. a chart object, is sent as its string form
+            connection.send((status, str(output), reply[2], reply[3]))
+
+
+def _rss_kb(pid: int) -> Optional[int]:
+    """Current resident memory of a process from /proc, or None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/statm", "rb") as file:
+            return int(file.read().split()[1]) * PAGE_SIZE // 1024
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class SandboxWorker:
+    """A worker process and the pipe jobs are sent over."""
+
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def kill(self) -> None:
+        try:
+            self.process.kill()
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        self.connection.close()
+
+
+class SandboxPool:
+    """
+    Worker processes that execute chart code outside the server process.
+
+    Workers are started in the background and only handed out once they have imported altair and
+    pandas, so a call never waits for imports. Each call runs in an idle worker under a wall-clock
+    timeout and an RSS limit. A worker that times out, goes over the limit or dies is killed and a warm
+    replacement is started right away.
+    """
+
+    def __init__(
+        self,
+        size: int = SANDBOX_WORKERS,
+        timeout: float = SANDBOX_TIMEOUT,
+        memory_limit_mb: Optional[int] = SANDBOX_MEMORY_LIMIT_MB,
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        # spawn rather than fork: forking a server with running threads can deadlock the child
+        self.context = multiprocessing.get_context("spawn")
+        self.idle: List[SandboxWorker] = []
+        # Workers starting, idle or busy
+        self.started = 0
+        # Why the last worker failed to start, raised to callers once no worker is left
+        self.start_error: Optional[str] = None
+        self.condition = threading.Condition()
+        self.stats = {"runs": 0, "timeouts": 0, "memory_kills": 0, "crashes": 0, "workers_started": 0}
+
+    def start(self) -> None:
+        """Start workers in the background until the pool is full. Does not wait for them."""
+        with self.condition:
+            missing = max(0, self.size - self.started)
+            self.started += missing
+        for _ in range(missing):
+            threading.Thread(target=self._start_worker, name="sandbox-worker-start", daemon=True).start()
+
+    def _start_worker(self) -> None:
+        worker = None
+        try:
+            worker = SandboxWorker(self.context)
+            if not worker.connection.poll(WORKER_STARTUP_TIMEOUT):
+                raise TimeoutError(f"not ready after {WORKER_STARTUP_TIMEOUT} seconds")
+            worker.connection.recv()
+        except Exception as e:
+            if worker is not None:
+                worker.kill()
+            with self.condition:
+                self.started -= 1
+                self.start_error = f"Could not start a sandbox worker: {str(e) or type(e).__name__}"
+                self.condition.notify_all()
+            return
+        with self.condition:
+            self.stats["workers_started"] += 1
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def _acquire(self) -> SandboxWorker:
+        self.start()
+        with self.condition:
+            while not self.idle:
+                if self.started == 0 and self.start_error is not None:
+                    error, self.start_error = self.start_error, None
+                    raise RuntimeError(error)
+                self.condition.wait()
+            return self.idle.pop()
+
+    def _release(self, worker: SandboxWorker, healthy: bool) -> None:
+        if healthy:
+            with self.condition:
+                self.idle.append(worker)
+                self.condition.notify()
+            return
+        worker.kill()
+        with self.condition:
+            self.started -= 1
+        self.start()
+
+    def run(
+        self,
+        code: str,
+        json_data: str,
+        timeout: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None,
+    ) -> SandboxResult:
+        """
+        Execute code in a worker, blocking until it finishes, times out or is killed.
+
+        Args:
+            timeout: Seconds before the worker is killed, default is the pool's timeout
+            memory_limit_mb: RSS limit in megabytes, default is the pool's limit
+        """
+        timeout = self.timeout if timeout is None else timeout
+        memory_limit_mb = self.memory_limit_mb if memory_limit_mb is None else memory_limit_mb
+        limit_kb = memory_limit_mb * 1024 if memory_limit_mb else None
+
+        worker = self._acquire()
+        started = time.monotonic()
+        deadline = started + timeout
+        max_rss_kb = None
+        healthy = False
+        try:
+            worker.connection.send((code, json_data))
+            while not worker.connection.poll(MEMORY_CHECK_INTERVAL):
+                rss_kb = _rss_kb(worker.process.pid)
+                if rss_kb is not None:
+                    max_rss_kb = max(max_rss_kb or 0, rss_kb)
+                if limit_kb is not None and rss_kb is not None and rss_kb > limit_kb:
+                    return self._failed(
+                        "memory",
+                        f"ERROR: Code used more than {memory_limit_mb} MB of memory and was stopped",
+                        started,
+                        max_rss_kb,
+                    )
+                if time.monotonic() > deadline:
+                    return self._failed(
+                        "timeout", f"ERROR: Code did not finish within {timeout:g} seconds", started, max_rss_kb
+                    )
+            try:
+                status, output, cpu_user, cpu_system = worker.connection.recv()
+            except (EOFError, OSError):
+                worker.process.join(timeout=1)
+                return self._failed(
+                    "crashed",
+                    f"ERROR: The process running the code exited unexpectedly (exit code {worker.process.exitcode})",
+                    started,
+                    max_rss_kb,
+                )
+
+            # Memory kept after the call, e.g. by a leak in a library, would count against later calls
+            rss_kb = _rss_kb(worker.process.pid)
+            if rss_kb is not None:
+                max_rss_kb = max(max_rss_kb or 0, rss_kb)
+            healthy = limit_kb is None or rss_kb is None or rss_kb <= limit_kb
+            with self.condition:
+                self.stats["runs"] += 1
+            return SandboxResult(
+                status,
+                output,
+                round(time.monotonic() - started, 3),
+                round(cpu_user, 3),
+                round(cpu_system, 3),
+                max_rss_kb,
+            )
+        finally:
+            self._release(worker, healthy)
+
+    def _failed(self, status: str, message: str, started: float, max_rss_kb: Optional[int]) -> SandboxResult:
+        counter = {"timeout": "timeouts", "memory": "memory_kills", "crashed": "crashes"}[status]
+        with self.condition:
+            self.stats["runs"] += 1
+            self.stats[counter] += 1
+        return SandboxResult(status, message, round(time.monotonic() - started, 3), max_rss_kb=max_rss_kb)
+
+    def shutdown(self) -> None:
+        """Stop the idle workers."""
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.started -= len(idle)
+        for worker in idle:
+            worker.kill()
+
+
+sandbox_pool = SandboxPool()
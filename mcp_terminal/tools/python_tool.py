@@ -1,8 +1,6 @@
-import json
 from textwrap import dedent
-import altair as alt
-import math
-import pandas as pd
+
+from tools.python_sandbox import sandbox_pool
 
 
 class PythonTools:
@@ -18,10 +16,15 @@ class PythonTools:
         self.counter += 1
         return self.counter
 
+    def start_workers(self) -> None:
+        """Start the sandbox workers now, so the first chart does not wait for them to import altair/pandas."""
+        sandbox_pool.start()
+
     def run_python_code(self, code, jsonData: str) -> str:
-        """This function runs Python code in the current environment.  This function only has access to the altair and vega_datasets libraries.
+        """This function runs Python code in a sandbox worker process.  This function only has access to the altair and vega_datasets libraries.
         If successful, returns the output of the code.
         If failed, returns an error message which will include ERROR: at the start.
+        Code that runs too long or uses too much memory is stopped, see tools.python_sandbox.
 
         Returns the value of `result` if successful, otherwise returns an error message.
 
@@ -30,15 +33,7 @@ class PythonTools:
         :return: value of `result` if successful, otherwise returns an error message.
         """
         try:
-            result = {}
-            df = pd.DataFrame(json.loads(jsonData))
-            safe_globals = {"alt": alt, "pd": pd, "math": math, "json": json}
-            safe_locals = {"df": df, "result": result}
-            exec(code, safe_globals, safe_locals)
-
-            output = safe_locals.get("result", None)
-
-            return output or "No result"
+            return sandbox_pool.run(code, jsonData).output
         except Exception as e:
             return f"ERROR: {str(e)}"
 
@@ -0,0 +1,246 @@
+import asyncio
+import codecs
+import os
+import shlex
+import signal
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from tools.output_capture import BoundedOutput
+
+# Bytes read from the shell's stdout/stderr per chunk
+STREAM_CHUNK_SIZE = 4096
+
+# Sessions are closed after this many seconds without a command
+SHELL_IDLE_TIMEOUT = 900
+
+# Maximum number of warm shells kept; the least recently used idle one is closed beyond this
+MAX_SHELL_SESSIONS = 32
+
+# Working directories remembered for sessions whose shell was closed; the least recently used are
+# forgotten beyond this
+MAX_REMEMBERED_CWDS = 1024
+
+# Called with (stream_name, text) for each output chunk; returning False stops the command
+OutputCallback = Callable[[str, str], Awaitable[Optional[bool]]]
+
+
+class CommandStopped(Exception):
+    """Raised while running a command when an output callback asks to stop it early."""
+
+
+class ShellSession:
+    """
+    A long-lived bash process that runs commands one at a time.
+
+    Each command is sent on stdin followed by printf calls that write a unique sentinel to stdout
+    (with the exit code and resulting working directory) and to stderr. Output is read until both
+    sentinels are seen, so the shell stays alive between commands and keeps its cwd, exported
+    variables, functions and aliases.
+    """
+
+    def __init__(self, cwd: Optional[str] = None):
+        self.cwd = cwd or os.getcwd()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.last_used = time.monotonic()
+        # Commands in one session run one at a time
+        self.lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        cwd = self.cwd if os.path.isdir(self.cwd) else os.getcwd()
+        self.process = await asyncio.create_subprocess_exec(
+            "/bin/bash",
+            "--noprofile",
+            "--norc",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            # Own process group, so close() also kills whatever the current command started
+            start_new_session=True,
+        )
+        self.cwd = cwd
+
+    async def run(
+        self,
+        cmd: str,
+        stdout_capture: BoundedOutput,
+        stderr_capture: BoundedOutput,
+        on_output: Optional[OutputCallback] = None,
+    ) -> int:
+        """
+        Run a command in the shell and return its exit code.
+
+        If the command exits the shell itself (e.g. `exit 3`), the shell's exit code is returned and
+        the session is no longer alive. Timeouts are left to the caller, which should close() the
+        session if the command does not finish.
+        """
+        if not self.alive:
+            await self.start()
+        self.last_used = time.monotonic()
+
+        marker = uuid.uuid4().hex
+        token = f"__MCP_DONE_{marker}__".encode()
+        # Tracing is paused around the sentinel so a command's `set -x` does not echo the protocol, and
+        # the token is printed in two halves so it never appears verbatim in the output anyway
+        script = (
+            f"eval {shlex.quote(cmd)} < /dev/null; "
+            "{ __mcp_rc=$?; case $- in *x*) __mcp_x=1 ;; *) __mcp_x= ;; esac; set +x; } 2>/dev/null\n"
+            f"printf '%s%s%d %s\\n' '__MCP_DONE_' '{marker}__' \"$__mcp_rc\" \"$PWD\"\n"
+            f"printf '%s%s\\n' '__MCP_DONE_' '{marker}__' >&2\n"
+            '[ -n "$__mcp_x" ] && set -x\n'
+        )
+        try:
+            self.process.stdin.write(script.encode())
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # The shell died while idle; start a fresh one in the last known directory
+            await self.close()
+            await self.start()
+            self.process.stdin.write(script.encode())
+            await self.process.stdin.drain()
+
+        readers = [
+            asyncio.create_task(_read_until_sentinel(self.process.stdout, "stdout", token, stdout_capture, on_output)),
+            asyncio.create_task(_read_until_sentinel(self.process.stderr, "stderr", token, stderr_capture, on_output)),
+        ]
+        try:
+            trailer, _ = await asyncio.gather(*readers)
+        except BaseException:
+            for reader in readers:
+                reader.cancel()
+            raise
+        finally:
+            self.last_used = time.monotonic()
+
+        if trailer is None:
+            # The shell exited before printing the sentinel
+            return await self.process.wait()
+
+        return_code, _, cwd = trailer.decode("utf-8", errors="replace").partition(" ")
+        if cwd:
+            self.cwd = cwd
+        return int(return_code)
+
+    async def close(self) -> None:
+        """Kill the shell and everything in its process group; the next run() starts a new shell."""
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        except Exception as e:
+            print(e)
+        await process.wait()
+
+
+async def _read_until_sentinel(
+    stream: asyncio.StreamReader,
+    name: str,
+    token: bytes,
+    capture: BoundedOutput,
+    on_output: Optional[OutputCallback],
+) -> Optional[bytes]:
+    """
+    Copy a shell pipe into a capture until the sentinel token is seen.
+
+    Returns:
+        The rest of the sentinel line after the token, or None if the pipe closed first
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    async def emit(data: bytes, final: bool = False) -> None:
+        capture.write(data)
+        if on_output is not None:
+            text = decoder.decode(data, final=final)
+            if text and await on_output(name, text) is False:
+                raise CommandStopped()
+
+    pending = b""
+    while True:
+        data = await stream.read(STREAM_CHUNK_SIZE)
+        if not data:
+            await emit(pending, final=True)
+            return None
+
+        pending += data
+        index = pending.find(token)
+        if index >= 0:
+            await emit(pending[:index], final=True)
+            rest = pending[index + len(token) :]
+            while b"\n" not in rest:
+                more = await stream.read(STREAM_CHUNK_SIZE)
+                if not more:
+                    return None
+                rest += more
+            return rest.split(b"\n", 1)[0]
+
+        # Hold back only a possible partial token at the end of the buffer, so output streams promptly
+        keep = next((k for k in range(min(len(pending), len(token) - 1), 0, -1) if pending.endswith(token[:k])), 0)
+        await emit(pending[: len(pending) - keep])
+        pending = pending[len(pending) - keep :]
+
+
+class ShellSessionPool:
+    """
+    Warm shell sessions keyed by MCP session id.
+
+    Idle shells are closed, but their working directory is remembered apart from them, so the
+    session's next shell starts where the last one was.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = MAX_SHELL_SESSIONS,
+        idle_timeout: float = SHELL_IDLE_TIMEOUT,
+        max_cwds: int = MAX_REMEMBERED_CWDS,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_cwds = max_cwds
+        self.sessions: OrderedDict[str, ShellSession] = OrderedDict()
+        # Last known working directory of each key, left alone by eviction
+        self.cwds: OrderedDict[str, str] = OrderedDict()
+
+    async def get(self, key: str) -> ShellSession:
+        """Return the session for a key, creating it if needed. The shell itself starts on first run()."""
+        session = self.sessions.get(key)
+        if session is None:
+            session = ShellSession(self.cwds.get(key))
+            self.sessions[key] = session
+        self.sessions.move_to_end(key)
+        await self._evict(keep=key)
+        return session
+
+    def _remember_cwd(self, key: str, session: ShellSession) -> None:
+        self.cwds[key] = session.cwd
+        self.cwds.move_to_end(key)
+        while len(self.cwds) > self.max_cwds:
+            self.cwds.popitem(last=False)
+
+    async def _evict(self, keep: str) -> None:
+        now = time.monotonic()
+        for key, session in list(self.sessions.items()):
+            if key == keep or session.lock.locked():
+                continue
+            if len(self.sessions) > self.max_sessions or now - session.last_used > self.idle_timeout:
+                del self.sessions[key]
+                self._remember_cwd(key, session)
+                await session.close()
+
+    async def close(self, key: str) -> None:
+        session = self.sessions.pop(key, None)
+        if session is not None:
+            await session.close()
+
+    async def close_all(self) -> None:
+        for key in list(self.sessions):
+            await self.close(key)
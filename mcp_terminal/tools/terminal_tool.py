@@ -1,60 +1,334 @@
 import asyncio
+import base64
+import binascii
+import codecs
+import hashlib
 import os
 import platform
-from typing import Dict, Optional
+import re
+import shlex
+import subprocess
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime
 
+from fastmcp import Context
+
+from database.pydantic_models import PyCommandBatchResult, PyCommandResult, PyFileEdit, PySearchResult
+from tools.chunked_writes import MAX_CHUNK_BYTES, ChunkedWriteManager
+from tools.command_history import CommandHistory
+from tools.compression import MAGIC_NUMBERS, compression_for_path, detect_file_compression, open_compressed_for_write
+from tools.file_access import FollowPositions, count_lines, line_indexes, read_bytes, read_lines, tail_lines
+from tools.file_edits import apply_edits
+from tools.file_search import compile_pattern, search_tree
+from tools.job_control import JobManager, kill_process_group
+from tools.output_capture import BoundedOutput, read_spooled_output
+from tools.process_accounting import (
+    empty_usage,
+    exit_signal,
+    process_cpu_times,
+    track_peak_rss,
+    wait_with_usage,
+    with_limits,
+)
+from tools.tree_summary import largest_subtrees, summarize_directories, top_extensions
+from tools.tree_walk import glob_matches, walk_tree
+from tools.unified_diff import apply_patch_files, parse_unified_diff
+from tools.shell_sessions import STREAM_CHUNK_SIZE, CommandStopped, OutputCallback, ShellSession, ShellSessionPool
+
+# Persistent history of executed commands
+command_history = CommandHistory()
+
+# Default bytes of each stream kept from the start and from the end of a command's output
+DEFAULT_HEAD_KB = 32
+DEFAULT_TAIL_KB = 32
+
+# Bytes returned by read_file in offset mode when no length is given
+DEFAULT_READ_LENGTH = 65536
+
+# Largest file (decompressed size for compressed files) that read_file returns whole
+MAX_FULL_READ_BYTES = 10 * 1024 * 1024
+
+# Characters of earlier output kept per stream so stop_pattern can match across chunks
+STOP_PATTERN_WINDOW = 1024
+
+# Warm shells used by execute_command, one per MCP session (bash only)
+SHELL_SESSIONS_SUPPORTED = platform.system() != "Windows"
+shell_sessions = ShellSessionPool()
+
+# Background jobs started with start_job
+jobs = JobManager()
+
+# Read positions of follow_file, per session
+follow_positions = FollowPositions()
+
+# Seconds between checks for new data while follow_file waits
+FOLLOW_POLL_INTERVAL = 0.25
+
+# Files being written in chunks with begin_write / write_chunk / commit_write
+chunked_writes = ChunkedWriteManager()
+
+# Session key used when a tool is called without an MCP context
+DEFAULT_SESSION_KEY = "default"
+
+
+async def _pump_stream(
+    stream: asyncio.StreamReader,
+    name: str,
+    capture: BoundedOutput,
+    on_output: Optional[OutputCallback],
+) -> None:
+    """
+    Read a subprocess pipe incrementally into a bounded capture.
 
-# List to store command history
-command_history = []
-
-# Maximum history size
-MAX_HISTORY_SIZE = 50
-
-
-async def run_command(cmd: str, timeout: int = 30) -> Dict:
+    Args:
+        stream: The pipe to read
+        name: 'stdout' or 'stderr', passed to the callback
+        capture: Bounded buffer the raw bytes are written to
+        on_output: Optional callback receiving (name, text) with UTF-8 decoded safely across chunk
+            boundaries; returning False stops the command
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        data = await stream.read(STREAM_CHUNK_SIZE)
+        capture.write(data)
+        if on_output is not None:
+            text = decoder.decode(data, final=not data)
+            if text and await on_output(name, text) is False:
+                raise CommandStopped()
+        if not data:
+            return
+
+
+async def _kill_process(process: asyncio.subprocess.Process) -> None:
+    try:
+        # The whole process group, so grandchildren do not keep running and holding the pipes open
+        kill_process_group(process)
+        await process.wait()
+    except ProcessLookupError:
+        pass
+    except Exception as e:
+        print(e)
+
+
+async def _pipe_reader(pipe) -> Tuple[asyncio.StreamReader, asyncio.BaseTransport]:
+    """Read a subprocess.Popen pipe through the event loop."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    return reader, transport
+
+
+def _restart_note(session: Optional[ShellSession]) -> str:
+    if session is None:
+        return ""
+    return f"The shell session ended; the next command starts a new shell in {session.cwd}."
+
+
+def _capture_fields(stdout: BoundedOutput, stderr: BoundedOutput) -> Dict:
+    """Size and spool information of the captured output, merged into run_command results."""
+    return {
+        "stdout_bytes": stdout.total_bytes,
+        "stderr_bytes": stderr.total_bytes,
+        "stdout_dropped_bytes": stdout.dropped_bytes,
+        "stderr_dropped_bytes": stderr.dropped_bytes,
+        "stdout_file": stdout.spool_path,
+        "stderr_file": stderr.spool_path,
+    }
+
+
+async def run_command(
+    cmd: str,
+    timeout: int = 30,
+    on_output: Optional[OutputCallback] = None,
+    head_kb: int = DEFAULT_HEAD_KB,
+    tail_kb: int = DEFAULT_TAIL_KB,
+    spool_output: bool = False,
+    session: Optional[ShellSession] = None,
+    cpu_limit: Optional[int] = None,
+    memory_limit_mb: Optional[int] = None,
+    cwd: Optional[str] = None,
+) -> Dict:
     """
     Execute command and return results
 
     Args:
         cmd: Command to execute
         timeout: Command timeout in seconds
+        on_output: Optional async callback invoked as on_output(stream_name, text) for every chunk of
+            stdout/stderr as it is produced. Returning False kills the command early.
+        head_kb: Kilobytes kept from the start of each of stdout/stderr
+        tail_kb: Kilobytes kept from the end of each of stdout/stderr; anything in between is dropped
+        spool_output: If True, also write the complete stdout/stderr to temp files (see read_command_output)
+        session: Optional warm shell to run the command in, keeping its cwd and environment between
+            commands; by default a new shell is spawned for the command
+        cpu_limit: Optional CPU time limit in seconds (RLIMIT_CPU); the command is killed when it is exceeded
+        memory_limit_mb: Optional address space limit in megabytes (RLIMIT_AS)
+        cwd: Directory to run the command in when no session is given, default is the current directory
+
+    Limited commands run in a new shell started in the session's directory, so the limits do not stay
+    on the session's shell.
 
     Returns:
-        Dictionary containing command execution results
+        Dictionary containing command execution results, including CPU time, peak RSS and the signal
+        that ended the command (peak RSS is sampled from /proc, so processes that exit within a fraction
+        of a second can be missed)
     """
+    limits = (cpu_limit, memory_limit_mb)
+    if session is not None and limits != (None, None):
+        return await _run_command(cmd, timeout, on_output, head_kb, tail_kb, spool_output, None, session.cwd, limits)
+    if session is not None:
+        # One command at a time per shell
+        async with session.lock:
+            return await _run_command(
+                cmd, timeout, on_output, head_kb, tail_kb, spool_output, session, session.cwd, limits
+            )
+    return await _run_command(cmd, timeout, on_output, head_kb, tail_kb, spool_output, None, cwd or os.getcwd(), limits)
+
+
+async def _run_command(
+    cmd: str,
+    timeout: int,
+    on_output: Optional[OutputCallback],
+    head_kb: int,
+    tail_kb: int,
+    spool_output: bool,
+    session: Optional[ShellSession],
+    cwd: str,
+    limits: Tuple[Optional[int], Optional[int]],
+) -> Dict:
     start_time = datetime.now()
+    usage = empty_usage()
+    stdout_capture = BoundedOutput(head_kb * 1024, tail_kb * 1024, spool=spool_output, name="stdout")
+    stderr_capture = BoundedOutput(head_kb * 1024, tail_kb * 1024, spool=spool_output, name="stderr")
 
     try:
-        # Create command appropriate for current OS
-        if platform.system() == "Windows":
+        pumps, transports, sampler = [], [], None
+        if session is not None:
+            if not session.alive:
+                await session.start()
+            # The shell is not reaped per command; its CPU time before and after is the command's
+            shell_pid = session.process.pid
+            times_before = process_cpu_times(shell_pid)
+            # The command's processes share the shell's session; the shell's own peak is from earlier commands
+            sampler = asyncio.create_task(track_peak_rss(shell_pid, usage, exclude=shell_pid))
+
+            async def run_in_session() -> int:
+                return_code = await session.run(cmd, stdout_capture, stderr_capture, on_output)
+                times_after = process_cpu_times(session.process.pid) if session.alive else None
+                # A shell started by this command counts from zero
+                before = times_before if session.process.pid == shell_pid else (0.0, 0.0)
+                if times_after is not None and before is not None:
+                    usage["cpu_user_seconds"] = round(times_after[0] - before[0], 3)
+                    usage["cpu_system_seconds"] = round(times_after[1] - before[1], 3)
+                usage["exit_signal"] = exit_signal(return_code)
+                return return_code
+
+            execution = run_in_session()
+            abort = session.close
+        elif platform.system() == "Windows":
             process = await asyncio.create_subprocess_shell(
-                cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, shell=True
+                cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, shell=True, cwd=cwd
             )
+            pumps = [
+                asyncio.create_task(_pump_stream(process.stdout, "stdout", stdout_capture, on_output)),
+                asyncio.create_task(_pump_stream(process.stderr, "stderr", stderr_capture, on_output)),
+            ]
+
+            async def wait_for_exit() -> int:
+                await asyncio.gather(*pumps)
+                return await process.wait()
+
+            async def abort() -> None:
+                await _kill_process(process)
+
+            execution = wait_for_exit()
         else:
-            process = await asyncio.create_subprocess_shell(
-                cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, shell=True, executable="/bin/bash"
+            # Started with Popen and reaped with wait4 instead of asyncio's child watcher, so the
+            # resource usage of the command and everything it waited for is available. Popen forks and
+            # waits for the exec, so it runs in a thread
+            process = await asyncio.to_thread(
+                subprocess.Popen,
+                with_limits(cmd, *limits),
+                shell=True,
+                executable="/bin/bash",
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=cwd,
+                start_new_session=True,
             )
-
+            exit_status = asyncio.create_task(wait_with_usage(process.pid))
+            sampler = asyncio.create_task(track_peak_rss(process.pid, usage))
+            readers = []
+            for pipe in (process.stdout, process.stderr):
+                reader, transport = await _pipe_reader(pipe)
+                readers.append(reader)
+                transports.append(transport)
+            pumps = [
+                asyncio.create_task(_pump_stream(readers[0], "stdout", stdout_capture, on_output)),
+                asyncio.create_task(_pump_stream(readers[1], "stderr", stderr_capture, on_output)),
+            ]
+
+            async def reap() -> int:
+                # Shielded, so a timeout cancelling the wait does not cancel reaping
+                process.returncode, fields = await asyncio.shield(exit_status)
+                usage.update(fields)
+                return process.returncode
+
+            async def wait_for_exit() -> int:
+                await asyncio.gather(*pumps)
+                return await reap()
+
+            async def abort() -> None:
+                # The whole process group, so grandchildren do not keep running and holding the pipes open
+                kill_process_group(process)
+                await reap()
+
+            execution = wait_for_exit()
+
+        stopped = False
         try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
-            stdout = stdout.decode("utf-8", errors="replace")
-            stderr = stderr.decode("utf-8", errors="replace")
-            return_code = process.returncode
+            return_code = await asyncio.wait_for(execution, timeout)
         except asyncio.TimeoutError:
-            try:
-                process.kill()
-            except Exception as e:
-                print(e)
-                pass
-            return {
+            await abort()
+            duration = datetime.now() - start_time
+            result = {
                 "success": False,
-                "stdout": "",
-                "stderr": f"Command timed out after {timeout} seconds",
+                "stdout": stdout_capture.text(),
+                "stderr": "\n".join(
+                    filter(None, [f"Command timed out after {timeout} seconds", _restart_note(session)])
+                ),
                 "return_code": -1,
-                "duration": str(datetime.now() - start_time),
+                "duration": str(duration),
                 "command": cmd,
+                "timed_out": True,
+                **_capture_fields(stdout_capture, stderr_capture),
+                **usage,
             }
+            command_history.record(result, cwd, duration.total_seconds() * 1000)
+            return result
+        except CommandStopped:
+            await abort()
+            stopped = True
+            return_code = -1
+        except asyncio.CancelledError:
+            # The tool call itself was cancelled (e.g. the MCP client sent notifications/cancelled)
+            await abort()
+            raise
+        finally:
+            for pump in pumps:
+                pump.cancel()
+            if sampler is not None:
+                sampler.cancel()
+            for transport in transports:
+                transport.close()
+
+        stdout = stdout_capture.text()
+        stderr = stderr_capture.text()
+        if stopped:
+            stderr = (stderr + "\n" if stderr else "") + "Command was stopped early by the caller."
+        if session is not None and not session.alive:
+            stderr = (stderr + "\n" if stderr else "") + _restart_note(session)
 
         duration = datetime.now() - start_time
         result = {
@@ -64,14 +338,12 @@ async def run_command(cmd: str, timeout: int = 30) -> Dict:
             "return_code": return_code,
             "duration": str(duration),
             "command": cmd,
+            **_capture_fields(stdout_capture, stderr_capture),
+            **usage,
         }
 
         # Add to history
-        command_history.append({"timestamp": datetime.now().isoformat(), "command": cmd, "success": return_code == 0})
-
-        # If history is too long, remove oldest record
-        if len(command_history) > MAX_HISTORY_SIZE:
-            command_history.pop(0)
+        command_history.record(result, cwd, duration.total_seconds() * 1000)
 
         return result
 
@@ -83,16 +355,97 @@ async def run_command(cmd: str, timeout: int = 30) -> Dict:
             "return_code": -1,
             "duration": str(datetime.now() - start_time),
             "command": cmd,
+            **_capture_fields(stdout_capture, stderr_capture),
+            **usage,
         }
+    finally:
+        stdout_capture.close()
+        stderr_capture.close()
+
+
+async def get_session_cwd(ctx: Optional[Context] = None) -> str:
+    """
+    Working directory of the calling MCP session.
+
+    It is kept in the session's ShellSession, which is updated by every command run in the session's
+    shell, so concurrent sessions never see each other's directory and the server never calls os.chdir.
+    When an idle shell is closed the pool remembers its directory and the next one starts there.
+    """
+    session = await shell_sessions.get(_session_key(ctx))
+    return session.cwd
+
+
+async def resolve_path(path: Optional[str], ctx: Optional[Context] = None) -> str:
+    """Resolve a tool's path argument against the session's working directory; None means the directory itself."""
+    cwd = await get_session_cwd(ctx)
+    if path is None:
+        return cwd
+    return os.path.join(cwd, os.path.expanduser(path))
 
 
-async def execute_command(command: str, timeout: int = 30) -> str:
+def _session_key(ctx: Optional[Context]) -> str:
+    if ctx is None:
+        return DEFAULT_SESSION_KEY
+    try:
+        return ctx.session_id
+    except Exception:
+        # Called outside of an MCP request
+        return DEFAULT_SESSION_KEY
+
+
+async def get_shell_session(ctx: Optional[Context] = None) -> Optional[ShellSession]:
+    """The persistent shell of the calling MCP session, or None where shell sessions are not supported."""
+    if not SHELL_SESSIONS_SUPPORTED:
+        return None
+    return await shell_sessions.get(_session_key(ctx))
+
+
+def _usage_note(result: Dict) -> str:
+    """CPU time and peak memory of a command, where they were measured."""
+    parts = []
+    if result.get("cpu_user_seconds") is not None:
+        parts.append(f"CPU {result['cpu_user_seconds']}s user, {result['cpu_system_seconds']}s system")
+    if result.get("max_rss_kb") is not None:
+        parts.append(f"peak RSS {_format_size(result['max_rss_kb'] * 1024)}")
+    return f"\nResources: {', '.join(parts)}" if parts else ""
+
+
+def _spool_note(result: Dict) -> str:
+    """Where the complete output was saved, if it was spooled."""
+    files = [f"{name}: {result[f'{name}_file']}" for name in ("stdout", "stderr") if result.get(f"{name}_file")]
+    if not files:
+        return ""
+    return "\n\nFull output saved (use read_command_output):\n" + "\n".join(files)
+
+
+async def execute_command(
+    command: str,
+    timeout: int = 30,
+    stream: bool = False,
+    stop_pattern: Optional[str] = None,
+    head_kb: int = DEFAULT_HEAD_KB,
+    tail_kb: int = DEFAULT_TAIL_KB,
+    spool_output: bool = False,
+    fresh_shell: bool = False,
+    cpu_limit: Optional[int] = None,
+    memory_limit_mb: Optional[int] = None,
+    ctx: Optional[Context] = None,
+) -> str:
     """
     Execute terminal command and return results
 
     Args:
         command: Command line command to execute
         timeout: Command timeout in seconds, default is 30 seconds
+        stream: If True, forward output chunks as MCP progress notifications while the command runs
+        stop_pattern: Optional regex; the command is stopped as soon as its output matches it
+        head_kb: Kilobytes of each output stream kept from the start, default is 32
+        tail_kb: Kilobytes of each output stream kept from the end, default is 32
+        spool_output: If True, save the complete output to a temp file readable with read_command_output
+        fresh_shell: If True, run in a new shell instead of this session's persistent shell, so `cd` and
+            `export` do not carry over to later commands
+        cpu_limit: Kill the command after this many seconds of CPU time (optional; runs in a new shell)
+        memory_limit_mb: Limit the command's address space to this many megabytes (optional; runs in a new shell)
 
     Returns:
         Output of the command execution
@@ -102,7 +455,41 @@ async def execute_command(command: str, timeout: int = 30) -> str:
     if any(dc in command.lower() for dc in dangerous_commands):
         return "For security reasons, this command is not allowed."
 
-    result = await run_command(command, timeout)
+    try:
+        pattern = re.compile(stop_pattern) if stop_pattern else None
+    except re.error as e:
+        return f"Error: Invalid stop_pattern: {str(e)}"
+
+    streamed_chars = 0
+    # Keep the end of each stream so stop_pattern can match across chunk boundaries
+    tails = {"stdout": "", "stderr": ""}
+
+    async def forward_output(stream_name: str, text: str) -> bool:
+        nonlocal streamed_chars
+        streamed_chars += len(text)
+        if stream and ctx is not None:
+            await ctx.report_progress(progress=streamed_chars, message=f"[{stream_name}] {text}")
+        if pattern is not None:
+            window = tails[stream_name] + text
+            if pattern.search(window):
+                return False
+            tails[stream_name] = window[-STOP_PATTERN_WINDOW:]
+        return True
+
+    on_output = forward_output if (stream and ctx is not None) or pattern is not None else None
+    session = None if fresh_shell else await get_shell_session(ctx)
+    result = await run_command(
+        command,
+        timeout,
+        on_output=on_output,
+        head_kb=head_kb,
+        tail_kb=tail_kb,
+        spool_output=spool_output,
+        session=session,
+        cpu_limit=cpu_limit,
+        memory_limit_mb=memory_limit_mb,
+        cwd=await get_session_cwd(ctx),
+    )
 
     if result["success"]:
         output = f"Command executed successfully (duration: {result['duration']})\n\n"
@@ -115,7 +502,7 @@ async def execute_command(command: str, timeout: int = 30) -> str:
         if result["stderr"]:
             output += f"\nWarnings/Info:\n{result['stderr']}"
 
-        return output
+        return output + _usage_note(result) + _spool_note(result)
     else:
         output = f"Command execution failed (duration: {result['duration']})\n"
 
@@ -126,7 +513,249 @@ async def execute_command(command: str, timeout: int = 30) -> str:
             output += f"\nError:\n{result['stderr']}"
 
         output += f"\nReturn code: {result['return_code']}"
-        return output
+        if result["exit_signal"]:
+            output += f" (killed by {result['exit_signal']})"
+        return output + _usage_note(result) + _spool_note(result)
+
+
+async def execute_commands(
+    commands: List[str],
+    max_concurrency: int = 4,
+    fail_fast: bool = False,
+    timeout: int = 30,
+    head_kb: int = 8,
+    tail_kb: int = 8,
+    ctx: Optional[Context] = None,
+) -> Union[PyCommandBatchResult, str]:
+    """
+    Run several independent commands in parallel and return each one's result
+
+    Each command runs in its own new shell in the session's current directory, so `cd` and `export` in one
+    command do not affect the others. The batch takes about as long as its slowest commands instead of
+    the sum of all of them.
+
+    Args:
+        commands: Command lines to run
+        max_concurrency: Maximum number of commands running at the same time, default is 4
+        fail_fast: If True, stop the running commands and skip the remaining ones as soon as one fails
+        timeout: Timeout in seconds for each command, default is 30 seconds
+        head_kb: Kilobytes of each command's output streams kept from the start, default is 8
+        tail_kb: Kilobytes of each command's output streams kept from the end, default is 8
+
+    Returns:
+        PyCommandBatchResult with a result per command in the given order, and counts of succeeded,
+        failed and skipped commands, or an error message if the batch was not started
+    """
+    if not commands:
+        return "Error: commands must not be empty."
+    if max_concurrency <= 0:
+        return "Error: max_concurrency must be positive."
+    dangerous_commands = ["rm -rf /", "mkfs"]
+    for command in commands:
+        if any(dc in command.lower() for dc in dangerous_commands):
+            return f"Error: For security reasons, this command is not allowed: {command}"
+
+    cwd = await get_session_cwd(ctx)
+    loop = asyncio.get_running_loop()
+    batch_start = loop.time()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results: List[Optional[PyCommandResult]] = [None] * len(commands)
+    tasks: List[asyncio.Task] = []
+    finished = 0
+
+    async def run(index: int, command: str) -> None:
+        nonlocal finished
+        started = None
+        try:
+            async with semaphore:
+                started = loop.time()
+                result = await run_command(command, timeout, head_kb=head_kb, tail_kb=tail_kb, cwd=cwd)
+        except asyncio.CancelledError:
+            # Stopped by fail_fast; the command's process group has already been killed
+            status = "skipped" if started is None else "cancelled"
+            duration = None if started is None else round(loop.time() - started, 3)
+            results[index] = PyCommandResult(command=command, status=status, duration_seconds=duration)
+            return
+
+        status = "succeeded" if result["success"] else "timed_out" if result.get("timed_out") else "failed"
+        results[index] = PyCommandResult(
+            command=command,
+            status=status,
+            return_code=None if result.get("timed_out") else result["return_code"],
+            stdout=result["stdout"],
+            stderr=result["stderr"],
+            duration_seconds=round(loop.time() - started, 3),
+            cpu_user_seconds=result["cpu_user_seconds"],
+            cpu_system_seconds=result["cpu_system_seconds"],
+            max_rss_kb=result["max_rss_kb"],
+            exit_signal=result["exit_signal"],
+        )
+        finished += 1
+        if ctx is not None:
+            await ctx.report_progress(progress=finished, total=len(commands), message=f"[{status}] {command}")
+        if fail_fast and status != "succeeded":
+            for task in tasks:
+                if task is not asyncio.current_task():
+                    task.cancel()
+
+    tasks.extend(asyncio.create_task(run(index, command)) for index, command in enumerate(commands))
+    # A task cancelled by fail_fast after recording its result must not fail the batch
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    batch = PyCommandBatchResult(results=results, wall_seconds=round(loop.time() - batch_start, 3))
+    for result in results:
+        if result.status == "succeeded":
+            batch.succeeded += 1
+        elif result.status == "skipped":
+            batch.skipped += 1
+        else:
+            batch.failed += 1
+    return batch
+
+
+async def read_command_output(path: str, offset: int = 0, length: int = 65536) -> str:
+    """
+    Read a byte range of a command's full output saved with spool_output=True
+
+    Args:
+        path: The stdout/stderr file path reported by execute_command
+        offset: Byte offset to start reading from, default is 0
+        length: Maximum number of bytes to read, default is 64 KB
+
+    Returns:
+        The requested part of the output
+    """
+    try:
+        data = read_spooled_output(path, offset, length)
+        size = os.path.getsize(path)
+        end = offset + len(data)
+        header = f"Bytes {offset}-{end} of {size}" + (" (more available)" if end < size else "") + ":\n"
+        return header + data.decode("utf-8", errors="replace")
+    except FileNotFoundError:
+        return f"Error: Output file '{path}' does not exist."
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        return f"Error reading command output: {str(e)}"
+
+
+async def start_job(command: str, ctx: Optional[Context] = None) -> str:
+    """
+    Start a command in the background and return immediately with a job id
+
+    Args:
+        command: Command line command to run; it starts in the session's current directory
+
+    Returns:
+        The job id to use with poll_job, get_job_output and cancel_job
+    """
+    dangerous_commands = ["rm -rf /", "mkfs"]
+    if any(dc in command.lower() for dc in dangerous_commands):
+        return "For security reasons, this command is not allowed."
+
+    try:
+        job = await jobs.start(command, await get_session_cwd(ctx))
+    except RuntimeError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        return f"Error starting job: {str(e)}"
+
+    return f"Started job {job.id} (pid {job.process.pid}): {command}"
+
+
+def _job_not_found(job_id: str) -> str:
+    return f"Error: Job '{job_id}' does not exist. Use list_jobs to see known jobs."
+
+
+async def poll_job(job_id: str) -> str:
+    """
+    Get the status of a background job and the end of its output
+
+    Args:
+        job_id: Id returned by start_job
+
+    Returns:
+        Status, return code, duration and the most recent output of the job
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+
+    output = f"Job {job.id}: {job.status} (duration: {job.duration})\nCommand: {job.command}\n"
+    if job.return_code is not None:
+        output += f"Return code: {job.return_code}\n"
+
+    stdout = job.stdout.text()
+    stderr = job.stderr.text()
+    if stdout:
+        output += f"\nOutput:\n{stdout}\n"
+    if stderr:
+        output += f"\nErrors:\n{stderr}\n"
+    output += (
+        f"\nFull output: stdout {job.stdout.total_bytes} bytes, stderr {job.stderr.total_bytes} bytes "
+        "(use get_job_output)"
+    )
+    return output
+
+
+async def get_job_output(job_id: str, stream: str = "stdout", offset: int = 0, length: int = 65536) -> str:
+    """
+    Read a byte range of a background job's complete output
+
+    Args:
+        job_id: Id returned by start_job
+        stream: 'stdout' or 'stderr', default is stdout
+        offset: Byte offset to start reading from, default is 0
+        length: Maximum number of bytes to read, default is 64 KB
+
+    Returns:
+        The requested part of the output
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    if stream not in ("stdout", "stderr"):
+        return "Error: stream must be 'stdout' or 'stderr'"
+
+    capture = job.stdout if stream == "stdout" else job.stderr
+    return await read_command_output(capture.spool_path, offset, length)
+
+
+async def cancel_job(job_id: str) -> str:
+    """
+    Stop a background job and every process it started
+
+    Args:
+        job_id: Id returned by start_job
+
+    Returns:
+        Operation result information
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return _job_not_found(job_id)
+    if job.finished_at is not None:
+        return f"Job {job.id} already finished ({job.status}, return code {job.return_code})"
+
+    await job.cancel()
+    return f"Cancelled job {job.id} after {job.duration} (return code {job.return_code})"
+
+
+async def list_jobs() -> str:
+    """
+    List running and recently finished background jobs
+
+    Returns:
+        One line per job with its id, status, duration and command
+    """
+    if not jobs.jobs:
+        return "No background jobs"
+
+    output = f"Background jobs ({len(jobs.running())}/{jobs.max_concurrent} running):\n\n"
+    for job in jobs.jobs.values():
+        return_code = f", return code {job.return_code}" if job.return_code is not None else ""
+        output += f"{job.id} [{job.status}{return_code}] {job.duration}: {job.command}\n"
+    return output
 
 
 async def get_command_history(count: int = 10) -> str:
@@ -139,13 +768,11 @@ async def get_command_history(count: int = 10) -> str:
     Returns:
         Formatted command history record
     """
-    if not command_history:
+    recent_commands = command_history.recent(count)
+    if not recent_commands:
         return "No command execution history."
 
-    count = min(count, len(command_history))
-    recent_commands = command_history[-count:]
-
-    output = f"Recent {count} command history:\n\n"
+    output = f"Recent {len(recent_commands)} command history:\n\n"
 
     for i, cmd in enumerate(recent_commands):
         status = "✓" if cmd["success"] else "✗"
@@ -154,19 +781,86 @@ async def get_command_history(count: int = 10) -> str:
     return output
 
 
-async def get_current_directory() -> str:
+async def search_command_history(
+    query: Optional[str] = None,
+    success: Optional[bool] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    cwd: Optional[str] = None,
+    limit: int = 20,
+    include_output: bool = False,
+    sort_by: str = "time",
+) -> str:
     """
-    Get current working directory
+    Search previously executed commands, most recent first, to reuse results instead of re-running commands
+
+    Args:
+        query: Substring the command must contain
+        success: Only successful (True) or only failed (False) commands
+        since: Only commands run at or after this ISO timestamp, e.g. 2024-05-01 or 2024-05-01T13:00
+        until: Only commands run at or before this ISO timestamp
+        cwd: Only commands run in this directory
+        limit: Maximum number of commands to return, default is 20
+        include_output: If True, include the end of each command's stdout/stderr
+        sort_by: 'time' for the most recent first, or 'duration', 'cpu' or 'memory' for the most expensive first
+
+    Returns:
+        Matching commands with time, exit code, duration, CPU time, peak memory, directory and output size
+    """
+    try:
+        since_time = datetime.fromisoformat(since) if since else None
+        until_time = datetime.fromisoformat(until) if until else None
+    except ValueError as e:
+        return f"Error: Invalid timestamp: {str(e)}"
+
+    try:
+        rows = command_history.search(query, success, since_time, until_time, cwd, limit, sort_by)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        return f"Error searching command history: {str(e)}"
+    if not rows:
+        return "No matching commands in history."
+
+    output = f"Found {len(rows)} matching commands:\n\n"
+    for row in rows:
+        status = "✓" if row["success"] else "✗"
+        output += (
+            f"[{status}] {row['timestamp']}: {row['command']}\n"
+            f"    return code {row['return_code']}, {row['duration_ms']} ms, cwd {row['cwd']}, "
+            f"stdout {row['stdout_bytes']} bytes, stderr {row['stderr_bytes']} bytes\n"
+        )
+        if row["cpu_user_seconds"] is not None:
+            output += f"    CPU {row['cpu_user_seconds']}s user, {row['cpu_system_seconds']}s system"
+            if row["max_rss_kb"] is not None:
+                output += f", peak RSS {_format_size(row['max_rss_kb'] * 1024)}"
+            if row["exit_signal"]:
+                output += f", killed by {row['exit_signal']}"
+            output += "\n"
+        if include_output:
+            if row["stdout_tail"]:
+                output += f"    Output (end):\n{row['stdout_tail']}\n"
+            if row["stderr_tail"]:
+                output += f"    Errors (end):\n{row['stderr_tail']}\n"
+    return output
+
+
+async def get_current_directory(ctx: Optional[Context] = None) -> str:
+    """
+    Get the current working directory of this session
 
     Returns:
         Path of current working directory
     """
-    return os.getcwd()
+    return await get_session_cwd(ctx)
 
 
-async def change_directory(path: str) -> str:
+async def change_directory(path: str, ctx: Optional[Context] = None) -> str:
     """
-    Change current working directory
+    Change the current working directory of this session
+
+    Commands and relative paths in the file tools of this session resolve against it; other sessions
+    are not affected.
 
     Args:
         path: Directory path to switch to
@@ -175,8 +869,21 @@ async def change_directory(path: str) -> str:
         Operation result information
     """
     try:
-        os.chdir(path)
-        return f"Switched to directory: {os.getcwd()}"
+        target = os.path.normpath(await resolve_path(path, ctx))
+        if not os.path.isdir(target):
+            raise FileNotFoundError(target)
+        if not os.access(target, os.X_OK):
+            raise PermissionError(target)
+        session = await shell_sessions.get(_session_key(ctx))
+        if SHELL_SESSIONS_SUPPORTED and session.alive:
+            # The running shell must change directory too; its reported cwd becomes the session's
+            result = await run_command(f"cd -- {shlex.quote(target)}", session=session)
+            if not result["success"]:
+                raise PermissionError(result["stderr"])
+        else:
+            # The shell starts in the session's cwd when it is first needed
+            session.cwd = target
+        return f"Switched to directory: {session.cwd}"
     except FileNotFoundError:
         return f"Error: Directory '{path}' does not exist"
     except PermissionError:
@@ -185,7 +892,7 @@ async def change_directory(path: str) -> str:
         return f"Error changing directory: {str(e)}"
 
 
-async def list_directory(path: Optional[str] = None) -> str:
+async def list_directory(path: Optional[str] = None, ctx: Optional[Context] = None) -> str:
     """
     List files and subdirectories in the specified directory
 
@@ -195,8 +902,7 @@ async def list_directory(path: Optional[str] = None) -> str:
     Returns:
         List of directory contents
     """
-    if path is None:
-        path = os.getcwd()
+    path = await resolve_path(path, ctx)
 
     try:
         items = os.listdir(path)
@@ -238,7 +944,247 @@ async def list_directory(path: Optional[str] = None) -> str:
         return f"Error listing directory contents: {str(e)}"
 
 
-async def write_file(path: str, content: str, mode: str = "overwrite") -> str:
+def _format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+async def list_files(
+    path: Optional[str] = None,
+    max_depth: int = 1,
+    pattern: Optional[str] = None,
+    exclude: Optional[List[str]] = None,
+    respect_gitignore: bool = True,
+    include_hidden: bool = False,
+    entry_type: str = "all",
+    sort_by: str = "name",
+    descending: bool = False,
+    offset: int = 0,
+    limit: int = 200,
+    ctx: Optional[Context] = None,
+) -> str:
+    """
+    List a directory tree with sizes and modification times, one page at a time
+
+    Args:
+        path: Directory to list, default is current directory
+        max_depth: How many levels to descend; 1 lists only direct children, 0 means unlimited
+        pattern: Only list entries matching this glob, e.g. '*.py' (name) or 'src/**/*.ts' (relative path)
+        exclude: Glob patterns of entries to skip, e.g. ['node_modules', '*.log']
+        respect_gitignore: Skip entries ignored by .gitignore files and VCS directories, default is True
+        include_hidden: Include entries whose name starts with '.', default is False
+        entry_type: 'all', 'files' or 'dirs'
+        sort_by: 'name' (relative path), 'size' or 'mtime'
+        descending: Reverse the sort order
+        offset: Number of entries to skip, for paging
+        limit: Maximum number of entries to return, default is 200
+
+    Returns:
+        One line per entry with its relative path, size and modification time, and paging information
+    """
+    path = await resolve_path(path, ctx)
+    if entry_type not in ("all", "files", "dirs"):
+        return "Error: entry_type must be 'all', 'files' or 'dirs'."
+    if sort_by not in ("name", "size", "mtime"):
+        return "Error: sort_by must be 'name', 'size' or 'mtime'."
+    if offset < 0 or limit <= 0:
+        return "Error: offset must be non-negative and limit must be positive."
+
+    try:
+        if not os.path.exists(path):
+            return f"Error: Directory '{path}' does not exist"
+        if not os.path.isdir(path):
+            return f"Error: '{path}' is not a directory"
+
+        def collect():
+            entries = []
+            for entry in walk_tree(path, max_depth or None, respect_gitignore, include_hidden, exclude):
+                if (entry_type == "files" and entry.is_dir) or (entry_type == "dirs" and not entry.is_dir):
+                    continue
+                if pattern and not glob_matches(pattern, entry.relative_path):
+                    continue
+                entries.append(entry)
+            key = {
+                "name": lambda entry: entry.relative_path,
+                "size": lambda entry: entry.size,
+                "mtime": lambda entry: entry.mtime,
+            }[sort_by]
+            entries.sort(key=key, reverse=descending)
+            return entries
+
+        entries = await asyncio.to_thread(collect)
+        if not entries:
+            return f"No matching entries in '{path}'"
+
+        page = entries[offset : offset + limit]
+        output = f"Entries {offset}-{offset + len(page) - 1} of {len(entries)} in '{path}':\n\n"
+        for entry in page:
+            modified = datetime.fromtimestamp(entry.mtime).isoformat(timespec="seconds")
+            if entry.is_dir:
+                output += f"📁 {entry.relative_path}/  {modified}\n"
+            else:
+                output += f"📄 {entry.relative_path}  {_format_size(entry.size)}  {modified}\n"
+        if offset + len(page) < len(entries):
+            output += (
+                f"\n{len(entries) - offset - len(page)} more entries; use offset={offset + len(page)} to continue."
+            )
+        return output
+
+    except PermissionError:
+        return f"Error: No permission to access directory '{path}'"
+    except Exception as e:
+        return f"Error listing files: {str(e)}"
+
+
+async def summarize_tree(
+    path: Optional[str] = None,
+    depth: int = 1,
+    top: int = 10,
+    refresh: bool = False,
+    ctx: Optional[Context] = None,
+) -> str:
+    """
+    Summarize what takes space in a directory tree, like du plus a file type breakdown
+
+    Directories are listed in parallel. Listings are cached and reused while a directory's modification
+    time is unchanged (for up to 5 minutes), so repeated summaries of a large tree only rescan what changed.
+
+    Args:
+        path: Directory to summarize, default is current directory
+        depth: How many levels of subdirectories to break the total down into, default is 1
+        top: Number of largest subdirectories and file extensions to show, default is 10
+        refresh: If True, rescan every directory instead of using cached listings
+
+    Returns:
+        Total size, file and directory counts, the largest subdirectories and the extensions taking the most space
+    """
+    path = os.path.abspath(await resolve_path(path, ctx))
+    if not os.path.isdir(path):
+        return f"Error: Directory '{path}' does not exist"
+    if depth < 0 or top <= 0:
+        return "Error: depth must be non-negative and top must be positive."
+
+    try:
+        started = asyncio.get_running_loop().time()
+        summary = await asyncio.to_thread(summarize_directories, path, refresh)
+        elapsed = asyncio.get_running_loop().time() - started
+    except PermissionError:
+        return f"Error: No permission to access directory '{path}'"
+    except Exception as e:
+        return f"Error summarizing directory: {str(e)}"
+
+    totals = summary["totals"]
+    root = totals.get(path)
+    if root is None:
+        # Listing the root itself failed, e.g. it was removed meanwhile or cannot be read
+        if not os.path.isdir(path):
+            return f"Error: Directory '{path}' does not exist"
+        return f"Error: Directory '{path}' could not be read"
+    output = (
+        f"Summary of '{path}': {_format_size(root.size)} in {root.files} files and {root.directories} directories\n"
+        f"({summary['scanned']} directories scanned, {summary['cached']} from cache, {elapsed:.2f}s)\n"
+    )
+    if summary["unreadable"]:
+        output += f"{len(summary['unreadable'])} directories could not be read\n"
+
+    subtrees = largest_subtrees(totals, path, depth)[:top]
+    if subtrees:
+        output += "\nLargest subdirectories:\n"
+        for total in subtrees:
+            extensions = ", ".join(extension for extension, _, _ in top_extensions(total, 3))
+            output += (
+                f"  {os.path.relpath(total.path, path)}/  {_format_size(total.size)}, {total.files} files"
+                + (f" ({extensions})" if extensions else "")
+                + "\n"
+            )
+
+    extensions = top_extensions(root, top)
+    if extensions:
+        output += "\nFile types by size:\n"
+        for extension, size, files in extensions:
+            output += f"  {extension}  {_format_size(size)}, {files} files\n"
+    return output
+
+
+async def search_files(
+    pattern: str,
+    path: Optional[str] = None,
+    regex: bool = True,
+    case_sensitive: bool = True,
+    glob: Optional[str] = None,
+    exclude: Optional[List[str]] = None,
+    respect_gitignore: bool = True,
+    include_hidden: bool = False,
+    context_lines: int = 0,
+    max_results: int = 200,
+    stream: bool = False,
+    ctx: Optional[Context] = None,
+) -> Union[PySearchResult, str]:
+    """
+    Search the contents of all text files in a directory tree, like grep -rn
+
+    Args:
+        pattern: Regular expression (or literal text if regex is False) to search for, matched per line
+        path: Directory to search, default is current directory
+        regex: If False, search for the pattern as literal text
+        case_sensitive: If False, ignore case
+        glob: Only search files matching this glob, e.g. '*.py' or 'src/**/*.ts'
+        exclude: Glob patterns of files and directories to skip
+        respect_gitignore: Skip files ignored by .gitignore and VCS directories, default is True
+        include_hidden: Search files and directories whose name starts with '.', default is False
+        context_lines: Number of lines of context to include before and after each match
+        max_results: Stop after this many matches, default is 200
+        stream: If True, also send each file's matches as MCP progress notifications as they are found
+
+    Returns:
+        PySearchResult with the matches (relative path, 0-based line, text and context) and file counts.
+        Binary files and files over 10 MB are skipped. An error message if the search cannot run.
+    """
+    path = await resolve_path(path, ctx)
+    if not os.path.isdir(path):
+        return f"Error: Directory '{path}' does not exist"
+    if context_lines < 0 or max_results <= 0:
+        return "Error: context_lines must be non-negative and max_results must be positive"
+    try:
+        compiled = compile_pattern(pattern, regex, case_sensitive)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    on_matches = None
+    if stream and ctx is not None:
+        loop = asyncio.get_running_loop()
+        found = 0
+
+        def on_matches(matches):
+            nonlocal found
+            found += len(matches)
+            message = "\n".join(f"{match.path}:{match.line}: {match.text}" for match in matches)
+            asyncio.run_coroutine_threadsafe(ctx.report_progress(progress=found, message=message), loop)
+
+    try:
+        return await asyncio.to_thread(
+            search_tree,
+            path,
+            compiled,
+            glob,
+            exclude,
+            respect_gitignore,
+            include_hidden,
+            context_lines,
+            max_results,
+            on_matches,
+        )
+    except PermissionError:
+        return f"Error: No permission to access directory '{path}'"
+    except Exception as e:
+        return f"Error searching files: {str(e)}"
+
+
+async def write_file(
+    path: str, content: str, mode: str = "overwrite", compression: str = None, ctx: Optional[Context] = None
+) -> str:
     """
     Write content to a file
 
@@ -246,10 +1192,13 @@ async def write_file(path: str, content: str, mode: str = "overwrite") -> str:
         path: Path to the file
         content: Content to write (string or JSON object)
         mode: Write mode ('overwrite' or 'append')
+        compression: Compress the content with 'gzip', 'bz2', 'xz' or 'zstd', or 'auto' to choose from the
+            file extension (optional)
 
     Returns:
         Operation result information
     """
+    path = await resolve_path(path, ctx)
     try:
         # Handle different content types
         if not isinstance(content, str):
@@ -278,6 +1227,13 @@ async def write_file(path: str, content: str, mode: str = "overwrite") -> str:
                 except Exception as inner_e:
                     return f"Error: Unable to convert complex object to writable string: {str(e)}, then tried alternative method and got: {str(inner_e)}"
 
+        if compression == "auto":
+            compression = compression_for_path(path)
+            if compression is None:
+                return f"Error: Cannot choose a compression from the extension of '{path}'."
+        if compression is not None and compression not in MAGIC_NUMBERS:
+            return f"Error: Unsupported compression '{compression}'. Use one of: {', '.join(MAGIC_NUMBERS)}, auto."
+
         # Choose file mode based on the specified writing mode
         file_mode = "w" if mode.lower() == "overwrite" else "a"
 
@@ -290,12 +1246,22 @@ async def write_file(path: str, content: str, mode: str = "overwrite") -> str:
         if directory and not os.path.exists(directory):
             os.makedirs(directory, exist_ok=True)
 
-        with open(path, file_mode, encoding="utf-8") as file:
-            file.write(content)
+        if compression is None:
+            with open(path, file_mode, encoding="utf-8") as file:
+                file.write(content)
+        else:
+            # Appending adds a compressed stream that reads back as a continuation of the file
+            def write_compressed() -> None:
+                with open_compressed_for_write(path, compression, append=file_mode == "a") as file:
+                    file.write(content.encode("utf-8"))
+
+            await asyncio.to_thread(write_compressed)
 
         # Verify the write operation was successful
         if os.path.exists(path):
             file_size = os.path.getsize(path)
+            if compression is not None:
+                return f"Successfully wrote {file_size} bytes ({compression}-compressed) to '{path}' in {mode} mode."
             return f"Successfully wrote {file_size} bytes to '{path}' in {mode} mode."
         else:
             return f"Write operation completed, but unable to verify file exists at '{path}'."
@@ -306,21 +1272,175 @@ async def write_file(path: str, content: str, mode: str = "overwrite") -> str:
         return f"Error: No permission to write to file '{path}'."
     except Exception as e:
         return f"Error writing to file: {str(e)}"
+    finally:
+        # Row lookups must not use offsets from before the change
+        line_indexes.invalidate(path)
+
+
+async def begin_write(path: str, total_size: int = None, sha256: str = None, ctx: Optional[Context] = None) -> str:
+    """
+    Start writing a large file in chunks, or resume an unfinished chunked write to the same path
+
+    Chunks are written to a partial file with write_chunk; commit_write then verifies the result and
+    atomically replaces the destination, so a dropped connection never leaves a half-written file.
+
+    Args:
+        path: Path to the file to write
+        total_size: Expected size of the file in bytes, checked on commit (optional)
+        sha256: Expected SHA-256 hex digest of the whole file, checked on commit (optional)
+
+    Returns:
+        The upload id and the offset to send the next chunk at
+    """
+    path = await resolve_path(path, ctx)
+    try:
+        if os.path.isdir(path):
+            return f"Error: '{path}' is a directory."
+        if total_size is not None and total_size < 0:
+            return "Error: total_size must be non-negative."
+
+        upload, resumed = await asyncio.to_thread(chunked_writes.begin, path, total_size, sha256)
+        if resumed:
+            return (
+                f"Resuming upload {upload.id} to '{upload.path}': {upload.received} bytes received. "
+                f"Continue with write_chunk at offset {upload.received}."
+            )
+        return f"Started upload {upload.id} to '{upload.path}'. Send chunks with write_chunk starting at offset 0."
+
+    except PermissionError:
+        return f"Error: No permission to write to '{path}'."
+    except Exception as e:
+        return f"Error starting chunked write: {str(e)}"
+
+
+def _upload_not_found(upload_id: str) -> str:
+    return f"Error: Upload '{upload_id}' does not exist or has expired. Start again with begin_write."
+
+
+async def write_chunk(upload_id: str, offset: int, content: str, encoding: str = "utf-8", sha256: str = None) -> str:
+    """
+    Write one chunk of a file started with begin_write
+
+    A chunk may be resent at an earlier offset, e.g. after a dropped connection, but must not leave a gap.
+
+    Args:
+        upload_id: Id returned by begin_write
+        offset: Byte offset of the chunk in the file
+        content: Chunk content
+        encoding: 'utf-8' for text or 'base64' for binary data, default is utf-8
+        sha256: SHA-256 hex digest of the decoded chunk, to detect corruption in transit (optional)
+
+    Returns:
+        Number of bytes received so far
+    """
+    upload = chunked_writes.get(upload_id)
+    if upload is None:
+        return _upload_not_found(upload_id)
+
+    try:
+        if encoding == "base64":
+            data = base64.b64decode(content, validate=True)
+        elif encoding == "utf-8":
+            data = content.encode("utf-8")
+        else:
+            return f"Error: Unsupported encoding '{encoding}'. Use 'utf-8' or 'base64'."
+    except binascii.Error as e:
+        return f"Error: Chunk is not valid base64: {str(e)}"
+
+    if len(data) > MAX_CHUNK_BYTES:
+        return f"Error: Chunk is {len(data)} bytes; send at most {MAX_CHUNK_BYTES} bytes per chunk."
+    if offset < 0:
+        return "Error: offset must be non-negative."
+    if sha256 and hashlib.sha256(data).hexdigest() != sha256.lower():
+        return f"Error: Chunk checksum mismatch at offset {offset}; resend the chunk."
+
+    try:
+        await asyncio.to_thread(upload.write, offset, data)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    except Exception as e:
+        return f"Error writing chunk: {str(e)}"
+
+    total = f" of {upload.total_size}" if upload.total_size is not None else ""
+    return f"Wrote {len(data)} bytes at offset {offset}; {upload.received}{total} bytes received."
+
+
+async def commit_write(upload_id: str, sha256: str = None) -> str:
+    """
+    Finish a chunked write: verify its size and checksum, then atomically replace the destination file
+
+    Args:
+        upload_id: Id returned by begin_write
+        sha256: Expected SHA-256 hex digest of the whole file, if not given to begin_write (optional)
+
+    Returns:
+        Operation result information, including the SHA-256 of the written file
+    """
+    upload = chunked_writes.get(upload_id)
+    if upload is None:
+        return _upload_not_found(upload_id)
+
+    try:
+        digest = await asyncio.to_thread(upload.commit, sha256)
+    except ValueError as e:
+        # The upload stays open so missing or corrupt chunks can be resent
+        return f"Error: {str(e)}"
+    except PermissionError:
+        return f"Error: No permission to write to file '{upload.path}'."
+    except Exception as e:
+        return f"Error committing chunked write: {str(e)}"
+    finally:
+        line_indexes.invalidate(upload.path)
+
+    chunked_writes.finish(upload_id)
+    return f"Successfully wrote {upload.received} bytes to '{upload.path}' (sha256 {digest})."
 
 
-async def read_file(path: str, start_row: int = None, end_row: int = None, as_json: bool = False) -> str:
+async def abort_write(upload_id: str) -> str:
     """
-    Read content from a file with optional row selection
+    Cancel a chunked write and delete its partial file; the destination file is left unchanged
+
+    Args:
+        upload_id: Id returned by begin_write
+
+    Returns:
+        Operation result information
+    """
+    upload = chunked_writes.get(upload_id)
+    if upload is None:
+        return _upload_not_found(upload_id)
+
+    await asyncio.to_thread(chunked_writes.finish, upload_id)
+    return f"Aborted upload {upload_id} to '{upload.path}'."
+
+
+async def read_file(
+    path: str,
+    start_row: int = None,
+    end_row: int = None,
+    as_json: bool = False,
+    offset: int = None,
+    length: int = None,
+    ctx: Optional[Context] = None,
+) -> str:
+    """
+    Read content from a file with optional row or byte range selection
+
+    Only the requested part of the file is read, so ranges of very large files are cheap. gzip, bz2, xz and
+    zstd files are decompressed transparently; rows and offsets then refer to the decompressed content.
 
     Args:
         path: Path to the file
         start_row: Starting row to read from (0-based, optional)
         end_row: Ending row to read to (0-based, inclusive, optional)
         as_json: If True, attempt to parse file content as JSON (optional)
+        offset: Byte offset to start reading from instead of selecting rows (optional)
+        length: Number of bytes to read from offset, default is 64 KB (optional)
 
     Returns:
         File content or selected lines, optionally parsed as JSON
     """
+    path = await resolve_path(path, ctx)
     try:
         if not os.path.exists(path):
             return f"Error: File '{path}' does not exist."
@@ -328,13 +1448,27 @@ async def read_file(path: str, start_row: int = None, end_row: int = None, as_js
         if not os.path.isfile(path):
             return f"Error: '{path}' is not a file."
 
-        # Check file size before reading to prevent memory issues
         file_size = os.path.getsize(path)
-        if file_size > 10 * 1024 * 1024:  # 10 MB limit
-            return f"Warning: File is very large ({file_size / 1024 / 1024:.2f} MB). Consider using row selection."
-
-        with open(path, "r", encoding="utf-8", errors="replace") as file:
-            lines = file.readlines()
+        compression = await asyncio.to_thread(detect_file_compression, path)
+
+        # Byte range selection
+        if offset is not None or length is not None:
+            if start_row is not None or as_json:
+                return "Error: offset/length cannot be combined with row selection or as_json."
+            offset = offset or 0
+            length = DEFAULT_READ_LENGTH if length is None else length
+            if offset < 0 or length < 0:
+                return "Error: offset and length must be non-negative."
+            if compression is None:
+                data = await asyncio.to_thread(read_bytes, path, offset, length)
+                more, total = offset + len(data) < file_size, str(file_size)
+            else:
+                # The decompressed size is unknown; one extra byte tells whether more follows
+                data = await asyncio.to_thread(read_bytes, path, offset, length + 1)
+                more, total, data = len(data) > length, f"decompressed {compression} data", data[:length]
+            end = offset + len(data)
+            header = f"Bytes {offset}-{end} of {total}" + (" (more available)" if more else "") + ":\n"
+            return header + data.decode("utf-8", errors="replace")
 
         # If row selection is specified
         if start_row is not None:
@@ -343,26 +1477,39 @@ async def read_file(path: str, start_row: int = None, end_row: int = None, as_js
 
             # If only start_row is specified, read just that single row
             if end_row is None:
-                if start_row >= len(lines):
-                    return f"Error: start_row {start_row} is out of range (file has {len(lines)} lines)."
-                content = f"Line {start_row}: {lines[start_row]}"
+                lines, total = await asyncio.to_thread(read_lines, path, start_row, start_row)
+                if not lines:
+                    return f"Error: start_row {start_row} is out of range (file has {total} lines)."
+                content = f"Line {start_row}: {lines[0]}"
             else:
                 # Both start_row and end_row are specified
                 if end_row < start_row:
                     return "Error: end_row must be greater than or equal to start_row."
 
-                if end_row >= len(lines):
-                    end_row = len(lines) - 1
-
-                selected_lines = lines[start_row : end_row + 1]
+                selected_lines, _ = await asyncio.to_thread(read_lines, path, start_row, end_row)
                 content = ""
                 for i, line in enumerate(selected_lines):
-                    content += (
-                        f"Line {start_row + i}: {line}" if not line.endswith("\n") else f"Line {start_row + i}: {line}"
-                    )
+                    content += f"Line {start_row + i}: {line}"
         else:
+            # Check file size before reading the whole file to prevent memory issues
+            if file_size > MAX_FULL_READ_BYTES:
+                return (
+                    f"Warning: File is very large ({file_size / 1024 / 1024:.2f} MB). "
+                    "Consider using row selection or offset/length."
+                )
+
             # If no row selection, return the entire file
-            content = "".join(lines)
+            if compression is None:
+                with open(path, "r", encoding="utf-8", errors="replace") as file:
+                    content = file.read()
+            else:
+                data = await asyncio.to_thread(read_bytes, path, 0, MAX_FULL_READ_BYTES + 1)
+                if len(data) > MAX_FULL_READ_BYTES:
+                    return (
+                        f"Warning: File decompresses to more than {MAX_FULL_READ_BYTES // 1024 // 1024} MB. "
+                        "Consider using row selection or offset/length."
+                    )
+                content = data.decode("utf-8", errors="replace")
 
         # If as_json is True, try to parse the content as JSON
         if as_json:
@@ -390,7 +1537,138 @@ async def read_file(path: str, start_row: int = None, end_row: int = None, as_js
         return f"Error reading file: {str(e)}"
 
 
-async def insert_file_content(path: str, content: str, row: int = None, rows: list = None) -> str:
+async def tail_file(path: str, lines: int = 10, ctx: Optional[Context] = None) -> str:
+    """
+    Read the last lines of a file, reading backwards from the end so large files stay cheap
+
+    Compressed files (gzip, bz2, xz, zstd) are decompressed in one streaming pass instead.
+
+    Args:
+        path: Path to the file
+        lines: Number of lines to return, default is 10
+
+    Returns:
+        The last lines of the file
+    """
+    path = await resolve_path(path, ctx)
+    try:
+        if not os.path.exists(path):
+            return f"Error: File '{path}' does not exist."
+
+        if not os.path.isfile(path):
+            return f"Error: '{path}' is not a file."
+
+        if lines < 0:
+            return "Error: lines must be non-negative."
+
+        selected_lines, offset = await asyncio.to_thread(tail_lines, path, lines)
+        return f"Last {len(selected_lines)} lines of '{path}' (from byte {offset}):\n" + "".join(selected_lines)
+
+    except PermissionError:
+        return f"Error: No permission to read file '{path}'."
+    except Exception as e:
+        return f"Error reading file: {str(e)}"
+
+
+async def follow_file(
+    path: str,
+    max_bytes: int = 65536,
+    initial_lines: int = 10,
+    wait_seconds: float = 0,
+    stream: bool = False,
+    ctx: Optional[Context] = None,
+) -> str:
+    """
+    Follow a growing file such as a log, like tail -f
+
+    The first call returns the last lines of the file; every later call in the same session returns only
+    what was appended since the previous call. If the file is truncated or replaced (log rotation),
+    reading restarts from its beginning.
+
+    Args:
+        path: Path to the file
+        max_bytes: Maximum number of new bytes to return per call, default is 64 KB
+        initial_lines: Number of lines returned by the first call, default is 10
+        wait_seconds: If there is no new data, wait up to this many seconds for some, default is 0
+        stream: If True, keep following for wait_seconds and send new data as MCP progress notifications
+
+    Returns:
+        The newly appended content
+    """
+    path = await resolve_path(path, ctx)
+    try:
+        if not os.path.exists(path):
+            return f"Error: File '{path}' does not exist."
+
+        if not os.path.isfile(path):
+            return f"Error: '{path}' is not a file."
+
+        if await asyncio.to_thread(detect_file_compression, path) is not None:
+            return f"Error: '{path}' is compressed and cannot be followed; use tail_file instead."
+
+        if max_bytes <= 0 or initial_lines < 0 or wait_seconds < 0:
+            return "Error: max_bytes must be positive, initial_lines and wait_seconds non-negative."
+
+        session = _session_key(ctx)
+        result = follow_positions.follow(session, path, max_bytes, initial_lines)
+        start, text, notes = result["start"], result["text"], []
+        # Bytes returned so far, which max_bytes limits; text can hold fewer characters
+        received = result["end"] - result["start"]
+        if result["status"] == "reset":
+            notes.append("File was truncated or replaced; reading from its beginning.")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds
+        while result["status"] != "started" and (stream or not text) and received < max_bytes:
+            # When data is already waiting there is no need to sleep
+            if not result["more"]:
+                if loop.time() >= deadline:
+                    break
+                await asyncio.sleep(FOLLOW_POLL_INTERVAL)
+            result = follow_positions.follow(session, path, max_bytes - received, initial_lines)
+            if result["status"] == "reset":
+                notes.append("File was truncated or replaced; reading from its beginning.")
+                start, text, received = 0, "", 0
+            if result["text"]:
+                text += result["text"]
+                received += result["end"] - result["start"]
+                if stream and ctx is not None:
+                    await ctx.report_progress(progress=result["end"], message=result["text"])
+
+        if result["status"] == "started":
+            output = f"Last {initial_lines} lines of '{path}' (following from byte {result['end']}):\n{text}"
+        elif text:
+            output = f"New content in '{path}' (bytes {start}-{result['end']}):\n{text}"
+        else:
+            output = f"No new content in '{path}' (size {result['size']} bytes)."
+        if result["more"]:
+            output += "\n[More content is available; call follow_file again.]"
+        return "\n".join(notes + [output])
+
+    except PermissionError:
+        return f"Error: No permission to read file '{path}'."
+    except Exception as e:
+        return f"Error following file: {str(e)}"
+
+
+def _invalid_rows(rows) -> Optional[str]:
+    """Error message if rows is not a list of non-negative row numbers."""
+    if not isinstance(rows, list):
+        return "Error: 'rows' parameter must be a list of integers."
+    if any(not isinstance(r, int) or r < 0 for r in rows):
+        return "Error: Row numbers must be non-negative integers."
+    return None
+
+
+async def _row_contains(path: str, row: int, substring: str) -> bool:
+    """Whether a row contains substring, read through the line index."""
+    lines, _ = await asyncio.to_thread(read_lines, path, row, row)
+    return bool(lines) and substring in lines[0]
+
+
+async def insert_file_content(
+    path: str, content: str, row: int = None, rows: list = None, ctx: Optional[Context] = None
+) -> str:
     """
     Insert content at specific row(s) in a file
 
@@ -403,6 +1681,7 @@ async def insert_file_content(path: str, content: str, row: int = None, rows: li
     Returns:
         Operation result information
     """
+    path = await resolve_path(path, ctx)
     try:
         # Handle different content types
         if not isinstance(content, str):
@@ -426,42 +1705,15 @@ async def insert_file_content(path: str, content: str, row: int = None, rows: li
             with open(path, "w", encoding="utf-8") as file:
                 pass
 
-        with open(path, "r", encoding="utf-8", errors="replace") as file:
-            lines = file.readlines()
-
-        # Ensure all existing lines end with newlines
-        for i in range(len(lines)):
-            if lines[i] and not lines[i].endswith("\n"):
-                lines[i] += "\n"
-
-        # Prepare lines for insertion
-        content_lines = content.splitlines(True)  # Keep line endings
-
-        # Handle inserting at specific rows
+        # Rows refer to the file before the insert; rows past its end are padded with empty lines
         if rows is not None:
-            if not isinstance(rows, list):
-                return "Error: 'rows' parameter must be a list of integers."
+            error = _invalid_rows(rows)
+            if error:
+                return error
 
-            # Sort rows in descending order to avoid changing indices during insertion
             rows = sorted(rows, reverse=True)
-
-            for r in rows:
-                if not isinstance(r, int) or r < 0:
-                    return "Error: Row numbers must be non-negative integers."
-
-                if r > len(lines):
-                    # If row is beyond the file, append necessary empty lines
-                    lines.extend(["\n"] * (r - len(lines)))
-                    lines.extend(content_lines)
-                else:
-                    # Insert content at each specified row
-                    for line in reversed(content_lines):
-                        lines.insert(r, line)
-
-            # Write back to the file
-            with open(path, "w", encoding="utf-8") as file:
-                file.writelines(lines)
-
+            edits = [PyFileEdit(action="insert", row=r, content=content) for r in rows]
+            await asyncio.to_thread(apply_edits, path, edits)
             return f"Successfully inserted content at rows {rows} in '{path}'."
 
         # Handle inserting at a single row
@@ -469,19 +1721,7 @@ async def insert_file_content(path: str, content: str, row: int = None, rows: li
             if not isinstance(row, int) or row < 0:
                 return "Error: Row number must be a non-negative integer."
 
-            if row > len(lines):
-                # If row is beyond the file, append necessary empty lines
-                lines.extend(["\n"] * (row - len(lines)))
-                lines.extend(content_lines)
-            else:
-                # Insert content at the specified row
-                for line in reversed(content_lines):
-                    lines.insert(row, line)
-
-            # Write back to the file
-            with open(path, "w", encoding="utf-8") as file:
-                file.writelines(lines)
-
+            await asyncio.to_thread(apply_edits, path, [PyFileEdit(action="insert", row=row, content=content)])
             return f"Successfully inserted content at row {row} in '{path}'."
 
         # If neither row nor rows specified, append to the end
@@ -494,9 +1734,14 @@ async def insert_file_content(path: str, content: str, row: int = None, rows: li
         return f"Error: No permission to modify file '{path}'."
     except Exception as e:
         return f"Error inserting content: {str(e)}"
+    finally:
+        # Row lookups must not use offsets from before the change
+        line_indexes.invalidate(path)
 
 
-async def delete_file_content(path: str, row: int = None, rows: list = None, substring: str = None) -> str:
+async def delete_file_content(
+    path: str, row: int = None, rows: list = None, substring: str = None, ctx: Optional[Context] = None
+) -> str:
     """
     Delete content at specific row(s) from a file
 
@@ -509,6 +1754,7 @@ async def delete_file_content(path: str, row: int = None, rows: list = None, sub
     Returns:
         Operation result information
     """
+    path = await resolve_path(path, ctx)
     try:
         if not os.path.exists(path):
             return f"Error: File '{path}' does not exist."
@@ -516,122 +1762,72 @@ async def delete_file_content(path: str, row: int = None, rows: list = None, sub
         if not os.path.isfile(path):
             return f"Error: '{path}' is not a file."
 
-        with open(path, "r", encoding="utf-8", errors="replace") as file:
-            lines = file.readlines()
+        # If neither row, rows nor substring specified, clear the file
+        if row is None and rows is None and substring is None:
+            os.truncate(path, 0)
+            line_indexes.invalidate(path)
+            return f"Successfully cleared all content from '{path}'."
 
-        total_lines = len(lines)
-        deleted_rows = []
-        modified_rows = []
+        if rows is not None:
+            error = _invalid_rows(rows)
+            if error:
+                return error
+        elif row is not None and (not isinstance(row, int) or row < 0):
+            return "Error: Row number must be a non-negative integer."
+        if substring == "":
+            return "Error: substring must not be empty."
+
+        # Rows are located through the cached line index, which apply_edits reuses
+        total_lines = await asyncio.to_thread(count_lines, path)
+        if rows is None and row is not None and row >= total_lines:
+            return f"Error: Row {row} is out of range (file has {total_lines} lines)."
 
         # Handle substring deletion (doesn't delete entire rows)
         if substring is not None:
-            # For multiple rows
             if rows is not None:
-                if not isinstance(rows, list):
-                    return "Error: 'rows' parameter must be a list of integers."
-
-                for r in rows:
-                    if not isinstance(r, int) or r < 0:
-                        return "Error: Row numbers must be non-negative integers."
-
-                    if r < total_lines and substring in lines[r]:
-                        original_line = lines[r]
-                        lines[r] = lines[r].replace(substring, "")
-                        # Ensure line ends with newline if original did
-                        if original_line.endswith("\n") and not lines[r].endswith("\n"):
-                            lines[r] += "\n"
-                        modified_rows.append(r)
-
-            # For single row
+                edits = [
+                    PyFileEdit(action="delete", row=r, substring=substring)
+                    for r in sorted(set(rows))
+                    if r < total_lines
+                ]
             elif row is not None:
-                if not isinstance(row, int) or row < 0:
-                    return "Error: Row number must be a non-negative integer."
-
-                if row >= total_lines:
-                    return f"Error: Row {row} is out of range (file has {total_lines} lines)."
-
-                if substring in lines[row]:
-                    original_line = lines[row]
-                    lines[row] = lines[row].replace(substring, "")
-                    # Ensure line ends with newline if original did
-                    if original_line.endswith("\n") and not lines[row].endswith("\n"):
-                        lines[row] += "\n"
-                    modified_rows.append(row)
-
-            # For entire file
+                if not await _row_contains(path, row, substring):
+                    return f"No occurrences of '{substring}' found in the specified rows."
+                edits = [PyFileEdit(action="delete", row=row, substring=substring)]
             else:
-                for i in range(len(lines)):
-                    if substring in lines[i]:
-                        original_line = lines[i]
-                        lines[i] = lines[i].replace(substring, "")
-                        # Ensure line ends with newline if original did
-                        if original_line.endswith("\n") and not lines[i].endswith("\n"):
-                            lines[i] += "\n"
-                        modified_rows.append(i)
-
-            # Write back to the file
-            with open(path, "w", encoding="utf-8") as file:
-                file.writelines(lines)
+                # For entire file
+                edits = [PyFileEdit(action="delete", substring=substring)]
 
-            if not modified_rows:
+            counts = await asyncio.to_thread(apply_edits, path, edits) if edits else None
+            if not counts or not counts["substituted"]:
                 return f"No occurrences of '{substring}' found in the specified rows."
-            return f"Successfully removed '{substring}' from {len(modified_rows)} rows ({modified_rows}) in '{path}'."
+            return f"Successfully removed '{substring}' from {counts['substituted']} rows in '{path}'."
 
         # Handle deleting multiple rows
         elif rows is not None:
-            if not isinstance(rows, list):
-                return "Error: 'rows' parameter must be a list of integers."
-
-            # Sort rows in descending order to avoid changing indices during deletion
-            rows = sorted(rows, reverse=True)
-
-            for r in rows:
-                if not isinstance(r, int) or r < 0:
-                    return "Error: Row numbers must be non-negative integers."
-
-                if r < total_lines:
-                    lines.pop(r)
-                    deleted_rows.append(r)
-
-            # Write back to the file
-            with open(path, "w", encoding="utf-8") as file:
-                file.writelines(lines)
-
+            deleted_rows = sorted({r for r in rows if r < total_lines}, reverse=True)
             if not deleted_rows:
                 return f"No rows were within range to delete (file has {total_lines} lines)."
+
+            await asyncio.to_thread(apply_edits, path, [PyFileEdit(action="delete", row=r) for r in deleted_rows])
             return f"Successfully deleted {len(deleted_rows)} rows ({deleted_rows}) from '{path}'."
 
         # Handle deleting a single row
-        elif row is not None:
-            if not isinstance(row, int) or row < 0:
-                return "Error: Row number must be a non-negative integer."
-
-            if row >= total_lines:
-                return f"Error: Row {row} is out of range (file has {total_lines} lines)."
-
-            # Delete the specified row
-            lines.pop(row)
-
-            # Write back to the file
-            with open(path, "w", encoding="utf-8") as file:
-                file.writelines(lines)
-
-            return f"Successfully deleted row {row} from '{path}'."
-
-        # If neither row nor rows specified, clear the file
         else:
-            with open(path, "w", encoding="utf-8") as file:
-                pass
-            return f"Successfully cleared all content from '{path}'."
+            await asyncio.to_thread(apply_edits, path, [PyFileEdit(action="delete", row=row)])
+            return f"Successfully deleted row {row} from '{path}'."
 
     except PermissionError:
         return f"Error: No permission to modify file '{path}'."
     except Exception as e:
         return f"Error deleting content: {str(e)}"
+    finally:
+        # Row lookups must not use offsets from before the change
+        line_indexes.invalidate(path)
 
 
 async def update_file_content(
-    path: str, content: str, row: int = None, rows: list = None, substring: str = None
+    path: str, content: str, row: int = None, rows: list = None, substring: str = None, ctx: Optional[Context] = None
 ) -> str:
     """
     Update content at specific row(s) in a file
@@ -646,6 +1842,7 @@ async def update_file_content(
     Returns:
         Operation result information
     """
+    path = await resolve_path(path, ctx)
     try:
         # Handle different content types
         if not isinstance(content, str):
@@ -662,124 +1859,172 @@ async def update_file_content(
         if not os.path.isfile(path):
             return f"Error: '{path}' is not a file."
 
-        with open(path, "r", encoding="utf-8", errors="replace") as file:
-            lines = file.readlines()
-
-        total_lines = len(lines)
-        updated_rows = []
-
         # Ensure content ends with a newline if replacing a full line and doesn't already have one
         if substring is None and content and not content.endswith("\n"):
             content += "\n"
 
-        # Prepare lines for update
-        content_lines = content.splitlines(True) if substring is None else [content]
+        # If neither row, rows nor substring specified, replace the entire file content
+        if row is None and rows is None and substring is None:
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(content)
+            return f"Successfully updated all content in '{path}'."
+
+        if rows is not None:
+            error = _invalid_rows(rows)
+            if error:
+                return error
+        elif row is not None and (not isinstance(row, int) or row < 0):
+            return "Error: Row number must be a non-negative integer."
+        if substring == "":
+            return "Error: substring must not be empty."
+
+        # Rows are located through the cached line index, which apply_edits reuses
+        total_lines = await asyncio.to_thread(count_lines, path)
+        if rows is None and row is not None and row >= total_lines:
+            return f"Error: Row {row} is out of range (file has {total_lines} lines)."
+
+        content_lines = content.splitlines(True)
 
         # Handle updating multiple rows
         if rows is not None:
-            if not isinstance(rows, list):
-                return "Error: 'rows' parameter must be a list of integers."
-
-            for r in rows:
-                if not isinstance(r, int) or r < 0:
-                    return "Error: Row numbers must be non-negative integers."
-
-                if r < total_lines:
-                    # If substring is provided, only replace that part
-                    if substring is not None:
-                        # Only update if substring exists in the line
-                        if substring in lines[r]:
-                            original_line = lines[r]
-                            lines[r] = lines[r].replace(substring, content)
-                            # Ensure line ends with newline if original did
-                            if original_line.endswith("\n") and not lines[r].endswith("\n"):
-                                lines[r] += "\n"
-                            updated_rows.append(r)
-                    else:
-                        # Otherwise, replace the entire line
-                        # If we have multiple content lines, use them in sequence
-                        if len(content_lines) > 1:
-                            content_index = r % len(content_lines)
-                            lines[r] = content_lines[content_index]
-                        else:
-                            # If we have only one content line, use it for all rows
-                            lines[r] = content_lines[0] if content_lines else "\n"
-                        updated_rows.append(r)
-
-            # Write back to the file
-            with open(path, "w", encoding="utf-8") as file:
-                file.writelines(lines)
+            updated_rows = sorted({r for r in rows if r < total_lines})
+            if substring is not None:
+                edits = [PyFileEdit(action="update", row=r, content=content, substring=substring) for r in updated_rows]
+            else:
+                # Several content lines are used in turn, by row number; one line is used for every row
+                edits = [
+                    PyFileEdit(
+                        action="update", row=r, content=content_lines[r % len(content_lines)] if content_lines else ""
+                    )
+                    for r in updated_rows
+                ]
 
-            if not updated_rows:
+            counts = await asyncio.to_thread(apply_edits, path, edits) if edits else None
+            updated = 0 if counts is None else counts["substituted"] if substring is not None else counts["updated"]
+            if not updated:
                 if substring is not None:
-                    return f"No occurrences of substring '{substring}' found in the specified rows (file has {total_lines} lines)."
+                    return (
+                        f"No occurrences of substring '{substring}' found in the specified rows "
+                        f"(file has {total_lines} lines)."
+                    )
                 else:
                     return f"No rows were within range to update (file has {total_lines} lines)."
 
             if substring is not None:
-                return f"Successfully updated substring in {len(updated_rows)} rows ({updated_rows}) in '{path}'."
+                return f"Successfully updated substring in {updated} rows in '{path}'."
             else:
                 return f"Successfully updated {len(updated_rows)} rows ({updated_rows}) in '{path}'."
 
         # Handle updating a single row
         elif row is not None:
-            if not isinstance(row, int) or row < 0:
-                return "Error: Row number must be a non-negative integer."
-
-            if row >= total_lines:
-                return f"Error: Row {row} is out of range (file has {total_lines} lines)."
-
-            # If substring is provided, only replace that part
             if substring is not None:
-                # Only update if substring exists in the line
-                if substring in lines[row]:
-                    original_line = lines[row]
-                    lines[row] = lines[row].replace(substring, content)
-                    # Ensure line ends with newline if original did
-                    if original_line.endswith("\n") and not lines[row].endswith("\n"):
-                        lines[row] += "\n"
-                else:
+                if not await _row_contains(path, row, substring):
                     return f"Substring '{substring}' not found in row {row}."
+                edit = PyFileEdit(action="update", row=row, content=content, substring=substring)
             else:
-                # Otherwise, replace the entire line
-                lines[row] = content_lines[0] if content_lines else "\n"
-
-            # Write back to the file
-            with open(path, "w", encoding="utf-8") as file:
-                file.writelines(lines)
+                edit = PyFileEdit(action="update", row=row, content=content_lines[0] if content_lines else "")
 
+            await asyncio.to_thread(apply_edits, path, [edit])
             if substring is not None:
                 return f"Successfully updated substring in row {row} in '{path}'."
             else:
                 return f"Successfully updated row {row} in '{path}'."
 
-        # If neither row nor rows specified, update the entire file
+        # Replace substring throughout the file
         else:
-            if substring is not None:
-                # Replace substring throughout the file
-                updated_count = 0
-                for i in range(len(lines)):
-                    if substring in lines[i]:
-                        original_line = lines[i]
-                        lines[i] = lines[i].replace(substring, content)
-                        # Ensure line ends with newline if original did
-                        if original_line.endswith("\n") and not lines[i].endswith("\n"):
-                            lines[i] += "\n"
-                        updated_count += 1
-
-                with open(path, "w", encoding="utf-8") as file:
-                    file.writelines(lines)
-
-                if updated_count == 0:
-                    return f"Substring '{substring}' not found in any line of '{path}'."
-                return f"Successfully updated substring in {updated_count} lines in '{path}'."
-            else:
-                # Replace entire file content
-                with open(path, "w", encoding="utf-8") as file:
-                    file.write(content)
-                return f"Successfully updated all content in '{path}'."
+            counts = await asyncio.to_thread(
+                apply_edits, path, [PyFileEdit(action="update", content=content, substring=substring)]
+            )
+            if counts["substituted"] == 0:
+                return f"Substring '{substring}' not found in any line of '{path}'."
+            return f"Successfully updated substring in {counts['substituted']} lines in '{path}'."
 
     except PermissionError:
         return f"Error: No permission to modify file '{path}'."
     except Exception as e:
         return f"Error updating content: {str(e)}"
+    finally:
+        # Row lookups must not use offsets from before the change
+        line_indexes.invalidate(path)
+
+
+async def apply_file_edits(path: str, edits: List[PyFileEdit], ctx: Optional[Context] = None) -> str:
+    """
+    Apply several row and substring edits to a file at once, atomically
+
+    Prefer this over repeated insert_file_content, delete_file_content and update_file_content calls: the
+    file is rewritten once, and every row number refers to the file as it was before any of the edits.
+
+    Args:
+        path: Path to the file
+        edits: Edits to apply. Each has an action ('insert', 'delete' or 'update'), a 0-based row, content
+            (inserted text, the new row, or the replacement for substring) and an optional substring to
+            delete or replace within the row instead of the whole row. A substring edit without a row
+            applies to every row; an insert without a row appends to the end of the file.
+
+    Returns:
+        Operation result information
+    """
+    path = await resolve_path(path, ctx)
+    try:
+        if not os.path.exists(path):
+            return f"Error: File '{path}' does not exist."
+
+        if not os.path.isfile(path):
+            return f"Error: '{path}' is not a file."
+
+        if not edits:
+            return "Error: No edits given."
+
+        counts = await asyncio.to_thread(apply_edits, path, edits)
+        return (
+            f"Successfully applied {len(edits)} edits to '{path}': inserted {counts['inserted']} lines, "
+            f"deleted {counts['deleted']}, updated {counts['updated']}, changed substrings in {counts['substituted']}."
+        )
+
+    except ValueError as e:
+        return f"Error: {str(e)}. No changes were made."
+    except PermissionError:
+        return f"Error: No permission to modify file '{path}'."
+    except Exception as e:
+        return f"Error applying edits: {str(e)}"
+
+
+async def apply_patch(patch: str, strip: int = None, dry_run: bool = False, ctx: Optional[Context] = None) -> str:
+    """
+    Apply a unified diff (from `diff -u` or `git diff`) to one or many files
+
+    Hunks are placed by their context, tolerating shifted line numbers, whitespace differences and up to
+    two mismatching context lines at each end. Either every file is patched or, if any hunk does not
+    apply, none is; each file is replaced atomically.
+
+    Args:
+        patch: The unified diff; files are created or deleted when one side is /dev/null, and renamed only
+            by git's rename headers
+        strip: Leading path components to remove from file names, like patch -p; by default 1 for
+            git-style a/ and b/ paths, otherwise 0 (optional)
+        dry_run: If True, only check that the patch applies
+
+    Returns:
+        The files changed, with any hunks that applied at an offset or with fuzz
+    """
+    try:
+        file_patches = parse_unified_diff(patch, strip)
+        cwd = await get_session_cwd(ctx)
+        results = await asyncio.to_thread(
+            apply_patch_files, file_patches, lambda path: os.path.join(cwd, path), dry_run
+        )
+    except ValueError as e:
+        return f"Error: {str(e)}. No files were changed."
+    except PermissionError as e:
+        return f"Error: No permission to write '{e.filename}'. No files were changed."
+    except Exception as e:
+        return f"Error applying patch: {str(e)}"
+
+    output = f"Patch {'can be applied' if dry_run else 'applied'} to {len(results)} files:\n"
+    for result in results:
+        output += f"  {result['path']}: {result['action']} ({result['hunks']} hunks)"
+        if result["notes"]:
+            output += f"; {', '.join(result['notes'])}"
+        output += "\n"
+    return output
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+# Worker threads listing directories
+SUMMARY_WORKERS = min(16, (os.cpu_count() or 1) * 4)
+
+# Directories whose listing is cached; the least recently used are forgotten beyond this
+MAX_CACHED_DIRECTORIES = 200_000
+
+# Cached listings are rescanned after this many seconds even if the directory's mtime is unchanged,
+# as changing a file's size in place does not change its directory's mtime
+SUMMARY_CACHE_TTL = 300
+
+
+@dataclass
+class DirectoryScan:
+    """The files directly inside one directory, valid while the directory's mtime is unchanged."""
+
+    mtime_ns: int
+    scanned_at: float
+    files: int = 0
+    size: int = 0
+    extensions: Counter = field(default_factory=Counter)
+    extension_sizes: Counter = field(default_factory=Counter)
+    subdirectories: List[str] = field(default_factory=list)
+
+
+@dataclass
+class TreeTotals:
+    """Aggregated totals of a directory and everything below it."""
+
+    path: str
+    files: int = 0
+    directories: int = 0
+    size: int = 0
+    extensions: Counter = field(default_factory=Counter)
+    extension_sizes: Counter = field(default_factory=Counter)
+
+
+def _extension(name: str) -> str:
+    extension = os.path.splitext(name)[1].lower()
+    return extension or "(none)"
+
+
+def scan_directory(path: str, mtime_ns: int) -> DirectoryScan:
+    """List one directory with os.scandir. Symlinks are not followed; unreadable entries are skipped."""
+    scan = DirectoryScan(mtime_ns, time.monotonic())
+    with os.scandir(path) as iterator:
+        for entry in iterator:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    scan.subdirectories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    size = entry.stat(follow_symlinks=False).st_size
+                    extension = _extension(entry.name)
+                    scan.files += 1
+                    scan.size += size
+                    scan.extensions[extension] += 1
+                    scan.extension_sizes[extension] += size
+            except OSError:
+                continue
+    return scan
+
+
+class TreeSummaryCache:
+    """
+    Directory listings keyed by path and checked against the directory's mtime.
+
+    A repeated summary only stats each directory and rescans those that changed, so it costs one stat
+    per directory instead of one per file.
+    """
+
+    def __init__(self, max_directories: int = MAX_CACHED_DIRECTORIES, ttl: float = SUMMARY_CACHE_TTL):
+        self.max_directories = max_directories
+        self.ttl = ttl
+        self.scans: OrderedDict[str, DirectoryScan] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path: str, refresh: bool = False) -> Tuple[DirectoryScan, bool]:
+        """
+        Returns:
+            (scan, whether it came from the cache)
+        """
+        stat = os.stat(path, follow_symlinks=False)
+        with self.lock:
+            cached = self.scans.get(path)
+            if (
+                not refresh
+                and cached is not None
+                and cached.mtime_ns == stat.st_mtime_ns
+                and time.monotonic() - cached.scanned_at < self.ttl
+            ):
+                self.scans.move_to_end(path)
+                return cached, True
+
+        scan = scan_directory(path, stat.st_mtime_ns)
+        with self.lock:
+            self.scans[path] = scan
+            self.scans.move_to_end(path)
+            while len(self.scans) > self.max_directories:
+                self.scans.popitem(last=False)
+        return scan, False
+
+
+tree_summaries = TreeSummaryCache()
+
+
+def summarize_directories(root: str, refresh: bool = False) -> Dict:
+    """
+    Walk a tree on a thread pool, each directory listed (or taken from the cache) in its own task, and
+    aggregate totals for every directory bottom-up.
+
+    Returns:
+        Dictionary with totals (path -> TreeTotals for every directory), scanned and cached directory
+        counts, and unreadable directories
+    """
+    scans: Dict[str, DirectoryScan] = {}
+    order: List[str] = []
+    scanned, cached, unreadable = 0, 0, []
+    with ThreadPoolExecutor(max_workers=SUMMARY_WORKERS) as executor:
+        pending: Dict[Future, str] = {executor.submit(tree_summaries.get, root, refresh): root}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    scan, from_cache = future.result()
+                except OSError:
+                    unreadable.append(path)
+                    continue
+                scans[path] = scan
+                order.append(path)
+                if from_cache:
+                    cached += 1
+                else:
+                    scanned += 1
+                for subdirectory in scan.subdirectories:
+                    pending[executor.submit(tree_summaries.get, subdirectory, refresh)] = subdirectory
+
+    # Children always complete after their parent, so the reversed completion order is bottom-up
+    totals: Dict[str, TreeTotals] = {}
+    for path in reversed(order):
+        scan = scans[path]
+        total = TreeTotals(path, scan.files, 0, scan.size, Counter(scan.extensions), Counter(scan.extension_sizes))
+        for subdirectory in scan.subdirectories:
+            child = totals.get(subdirectory)
+            if child is None:
+                continue
+            total.files += child.files
+            total.directories += child.directories + 1
+            total.size += child.size
+            total.extensions.update(child.extensions)
+            total.extension_sizes.update(child.extension_sizes)
+        totals[path] = total
+    return {"totals": totals, "scanned": scanned, "cached": cached, "unreadable": unreadable}
+
+
+def largest_subtrees(totals: Dict[str, TreeTotals], root: str, depth: int) -> List[TreeTotals]:
+    """Totals of the directories at most `depth` levels below root, largest first."""
+    root_depth = root.rstrip(os.sep).count(os.sep)
+    subtrees = [total for path, total in totals.items() if path != root and path.count(os.sep) - root_depth <= depth]
+    return sorted(subtrees, key=lambda total: total.size, reverse=True)
+
+
+def top_extensions(total: TreeTotals, count: int) -> List[Tuple[str, int, int]]:
+    """(extension, size, files) of the extensions taking the most space."""
+    return [
+        (extension, size, total.extensions[extension]) for extension, size in total.extension_sizes.most_common(count)
+    ]
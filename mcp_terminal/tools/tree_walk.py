@@ -0,0 +1,189 @@
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterator, List, Optional, Pattern, Tuple
+
+# Directories never descended into when ignore rules are applied
+ALWAYS_IGNORED_DIRS = {".git", ".hg", ".svn"}
+
+
+@lru_cache(maxsize=512)
+def compile_glob(pattern: str) -> Pattern:
+    """
+    Translate a glob into a regex matched against '/'-separated relative paths.
+
+    '*' and '?' do not cross '/', '**' matches any number of directories, and '[...]' is a character class.
+    """
+    i, regex = 0, ""
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end < 0:
+                regex += re.escape(char)
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return re.compile(regex + r"\Z")
+
+
+def glob_matches(pattern: str, relative_path: str) -> bool:
+    """Patterns without '/' match the name at any depth, others match the whole relative path."""
+    if "/" not in pattern:
+        relative_path = relative_path.rsplit("/", 1)[-1]
+    return compile_glob(pattern).match(relative_path) is not None
+
+
+@dataclass
+class IgnoreRule:
+    regex: Pattern
+    negate: bool
+    dir_only: bool
+    # Rules only apply below the directory of the .gitignore that defined them ('' for the walk root)
+    base: str
+
+
+def parse_gitignore(path: str, base: str) -> List[IgnoreRule]:
+    """Rules of one .gitignore file; base is its directory relative to the walk root."""
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return rules
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if "/" in line.lstrip("/"):
+            # Anchored to the .gitignore's directory
+            pattern = line.lstrip("/")
+        elif line.startswith("/"):
+            pattern = line[1:]
+        else:
+            pattern = "**/" + line
+        if pattern:
+            rules.append(IgnoreRule(compile_glob(pattern), negate, dir_only, base))
+    return rules
+
+
+def is_ignored(rules: List[IgnoreRule], relative_path: str, is_dir: bool) -> bool:
+    """Apply gitignore rules in order; the last matching rule wins."""
+    ignored = False
+    for rule in rules:
+        if rule.dir_only and not is_dir:
+            continue
+        if rule.base:
+            if not relative_path.startswith(rule.base + "/"):
+                continue
+            path = relative_path[len(rule.base) + 1 :]
+        else:
+            path = relative_path
+        if rule.regex.match(path):
+            ignored = not rule.negate
+    return ignored
+
+
+@dataclass
+class TreeEntry:
+    path: str
+    relative_path: str
+    is_dir: bool
+    depth: int
+    size: int
+    mtime: float
+
+
+def walk_tree(
+    root: str,
+    max_depth: Optional[int] = None,
+    respect_gitignore: bool = True,
+    include_hidden: bool = False,
+    exclude: Optional[List[str]] = None,
+    with_stat: bool = True,
+) -> Iterator[TreeEntry]:
+    """
+    Walk a directory tree with os.scandir, yielding entries depth-first in name order.
+
+    Symlinks are listed but not followed. Entries the walk cannot read are skipped.
+
+    Args:
+        root: Directory to walk
+        max_depth: Deepest level to yield; 1 lists only the root's children, None means unlimited
+        respect_gitignore: Skip entries matched by .gitignore files in the tree, and VCS directories
+        include_hidden: Include names starting with '.'
+        exclude: Extra glob patterns to skip (directories matching them are not descended into)
+        with_stat: Fill in size and mtime, which costs a stat per entry on most platforms
+    """
+    exclude = exclude or []
+    # (directory, relative path, depth of its children, ignore rules in effect)
+    stack: List[Tuple[str, str, int, List[IgnoreRule]]] = [(root, "", 1, [])]
+    while stack:
+        directory, relative, depth, rules = stack.pop()
+        if respect_gitignore:
+            gitignore = os.path.join(directory, ".gitignore")
+            if os.path.isfile(gitignore):
+                rules = rules + parse_gitignore(gitignore, relative)
+
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            name = entry.name
+            if not include_hidden and name.startswith("."):
+                continue
+            relative_path = f"{relative}/{name}" if relative else name
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if respect_gitignore and (
+                (is_dir and name in ALWAYS_IGNORED_DIRS) or is_ignored(rules, relative_path, is_dir)
+            ):
+                continue
+            if any(glob_matches(pattern, relative_path) for pattern in exclude):
+                continue
+
+            size, mtime = 0, 0.0
+            if with_stat:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                    size, mtime = (0 if is_dir else stat.st_size), stat.st_mtime
+                except OSError:
+                    pass
+            yield TreeEntry(entry.path, relative_path, is_dir, depth, size, mtime)
+
+            if is_dir and (max_depth is None or depth < max_depth):
+                subdirectories.append((entry.path, relative_path, depth + 1, rules))
+
+        # Reversed so the stack pops them in name order
+        stack.extend(reversed(subdirectories))
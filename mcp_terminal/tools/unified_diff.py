@@ -0,0 +1,402 @@
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tools.file_access import line_indexes, split_lines
+
+# Context lines a hunk may lose at each end and still apply, like patch's fuzz factor
+MAX_FUZZ = 2
+
+HUNK_HEADER = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+DEV_NULL = "/dev/null"
+
+
+@dataclass
+class HunkLine:
+    # ' ' for context, '-' for a removed line, '+' for an added line
+    tag: str
+    text: bytes
+    # False when followed by "\ No newline at end of file"
+    newline: bool = True
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    new_start: int
+    lines: List[HunkLine] = field(default_factory=list)
+
+    def old_lines(self) -> List[bytes]:
+        return [line.text for line in self.lines if line.tag != "+"]
+
+
+@dataclass
+class FilePatch:
+    old_path: str
+    new_path: str
+    hunks: List[Hunk] = field(default_factory=list)
+    # Only set by git's "rename from" / "rename to" headers; otherwise differing names are two names of
+    # the same file, e.g. `diff -u foo.txt.orig foo.txt`
+    renamed: bool = False
+
+    @property
+    def path(self) -> str:
+        return self.old_path if self.new_path == DEV_NULL else self.new_path
+
+
+def _diff_path(line: bytes) -> str:
+    # "--- a/path<TAB>timestamp"
+    return line[4:].rstrip(b"\r\n").split(b"\t")[0].decode("utf-8", errors="surrogateescape").strip()
+
+
+def _strip_path(path: str, strip: int) -> str:
+    if path == DEV_NULL:
+        return path
+    parts = path.split("/")
+    if strip >= len(parts):
+        raise ValueError(f"Cannot strip {strip} leading components from '{path}'")
+    return "/".join(parts[strip:])
+
+
+def _git_rename(header: List[bytes]) -> Optional[Tuple[str, str]]:
+    """(from, to) of the "rename from" / "rename to" lines among a file's git extended headers."""
+    names = {}
+    for line in header:
+        for key in (b"rename from ", b"rename to "):
+            if line.startswith(key):
+                names[key] = line[len(key) :].rstrip(b"\r\n").decode("utf-8", errors="surrogateescape")
+    if len(names) < 2:
+        return None
+    return names[b"rename from "], names[b"rename to "]
+
+
+def parse_unified_diff(patch: str, strip: Optional[int] = None) -> List[FilePatch]:
+    """
+    Parse a unified diff, e.g. from `diff -u` or `git diff`, into per-file hunks.
+
+    Lines outside file sections are ignored, except git's rename headers, which mark a file as renamed;
+    a rename without changes, which has no file section, becomes a file patch without hunks.
+
+    Args:
+        strip: Leading path components to remove, like patch -p; by default 1 if the paths start with
+            'a/' and 'b/' (git style), otherwise 0
+
+    Raises:
+        ValueError: If the diff is malformed or contains no file sections.
+    """
+    lines = split_lines(patch.encode("utf-8", errors="surrogateescape"))
+    files: List[FilePatch] = []
+    # Extended header lines since the last "diff --git" line
+    git_header: List[bytes] = []
+
+    def add_pure_rename() -> None:
+        rename = _git_rename(git_header)
+        if rename is not None:
+            # Paths in rename headers have no a/ and b/ prefixes
+            rename_strip = 0 if strip is None else max(strip - 1, 0)
+            old_path, new_path = (_strip_path(path, rename_strip) for path in rename)
+            files.append(FilePatch(old_path, new_path, renamed=True))
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not (line.startswith(b"--- ") and i + 1 < len(lines) and lines[i + 1].startswith(b"+++ ")):
+            if line.startswith(b"diff --git "):
+                add_pure_rename()
+                git_header = []
+            else:
+                git_header.append(line)
+            i += 1
+            continue
+        old_path, new_path = _diff_path(line), _diff_path(lines[i + 1])
+        if strip is None:
+            git_style = old_path.startswith("a/") or new_path.startswith("b/")
+            file_strip = 1 if git_style else 0
+        else:
+            file_strip = strip
+        file_patch = FilePatch(_strip_path(old_path, file_strip), _strip_path(new_path, file_strip))
+        file_patch.renamed = _git_rename(git_header) is not None
+        git_header = []
+        files.append(file_patch)
+        i += 2
+
+        while i < len(lines):
+            header = HUNK_HEADER.match(lines[i])
+            if header is None:
+                break
+            old_count = 1 if header.group(2) is None else int(header.group(2))
+            new_count = 1 if header.group(4) is None else int(header.group(4))
+            hunk = Hunk(int(header.group(1)), int(header.group(3)))
+            i += 1
+            while (old_count > 0 or new_count > 0) and i < len(lines):
+                line = lines[i]
+                tag = line[:1].decode("latin-1")
+                if tag == "\\":
+                    if hunk.lines:
+                        hunk.lines[-1].newline = False
+                    i += 1
+                    continue
+                if line.strip(b"\r\n") == b"":
+                    # Some tools strip the space of empty context lines
+                    tag, line = " ", b" " + line
+                if tag not in " -+":
+                    raise ValueError(f"Malformed hunk in '{file_patch.path}' at patch line {i + 1}: {line[:80]!r}")
+                hunk.lines.append(HunkLine(tag, line[1:].rstrip(b"\r\n")))
+                old_count -= tag != "+"
+                new_count -= tag != "-"
+                i += 1
+            if old_count > 0 or new_count > 0:
+                raise ValueError(f"Hunk in '{file_patch.path}' ends before its line counts are reached")
+            # A marker after the last line of the hunk
+            if i < len(lines) and lines[i].startswith(b"\\"):
+                hunk.lines[-1].newline = False
+                i += 1
+            file_patch.hunks.append(hunk)
+
+    add_pure_rename()
+    if not files:
+        raise ValueError("No file sections ('--- ' / '+++ ' lines) found in the patch")
+    return files
+
+
+def _strip_newline(line: bytes) -> bytes:
+    return line.rstrip(b"\r\n")
+
+
+def _loose(line: bytes) -> bytes:
+    """A line with whitespace normalized, for fuzzy matching."""
+    return b" ".join(line.split())
+
+
+def _matches(lines: List[bytes], position: int, expected: List[bytes], loose: bool) -> bool:
+    for offset, text in enumerate(expected):
+        actual = _strip_newline(lines[position + offset])
+        if actual != text and not (loose and _loose(actual) == _loose(text)):
+            return False
+    return True
+
+
+def _find_hunk(lines: List[bytes], old: List[bytes], expected: int, start: int) -> Optional[int]:
+    """Position of `old` at or after start, nearest to expected first."""
+    last = len(lines) - len(old)
+    if last < start:
+        return None
+    expected = min(max(expected, start), last)
+    for loose in (False, True):
+        for distance in range(max(expected - start, last - expected) + 1):
+            for position in (expected - distance, expected + distance) if distance else (expected,):
+                if start <= position <= last and _matches(lines, position, old, loose):
+                    return position
+    return None
+
+
+def _leading_context(hunk_lines: List[HunkLine]) -> int:
+    count = 0
+    while count < len(hunk_lines) and hunk_lines[count].tag == " ":
+        count += 1
+    return count
+
+
+def apply_hunks(lines: List[bytes], file_patch: FilePatch) -> Tuple[List[bytes], List[str]]:
+    """
+    Apply a file's hunks to its lines in one forward pass.
+
+    Each hunk is looked for nearest to where its header and the previous hunks put it, first exactly,
+    then ignoring whitespace differences, then with up to MAX_FUZZ context lines dropped at each end.
+    Unchanged and context lines are copied from the file, so their bytes are preserved.
+
+    Returns:
+        (new lines, notes about hunks that applied at an offset or with fuzz)
+
+    Raises:
+        ValueError: If a hunk cannot be placed.
+    """
+    eol = b"\r\n" if lines and lines[0].endswith(b"\r\n") else b"\n"
+    output: List[bytes] = []
+    notes: List[str] = []
+    cursor, drift = 0, 0
+    for number, hunk in enumerate(file_patch.hunks, 1):
+        position = None
+        leading_available = _leading_context(hunk.lines)
+        trailing_available = _leading_context(hunk.lines[::-1])
+        for fuzz in range(MAX_FUZZ + 1):
+            leading = min(fuzz, leading_available)
+            trailing = min(fuzz, trailing_available)
+            if fuzz and leading + trailing == 0:
+                break
+            hunk_lines = hunk.lines[leading : len(hunk.lines) - trailing]
+            old = [line.text for line in hunk_lines if line.tag != "+"]
+            # Headers of pure insertions name the line after which to insert
+            start_line = hunk.old_start if not old and not hunk.old_lines() else hunk.old_start - 1
+            expected = start_line + drift + leading
+            if old:
+                position = _find_hunk(lines, old, expected, cursor)
+            elif cursor <= expected <= len(lines) or not lines:
+                position = max(cursor, min(expected, len(lines)))
+            if position is not None:
+                break
+        if position is None:
+            raise ValueError(f"Hunk {number} (@@ -{hunk.old_start} @@) of '{file_patch.path}' does not apply")
+
+        offset = position - expected
+        if offset or fuzz:
+            notes.append(
+                f"hunk {number} applied"
+                + (f" at offset {offset:+d}" if offset else "")
+                + (f" with fuzz {fuzz}" if fuzz else "")
+            )
+        drift += offset
+
+        output.extend(lines[cursor:position])
+        source = position
+        for line in hunk_lines:
+            if line.tag == " ":
+                output.append(lines[source])
+                source += 1
+            elif line.tag == "-":
+                source += 1
+            else:
+                if output and not output[-1].endswith(b"\n"):
+                    output[-1] += eol
+                output.append(line.text + (eol if line.newline else b""))
+        cursor = source
+
+    output.extend(lines[cursor:])
+    return output, notes
+
+
+@dataclass
+class _PlannedFile:
+    file_patch: FilePatch
+    # Name of the file in the results
+    name: str
+    source: Optional[str]
+    target: Optional[str]
+    temp_path: Optional[str] = None
+    notes: List[str] = field(default_factory=list)
+
+
+def _patch_paths(file_patch: FilePatch, resolve: Callable[[str], str]) -> Tuple[Optional[str], Optional[str], str]:
+    """
+    (file to read, file to write, name) of a file patch; None for the /dev/null side.
+
+    Unless git marked the file as renamed, differing old and new names are two names for one file that
+    is patched in place, like patch does: whichever exists, and if both do the one with the fewest path
+    components, then the shortest base name, then the shortest name.
+    """
+    old, new = file_patch.old_path, file_patch.new_path
+    if DEV_NULL in (old, new) or old == new or file_patch.renamed:
+        source = None if old == DEV_NULL else resolve(old)
+        target = None if new == DEV_NULL else resolve(new)
+        name = f"{old} -> {new}" if file_patch.renamed else file_patch.path
+        return source, target, name
+
+    existing = [name for name in (old, new) if os.path.isfile(resolve(name))]
+    if not existing:
+        raise ValueError(f"Neither '{old}' nor '{new}' exists")
+    name = min(existing, key=lambda name: (name.count("/"), len(os.path.basename(name)), len(name)))
+    return resolve(name), resolve(name), name
+
+
+def _plan(file_patch: FilePatch, resolve: Callable[[str], str], dry_run: bool) -> _PlannedFile:
+    source, target, name = _patch_paths(file_patch, resolve)
+    planned = _PlannedFile(file_patch, name, source, target)
+
+    if file_patch.renamed and os.path.lexists(target):
+        raise ValueError(f"'{file_patch.new_path}' is the new name of '{file_patch.old_path}' but already exists")
+    if source is None:
+        if target is not None and os.path.exists(target) and os.path.getsize(target) > 0:
+            raise ValueError(f"'{file_patch.new_path}' is created by the patch but already exists")
+        lines: List[bytes] = []
+    else:
+        if not os.path.isfile(source):
+            raise ValueError(f"'{file_patch.old_path}' does not exist")
+        with open(source, "rb") as file:
+            lines = file.readlines()
+
+    output, planned.notes = apply_hunks(lines, file_patch)
+    if target is None:
+        if any(output):
+            raise ValueError(f"'{file_patch.old_path}' is deleted by the patch but would not be empty")
+        return planned
+    if dry_run:
+        return planned
+
+    # Through a symlink to the file it points to, so the link itself is kept
+    planned.target = target = os.path.realpath(target)
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    descriptor, planned.temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(target)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.writelines(output)
+        if source is not None:
+            shutil.copymode(source, planned.temp_path)
+    except BaseException:
+        os.unlink(planned.temp_path)
+        raise
+    return planned
+
+
+def apply_patch_files(
+    file_patches: List[FilePatch], resolve: Callable[[str], str], dry_run: bool = False
+) -> List[Dict]:
+    """
+    Apply a parsed patch to the files it names, all or nothing.
+
+    Every file is patched into a temp file next to it first; only when all hunks of all files apply are
+    the originals replaced with os.replace, so a failing hunk leaves every file untouched. A file is only
+    renamed when git's rename headers say so.
+
+    Args:
+        resolve: Maps a path from the patch to the file system path to use
+
+    Returns:
+        Per file: path, action ('modified', 'created', 'deleted' or 'renamed'), number of hunks and notes
+
+    Raises:
+        ValueError: If the patch does not apply; nothing is written.
+    """
+    seen = set()
+    for file_patch in file_patches:
+        source, target, name = _patch_paths(file_patch, resolve)
+        path = target or source
+        if path in seen:
+            raise ValueError(f"'{name}' appears more than once in the patch")
+        seen.add(path)
+
+    planned: List[_PlannedFile] = []
+    try:
+        for file_patch in file_patches:
+            planned.append(_plan(file_patch, resolve, dry_run))
+    except BaseException:
+        for item in planned:
+            if item.temp_path is not None:
+                os.unlink(item.temp_path)
+        raise
+
+    results = []
+    for item in planned:
+        if item.source is None:
+            action = "created"
+        elif item.target is None:
+            action = "deleted"
+        elif item.file_patch.renamed:
+            action = "renamed"
+        else:
+            action = "modified"
+        if not dry_run:
+            if item.target is not None:
+                os.replace(item.temp_path, item.target)
+                line_indexes.invalidate(item.target)
+            if action in ("deleted", "renamed"):
+                os.unlink(item.source)
+                line_indexes.invalidate(item.source)
+        results.append({"path": item.name, "action": action, "hunks": len(item.file_patch.hunks), "notes": item.notes})
+    return results
@@ -1,10 +1,8 @@
-import json
 from typing import Any, List
-import pandas as pd
-import altair as alt
-import math
 from agno.tools import Toolkit
 
+from tools.python_tool import PythonTools
+
 
 class AltairVegaTools(Toolkit):
     """AltairVegaTools that will be able to run Altair and Vega python code to the chart html."""
@@ -15,7 +13,7 @@ class AltairVegaTools(Toolkit):
 
     def run_python_code(code: str, jsonData: str) -> str:
         """
-        Executes the provided Python code in a restricted environment.
+        Executes the provided Python code in a sandbox worker process.
 
         If successful, returns the output of the code.
         If failed, returns an error message which will include ERROR: at the start.
@@ -24,15 +22,4 @@ class AltairVegaTools(Toolkit):
         :param jsonData: json string of the object to visualize
         :return: the result from the python code if successful, otherwise returns an error message.
         """
-        try:
-            result = {}
-            df = pd.DataFrame(json.loads(jsonData))
-            safe_globals = {"alt": alt, "pd": pd, "math": math, "json": json}
-            safe_locals = {"df": df, "result": result}
-            exec(code, safe_globals, safe_locals)
-
-            output = safe_locals.get("result", None)
-
-            return output or "No result"
-        except Exception as e:
-            return f"ERROR: {str(e)}"
+        return PythonTools().run_python_code(code, jsonData)